@@ -0,0 +1,167 @@
+"""
+CISM Questions - Bank Revision Log
+Records a content hash per question and a log of what each bank rewrite added, changed or removed
+"""
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+BANK_FILE = Path(__file__).parent.parent / "cism_questions.json"
+REVISIONS_FILE = Path(__file__).parent.parent / "bank_revisions.json"
+
+
+def question_hash(question):
+    """Stable content hash of a single question (must match web-app/banks.py)"""
+    canonical = json.dumps(question, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def bank_version(questions):
+    """Version of a whole bank: hash of every id and question hash, in order (must match web-app/banks.py)"""
+    digest = hashlib.sha256()
+    for q in questions:
+        digest.update(f"{q['id']}:{question_hash(q)};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def assign_ids(questions, revisions_path=REVISIONS_FILE):
+    """Give every question a unique, stable 'id' (in place).
+
+    Question numbers restart in every chapter, so they cannot identify a
+    question. Existing ids are kept; new questions get ids above every id
+    the revision log has seen, so a removed question's id is never reused.
+    """
+    issued = last_issued_id(load_revisions(revisions_path))
+    next_id = max([issued] + [q['id'] for q in questions if isinstance(q.get('id'), int)]) + 1
+    for i, q in enumerate(questions):
+        if not isinstance(q.get('id'), int):
+            questions[i] = {'id': next_id, **q}
+            next_id += 1
+    return questions
+
+
+def content_key(question):
+    """What identifies a question across extractions: its text, choices and answer"""
+    choices = question.get('choices') or {}
+    return (' '.join((question.get('question') or '').split()),
+            tuple(sorted((key, ' '.join((text or '').split())) for key, text in choices.items())),
+            question.get('answer'))
+
+
+def carry_over_ids(questions, existing):
+    """Give re-extracted questions the ids they had in `existing` (in place).
+
+    A question with the same text, choices and answer as an existing one
+    takes its id; otherwise one at the same bank position with the same
+    number is taken to be that question, edited. Per-choice rationales
+    come along while the explanation is unchanged. Questions matching
+    neither keep no id, for assign_ids() to issue a new one.
+    """
+    by_content = {}
+    for q in existing:
+        if isinstance(q.get('id'), int):
+            by_content.setdefault(content_key(q), q)
+    claimed = set()
+
+    def take(i, previous):
+        claimed.add(previous['id'])
+        q = {key: value for key, value in questions[i].items() if key != 'id'}
+        if previous.get('choice_explanations') and previous.get('explanation') == q.get('explanation'):
+            q.setdefault('choice_explanations', previous['choice_explanations'])
+        questions[i] = {'id': previous['id'], **q}
+
+    unmatched = []
+    for i, q in enumerate(questions):
+        previous = by_content.get(content_key(q))
+        if previous is not None and previous['id'] not in claimed:
+            take(i, previous)
+        else:
+            unmatched.append(i)
+    for i in unmatched:
+        previous = existing[i] if i < len(existing) else None
+        if (previous is not None and isinstance(previous.get('id'), int) and previous['id'] not in claimed
+                and previous.get('number') == questions[i].get('number')):
+            take(i, previous)
+        else:
+            questions[i].pop('id', None)
+    return questions
+
+
+def last_issued_id(revisions):
+    """Highest id ever recorded: the log's high-water mark (derived from the log for older files)"""
+    logged = [question_id for entry in revisions['log'] for question_id in entry['added'] + entry['removed']]
+    return max([revisions.get('max_id', 0)] + logged + [int(i) for i in revisions['hashes']])
+
+
+def load_revisions(revisions_path=REVISIONS_FILE):
+    """Load the revision log, or an empty one if none exists yet"""
+    revisions_path = Path(revisions_path)
+    if revisions_path.exists():
+        with open(revisions_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {'revision': 0, 'max_id': 0, 'hashes': {}, 'log': []}
+
+
+def record_revision(questions, source, revisions_path=REVISIONS_FILE):
+    """Diff the bank against the last recorded revision and log the changes.
+
+    Call after the bank has been written. Returns the current revision number;
+    no entry is added when nothing changed.
+    """
+    revisions = load_revisions(revisions_path)
+    previous = revisions['hashes']
+    current = {str(q['id']): question_hash(q) for q in questions}
+
+    added = sorted((int(i) for i in current if i not in previous))
+    removed = sorted((int(i) for i in previous if i not in current))
+    changed = sorted((int(i) for i in current if i in previous and previous[i] != current[i]))
+
+    if not (added or removed or changed):
+        return revisions['revision']
+
+    revisions['revision'] += 1
+    revisions['max_id'] = max([last_issued_id(revisions)] + [q['id'] for q in questions])
+    revisions['hashes'] = current
+    revisions['log'].append({
+        'revision': revisions['revision'],
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'source': source,
+        'added': added,
+        'changed': changed,
+        'removed': removed
+    })
+
+    with open(revisions_path, 'w', encoding='utf-8') as f:
+        json.dump(revisions, f, indent=2, ensure_ascii=False)
+
+    print(f"✓ Recorded bank revision {revisions['revision']}: "
+          f"{len(added)} added, {len(changed)} changed, {len(removed)} removed")
+    return revisions['revision']
+
+
+def main():
+    """Record the current bank (e.g. after manual edits) and show the log"""
+    with open(BANK_FILE, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    if any(not isinstance(q.get('id'), int) for q in questions):
+        assign_ids(questions)
+        with open(BANK_FILE, 'w', encoding='utf-8') as f:
+            json.dump(questions, f, indent=2, ensure_ascii=False)
+        print("✓ Assigned ids to questions without one")
+
+    record_revision(questions, 'bank_revisions')
+
+    print("\n📋 Revision log:")
+    for entry in load_revisions()['log']:
+        print(f"   r{entry['revision']} {entry['timestamp']} ({entry['source']}): "
+              f"+{len(entry['added'])} ~{len(entry['changed'])} -{len(entry['removed'])}")
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("CISM Questions - Bank Revisions")
+    print("=" * 80 + "\n")
+    main()
+    print("\n" + "=" * 80)
@@ -0,0 +1,130 @@
+"""
+CISM PDF Extraction Benchmark
+Compares extraction backends on one fixture PDF: pages/sec, artifacts left for cleanup, questions parsed
+"""
+import argparse
+import contextlib
+import io
+import json
+import re
+import time
+from pathlib import Path
+
+from cleanup_json import ARTIFACT_FIXES, SPACED_PATTERNS
+from extract_questions_v2 import AdvancedCISMExtractor
+from pdf_backends import BACKENDS, available_backends, get_backend
+
+# Artifacts cleanup_json.py doesn't know about yet, counted as a rough signal
+CAPS_SPLIT_PATTERN = re.compile(r'\b[A-Z]{3,} [A-Z]\b')       # "SMAR T"
+LIGATURE_PATTERN = re.compile('[\ufb00-\ufb06]')              # "fi", "fl" ligatures left unexpanded
+REPLACEMENT_PATTERN = re.compile('\ufffd')                     # undecodable characters
+
+
+def count_artifacts(text):
+    """Occurrences of each kind of extraction artifact in `text`"""
+    # Apply the fixes in cleanup order so overlapping patterns are counted once
+    known = 0
+    for spaced, fixed in SPACED_PATTERNS + ARTIFACT_FIXES:
+        known += text.count(spaced)
+        text = text.replace(spaced, fixed)
+    counts = {
+        'spaced_words': known,
+        'caps_split': len(CAPS_SPLIT_PATTERN.findall(text)),
+        'ligatures': len(LIGATURE_PATTERN.findall(text)),
+        'replacement_chars': len(REPLACEMENT_PATTERN.findall(text)),
+    }
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def benchmark_backend(name, source, repeat=1):
+    """Extract `source` with one backend (best of `repeat` runs) and parse the result"""
+    backend = get_backend(name)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = list(backend.pages(source))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    text = "\n".join(pages)
+
+    extractor = AdvancedCISMExtractor(source, backend=name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        extractor.parse_questions(text)
+    answered = sum(1 for q in extractor.questions if q.get('answer'))
+
+    return {
+        'backend': name,
+        'pages': len(pages),
+        'seconds': round(best, 4),
+        'pages_per_sec': round(len(pages) / best, 1) if best > 0 else None,
+        'characters': len(text),
+        'artifacts': count_artifacts(text),
+        'questions': len(extractor.questions),
+        'questions_with_answer': answered
+    }
+
+
+def recommend(results):
+    """Cleanest backend that parsed the most questions; speed breaks ties"""
+    if not results:
+        return None
+    most = max(r['questions'] for r in results)
+    candidates = [r for r in results if r['questions'] == most]
+    return min(candidates, key=lambda r: (r['artifacts']['total'], r['seconds']))['backend']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF text extraction backends on a fixture document")
+    parser.add_argument('source', help="fixture PDF (or .txt / page directory for the text backend)")
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS),
+                        help="backends to compare (default: every installed PDF backend)")
+    parser.add_argument('--text', help="pre-extracted text of the same document, benchmarked with the text backend")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per backend; the fastest is reported")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if not source.exists():
+        print(f"❌ Error: File not found at {source}")
+        return 1
+
+    runs = [(name, source) for name in (args.backends or [n for n in available_backends() if n != 'text'])]
+    if args.text:
+        runs.append(('text', Path(args.text)))
+    missing = [name for name in BACKENDS if name not in available_backends()]
+    if missing:
+        print(f"ℹ️  Not installed: {', '.join(f'{n} ({BACKENDS[n].package})' for n in missing)}")
+
+    results = []
+    for name, path in runs:
+        print(f"⏱️  {name}: extracting {path.name}...")
+        try:
+            results.append(benchmark_backend(name, path, repeat=max(args.repeat, 1)))
+        except Exception as exc:
+            print(f"   ❌ {name} failed: {exc}")
+
+    print(f"\n{'Backend':<10} {'Pages':>6} {'Pages/s':>9} {'Artifacts':>10} {'Questions':>10} {'Answered':>9}")
+    print("-" * 59)
+    for r in results:
+        print(f"{r['backend']:<10} {r['pages']:>6} {r['pages_per_sec'] or '-':>9} "
+              f"{r['artifacts']['total']:>10} {r['questions']:>10} {r['questions_with_answer']:>9}")
+
+    best = recommend(results)
+    if best:
+        print(f"\n✅ Recommended backend: {best}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'source': str(source), 'results': results, 'recommended': best}, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("CISM PDF Extraction Benchmark")
+    print("=" * 80 + "\n")
+    exit_code = main()
+    print("\n" + "=" * 80)
+    raise SystemExit(exit_code)
@@ -0,0 +1,155 @@
+"""
+CISM Questions - Related Questions Index
+Builds a top-k table of similar questions from TF-IDF vectors over question and explanation text
+"""
+import argparse
+import json
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from bank_revisions import bank_version
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_K = 5
+MIN_SIMILARITY = 0.05             # weaker neighbours aren't worth suggesting
+CHUNK_ROWS = 512                  # similarity rows computed at a time (bounds memory for big banks)
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9]+(?:['-][a-z0-9]+)*")
+STOP_WORDS = frozenset("""
+    a about above after again against all also although an and any are as at be because been before being
+    below best between both but by can could did do does doing down during each either else ensure even
+    first following for from further had has have having how however if in into is it its itself just
+    least less may might more most must neither no nor not of off on once only or other otherwise our out
+    over own rather same should since so some such than that the their them then there these they this
+    those through to too under until up upon very was were what when where whether which while who whom
+    why will with within without would yet
+""".split())
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def question_text(question):
+    """Text a question is compared on: the question itself and its explanation"""
+    return f"{question.get('question') or ''} {question.get('explanation') or ''}"
+
+
+def tfidf_matrix(documents):
+    """L2-normalised TF-IDF rows (float32) over the terms that occur in at least two documents.
+
+    Weights are sublinear (1 + log tf) with smoothed idf. Terms found in a
+    single document can't link two questions, so they are left out of the
+    matrix but still count towards each row's norm, which keeps the cosine
+    similarities exactly what the full vectors would give.
+    """
+    counts = [Counter(tokenize(text)) for text in documents]
+    df = Counter(term for doc in counts for term in doc)
+    n = len(documents)
+    idf = {term: math.log((1 + n) / (1 + freq)) + 1 for term, freq in df.items()}
+    shared = {term: col for col, term in enumerate(sorted(t for t, freq in df.items() if freq > 1))}
+
+    matrix = np.zeros((n, len(shared)), dtype=np.float32)
+    for row, doc in enumerate(counts):
+        norm = 0.0
+        for term, tf in doc.items():
+            weight = (1 + math.log(tf)) * idf[term]
+            norm += weight * weight
+            col = shared.get(term)
+            if col is not None:
+                matrix[row, col] = weight
+        if norm:
+            matrix[row] /= math.sqrt(norm)
+    return matrix
+
+
+def top_k_neighbors(matrix, k=DEFAULT_K, min_similarity=MIN_SIMILARITY):
+    """For every row, up to k (row, cosine similarity) pairs, most similar first"""
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    neighbors = []
+    if k <= 0:
+        return [[] for _ in range(n)]
+    for start in range(0, n, CHUNK_ROWS):
+        similarities = matrix[start:start + CHUNK_ROWS] @ matrix.T
+        rows = np.arange(similarities.shape[0])
+        similarities[rows, rows + start] = -1          # never suggest the question itself
+        best = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(similarities, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind='stable')
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        for columns, scores in zip(best, best_scores):
+            neighbors.append([(int(c), float(s)) for c, s in zip(columns, scores) if s >= min_similarity])
+    return neighbors
+
+
+def build_index(questions, k=DEFAULT_K):
+    """{'bank_version', 'k', 'neighbors': {id: [[id, similarity], ...]}} for a bank"""
+    ids = [q['id'] for q in questions]
+    neighbors = top_k_neighbors(tfidf_matrix([question_text(q) for q in questions]), k)
+    return {
+        'bank_version': bank_version(questions),
+        'built_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'method': 'tfidf-cosine',
+        'k': k,
+        'neighbors': {
+            str(question_id): [[ids[col], round(score, 3)] for col, score in row]
+            for question_id, row in zip(ids, neighbors)
+        }
+    }
+
+
+def related_path_for(bank_file):
+    """related_index.json for the CISM bank, <id>_related_index.json for <id>_questions.json"""
+    bank_file = Path(bank_file)
+    if bank_file.name == "cism_questions.json":
+        return bank_file.parent / "related_index.json"
+    stem = bank_file.stem[:-len('_questions')] if bank_file.stem.endswith('_questions') else bank_file.stem
+    return bank_file.parent / f"{stem}_related_index.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the most similar questions of every question")
+    parser.add_argument('bank', nargs='?', default=str(BASE_DIR / "cism_questions.json"),
+                        help="questions JSON (default: ../cism_questions.json)")
+    parser.add_argument('--k', type=int, default=DEFAULT_K, help=f"neighbours per question (default: {DEFAULT_K})")
+    parser.add_argument('--output', help="index file (default: related_index.json next to the bank, "
+                                         "or <id>_related_index.json for <id>_questions.json)")
+    args = parser.parse_args()
+
+    bank_file = Path(args.bank)
+    if not bank_file.exists():
+        print(f"❌ Error: File not found at {bank_file}")
+        return 1
+    with open(bank_file, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    if any(not isinstance(q.get('id'), int) for q in questions):
+        print("❌ Error: Some questions have no id; run bank_revisions.py first")
+        return 1
+    print(f"✓ Loaded {len(questions)} questions from {bank_file}")
+
+    print(f"\n🔍 Finding the {args.k} most similar questions of each question...")
+    index = build_index(questions, k=args.k)
+    linked = sum(1 for row in index['neighbors'].values() if row)
+    print(f"   {linked}/{len(questions)} questions have related questions")
+
+    output = Path(args.output) if args.output else related_path_for(bank_file)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"✓ Saved related questions index to {output} ({output.stat().st_size / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("CISM Questions - Related Questions Index")
+    print("=" * 80 + "\n")
+    exit_code = main()
+    print("\n" + "=" * 80)
+    raise SystemExit(exit_code)
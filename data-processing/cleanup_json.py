@@ -6,6 +6,45 @@ import json
 import re
 from pathlib import Path
 
+from bank_revisions import assign_ids, record_revision
+
+# Fix spaced words - these commonly appear as:
+# "or ganization" -> "organization"
+# "of ficer" -> "officer"
+# "dif ferent" -> "different"
+# "dif ficult" -> "difficult"
+# "ef fectiveness" -> "effectiveness"
+# "ef fective" -> "effective"
+# "ef fort" -> "effort"
+# "insuf ficient" -> "insufficient"
+SPACED_PATTERNS = [
+    ("or ganization's", "organization's"),  # Fix possessive with space
+    ('or ganization', 'organization'),
+    ('of ficer', 'officer'),
+    ('dif ferent', 'different'),
+    ('dif ficult', 'difficult'),
+    ('ef fectiveness', 'effectiveness'),
+    ('ef fective', 'effective'),
+    ('ef fort', 'effort'),
+    ('insuf ficient', 'insufficient'),
+    ('har dened', 'hardened'),
+    ('ar guably', 'arguably'),
+    ('for gone', 'forgone'),
+    ('jar gon', 'jargon'),
+    ('staf f', 'staff'),
+    ('tar get', 'target'),
+    ('r esponsibility', 'responsibility'),
+    ('\u2019 s', "'s"),  # Fix space before 's with smart quote
+    ('\u2018 s', "'s"),  # Fix other variant
+    ("' s", "'s"),  # Fix space before 's
+]
+
+# Other extraction artifacts seen in the PyPDF2 output
+ARTIFACT_FIXES = [
+    ('[e]nsures', 'ensures'),
+    ('SMAR T', 'SMART'),
+]
+
 def cleanup_text(text):
     """Clean up common formatting issues in text"""
     if not isinstance(text, str):
@@ -23,44 +62,13 @@ def cleanup_text(text):
     text = text.replace('"', '"')  # Left double quote (fallback)
     text = text.replace('"', '"')  # Right double quote (fallback)
     
-    # Fix spaced words - these commonly appear as:
-    # "or ganization" -> "organization"
-    # "of ficer" -> "officer"
-    # "dif ferent" -> "different"
-    # "dif ficult" -> "difficult"
-    # "ef fectiveness" -> "effectiveness"
-    # "ef fective" -> "effective"
-    # "ef fort" -> "effort"
-    # "insuf ficient" -> "insufficient"
-    
-    spaced_patterns = [
-        ("or ganization's", "organization's"),  # Fix possessive with space
-        ('or ganization', 'organization'),
-        ('of ficer', 'officer'),
-        ('dif ferent', 'different'),
-        ('dif ficult', 'difficult'),
-        ('ef fectiveness', 'effectiveness'),
-        ('ef fective', 'effective'),
-        ('ef fort', 'effort'),
-        ('insuf ficient', 'insufficient'),
-        ('har dened', 'hardened'),
-        ('ar guably', 'arguably'),
-        ('for gone', 'forgone'),
-        ('jar gon', 'jargon'),
-        ('staf f', 'staff'),
-        ('tar get', 'target'),
-        ('r esponsibility', 'responsibility'),
-        ('\u2019 s', "'s"),  # Fix space before 's with smart quote
-        ('\u2018 s', "'s"),  # Fix other variant
-        ("' s", "'s"),  # Fix space before 's
-    ]
-    
-    for spaced, fixed in spaced_patterns:
+    # Fix spaced words
+    for spaced, fixed in SPACED_PATTERNS:
         text = text.replace(spaced, fixed)
     
     # Fix common OCR/extraction artifacts
-    text = text.replace('[e]nsures', 'ensures')
-    text = text.replace('SMAR T', 'SMART')
+    for artifact, fixed in ARTIFACT_FIXES:
+        text = text.replace(artifact, fixed)
     
     return text
 
@@ -115,6 +123,15 @@ def process_json():
                 changes_by_type['choice'] += 1
                 total_changes += 1
         
+        # Clean per-choice rationales (see extract_rationales.py)
+        rationales = question.get('choice_explanations', {})
+        for letter, rationale in rationales.items():
+            new_rationale = cleanup_text(rationale)
+            if rationale != new_rationale:
+                rationales[letter] = new_rationale
+                changes_by_type['explanation'] += 1
+                total_changes += 1
+        
         if (i + 1) % 50 == 0:
             print(f"   Processed {i + 1}/{len(questions)} questions...")
     
@@ -125,10 +142,12 @@ def process_json():
     
     # Save updated JSON
     print("\n💾 Saving cleaned questions...")
+    assign_ids(questions)
     with open(json_path, 'w', encoding='utf-8') as f:
         json.dump(questions, f, indent=2, ensure_ascii=False)
     
     print("✓ Successfully saved to cism_questions.json")
+    record_revision(questions, 'cleanup_json')
     
     # Show a sample
     print(f"\n📋 Sample fixes (Question 1):")
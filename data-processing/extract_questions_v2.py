@@ -2,37 +2,38 @@
 Advanced CISM PDF Question Extractor
 Extracts all questions, answers, and explanations from CISM practice exam PDF
 """
-import PyPDF2
+import argparse
 import json
 import re
 from pathlib import Path
 from typing import List, Dict, Tuple
 
+from bank_revisions import assign_ids, carry_over_ids, record_revision
+from pdf_backends import BACKENDS, default_backend_for, get_backend
+
 
 class AdvancedCISMExtractor:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, backend=None):
         self.pdf_path = pdf_path
+        self.backend = get_backend(backend or default_backend_for(pdf_path))
+        self.page_count = 0
         self.questions = []
         self.text_lines = []
         
     def extract_text_from_pdf(self) -> str:
-        """Extract all text from the PDF"""
-        text = ""
+        """Extract all text from the PDF with the selected backend (see pdf_backends.py)"""
+        page_texts = []
         try:
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                print(f"📄 Total pages: {len(pdf_reader.pages)}")
+            for page_num, page_text in enumerate(self.backend.pages(self.pdf_path), 1):
+                if page_text:
+                    page_texts.append(page_text)
+                self.page_count = page_num
                 
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                    
-                    if (page_num + 1) % 10 == 0:
-                        print(f"   Processed {page_num + 1} pages...")
+                if page_num % 10 == 0:
+                    print(f"   Processed {page_num} pages...")
             
-            return text
+            print(f"📄 Total pages: {self.page_count} ({self.backend.name})")
+            return "\n".join(page_texts) + "\n" if page_texts else ""
         except Exception as e:
             print(f"❌ Error reading PDF: {e}")
             return None
@@ -147,8 +148,13 @@ class AdvancedCISMExtractor:
                 print(f"   Extracted {question_count} questions...")
     
     def save_to_json(self, output_path: str) -> bool:
-        """Save extracted questions to JSON file"""
+        """Save extracted questions to JSON file, keeping the ids of questions already in it"""
         try:
+            if Path(output_path).exists():
+                with open(output_path, 'r', encoding='utf-8') as f:
+                    existing = json.load(f)
+                carry_over_ids(self.questions, existing if isinstance(existing, list) else [])
+            assign_ids(self.questions)
             with open(output_path, 'w', encoding='utf-8') as f:
                 json.dump(self.questions, f, indent=2, ensure_ascii=False)
             print(f"\n✓ Successfully saved {len(self.questions)} questions to {output_path}")
@@ -194,11 +200,17 @@ class AdvancedCISMExtractor:
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract CISM questions from a practice exam PDF")
+    parser.add_argument('pdf', nargs='?', help="PDF (or pre-extracted .txt) to extract; prompted for if omitted")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="text extraction backend (default: pypdf2, or text for .txt input)")
+    args = parser.parse_args()
+    
     print("\n" + "=" * 80)
     print("CISM PDF Question Extractor")
     print("=" * 80)
     
-    pdf_path = input("\n📁 Enter the path to the CISM PDF file: ").strip().strip('"')
+    pdf_path = args.pdf or input("\n📁 Enter the path to the CISM PDF file: ").strip().strip('"')
     
     if not Path(pdf_path).exists():
         print(f"\n❌ Error: File not found at {pdf_path}")
@@ -206,10 +218,15 @@ def main():
     
     output_path = str(Path(__file__).parent.parent / "cism_questions.json")
     
-    extractor = AdvancedCISMExtractor(pdf_path)
+    try:
+        extractor = AdvancedCISMExtractor(pdf_path, backend=args.backend)
+    except (ValueError, RuntimeError) as exc:
+        print(f"\n❌ Error: {exc}")
+        return
     success = extractor.extract_and_save(output_path)
     
     if success:
+        record_revision(extractor.questions, 'extract_questions_v2')
         print("\n✅ You can now use the web quiz application!")
         print("   Start it with: python app.py")
     else:
@@ -0,0 +1,120 @@
+"""
+CISM Questions - Per-Choice Rationale Extraction
+Splits each explanation into a rationale per answer choice and stores it in the bank
+"""
+import json
+import re
+from pathlib import Path
+
+from bank_revisions import assign_ids, record_revision
+
+LETTERS = r'[A-D]'
+LETTER_LIST = rf'{LETTERS}(?:(?:,\s*|,?\s+and\s+){LETTERS})*'
+
+# "A, B, and D are incorrect." - separates the correct-answer rationale from the distractors
+SUMMARY_PATTERN = re.compile(rf'(?:^|(?<=\s)){LETTER_LIST}\s+are\s+(?:all\s+)?incorrect\.\s*')
+
+# "A is incorrect because ...", "A and B are incorrect because ..." at the start of a sentence
+SEGMENT_PATTERN = re.compile(
+    rf'(?:^|(?<=[.!?"\'”’)]\s)|(?<=[.!?"\'”’)]\s\s))({LETTER_LIST})\s+(?:is|are)\s+(?:also\s+)?(?:incorrect|not|wrong)\b'
+)
+
+
+def letters_in(letter_list):
+    return re.findall(LETTERS, letter_list)
+
+
+def extract_rationales(question):
+    """Return {letter: rationale} for every choice of the question.
+
+    The correct choice gets the text before the "X, Y, and Z are incorrect."
+    summary; each distractor gets the sentences that start with its letter,
+    or the shared text after the summary. Choices the explanation doesn't
+    discuss get an empty string.
+    """
+    explanation = (question.get('explanation') or '').strip()
+    choices = question.get('choices', {})
+    correct = (question.get('answer') or '').upper()
+    rationales = {letter: '' for letter in choices}
+
+    summary = SUMMARY_PATTERN.search(explanation)
+    segments = list(SEGMENT_PATTERN.finditer(explanation, summary.end() if summary else 0))
+
+    if summary:
+        correct_text = explanation[:summary.start()]
+    elif segments:
+        correct_text = explanation[:segments[0].start()]
+    else:
+        correct_text = explanation
+
+    for i, match in enumerate(segments):
+        end = segments[i + 1].start() if i + 1 < len(segments) else len(explanation)
+        text = explanation[match.start():end].strip()
+        for letter in letters_in(match.group(1)):
+            if letter in rationales and letter != correct:
+                rationales[letter] = f"{rationales[letter]} {text}".strip() if rationales[letter] else text
+
+    if summary:
+        # "A, C, and D are incorrect. They are all distractors." covers every listed letter
+        shared = explanation[summary.end():segments[0].start() if segments else len(explanation)].strip()
+        for letter in letters_in(summary.group(0)):
+            if letter in rationales and letter != correct and not rationales[letter]:
+                rationales[letter] = shared
+
+    if correct in rationales:
+        rationales[correct] = correct_text.strip()
+    return rationales
+
+
+def process_bank():
+    """Add 'choice_explanations' to every question and print a validation report"""
+    json_path = Path(__file__).parent.parent / "cism_questions.json"
+
+    print("📖 Loading questions from cism_questions.json...")
+    with open(json_path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+    print(f"✓ Loaded {len(questions)} questions")
+
+    complete = 0
+    partial = []
+    missing_correct = []
+
+    print("\n🔍 Extracting per-choice rationales...")
+    for question in questions:
+        rationales = extract_rationales(question)
+        question['choice_explanations'] = rationales
+
+        correct = (question.get('answer') or '').upper()
+        if not rationales.get(correct):
+            missing_correct.append(question.get('id'))
+        undiscussed = [letter for letter, text in rationales.items() if letter != correct and not text]
+        if undiscussed:
+            partial.append((question.get('id'), undiscussed))
+        elif rationales.get(correct):
+            complete += 1
+
+    print(f"\n📊 Validation report:")
+    print(f"   ✅ Rationale for every choice: {complete}/{len(questions)}")
+    if partial:
+        print(f"   ⚠️  Distractors without a rationale: {len(partial)} question(s)")
+        for question_id, letters in partial[:10]:
+            print(f"      id {question_id}: {', '.join(letters)}")
+        if len(partial) > 10:
+            print(f"      ... and {len(partial) - 10} more")
+    if missing_correct:
+        print(f"   ⚠️  No rationale for the correct answer: ids {', '.join(str(i) for i in missing_correct)}")
+
+    print("\n💾 Saving questions...")
+    assign_ids(questions)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(questions, f, indent=2, ensure_ascii=False)
+    print("✓ Successfully saved to cism_questions.json")
+    record_revision(questions, 'extract_rationales')
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("CISM Questions - Per-Choice Rationales")
+    print("=" * 80 + "\n")
+    process_bank()
+    print("\n" + "=" * 80)
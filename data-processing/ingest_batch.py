@@ -0,0 +1,262 @@
+"""
+CISM Batch PDF Ingestion
+Extracts many practice-exam PDFs in parallel and merges them into one bank with source provenance
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from bank_revisions import assign_ids, record_revision
+from extract_questions_v2 import AdvancedCISMExtractor
+from pdf_backends import BACKENDS, default_backend_for
+
+BASE_DIR = Path(__file__).parent.parent
+STATE_DIR = BASE_DIR / "ingest_state"
+SOURCE_SUFFIXES = ('.pdf', '.txt')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_sources(target):
+    """Source entries {'path', 'backend'} from a directory of PDFs or a JSON manifest.
+
+    A manifest is a list of paths or of {"path": ..., "backend": ...} objects;
+    relative paths are resolved against the manifest's folder.
+    """
+    target = Path(target)
+    if target.is_dir():
+        return [{'path': path, 'backend': None}
+                for path in sorted(target.iterdir()) if path.suffix.lower() in SOURCE_SUFFIXES]
+
+    with open(target, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    sources = []
+    for entry in manifest:
+        if isinstance(entry, str):
+            entry = {'path': entry}
+        path = Path(entry['path'])
+        if not path.is_absolute():
+            path = target.parent / path
+        sources.append({'path': path, 'backend': entry.get('backend')})
+    return sources
+
+
+def extract_file(path, backend, artifact_path):
+    """Worker: extract one source file and write its questions to `artifact_path`"""
+    start = time.perf_counter()
+    extractor = AdvancedCISMExtractor(str(path), backend=backend)
+    # Keep the per-file progress chatter out of the batch output
+    with contextlib.redirect_stdout(io.StringIO()):
+        text = extractor.extract_text_from_pdf()
+        if not text:
+            raise RuntimeError("no text extracted")
+        extractor.parse_questions(text)
+
+    artifact = {
+        'file': Path(path).name,
+        'backend': extractor.backend.name,
+        'pages': extractor.page_count,
+        'questions': extractor.questions
+    }
+    tmp_path = Path(f"{artifact_path}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, ensure_ascii=False)
+    os.replace(tmp_path, artifact_path)
+    return {
+        'questions': len(extractor.questions),
+        'pages': extractor.page_count,
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+
+class BatchIngester:
+    """Extracts sources in worker processes, remembering finished files in a state directory.
+
+    Each finished file leaves an artifact named after its content hash and
+    backend plus an entry in state.json, so a rerun after a failure (or with more files)
+    only extracts what is new or failed.
+    """
+
+    def __init__(self, sources, state_dir=STATE_DIR, workers=None, default_backend=None):
+        self.sources = sources
+        self.state_dir = Path(state_dir)
+        self.state_file = self.state_dir / "state.json"
+        self.workers = workers or os.cpu_count() or 1
+        self.default_backend = default_backend
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.state_file.exists():
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'files': {}}
+
+    def _save_state(self):
+        tmp_path = self.state_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.state_file)
+
+    def _artifact_path(self, key):
+        return self.state_dir / f"{key}.json"
+
+    def _is_done(self, key):
+        entry = self.state['files'].get(key)
+        return entry is not None and entry['status'] == 'done' and self._artifact_path(key).exists()
+
+    def run(self):
+        """Extract every source that isn't done yet; returns the number of failures"""
+        pending = []
+        queued = set()
+        for source in self.sources:
+            source['sha256'] = file_sha256(source['path'])
+            source['backend'] = source['backend'] or self.default_backend or default_backend_for(source['path'])
+            # One artifact per file content and backend
+            source['key'] = f"{source['sha256'][:16]}-{source['backend']}"
+            if self._is_done(source['key']):
+                print(f"   ⏭️  {source['path'].name}: already extracted")
+            elif source['key'] in queued:
+                print(f"   ⏭️  {source['path'].name}: same content as another file in this batch")
+            else:
+                queued.add(source['key'])
+                pending.append(source)
+
+        if not pending:
+            return 0
+
+        print(f"\n⚙️  Extracting {len(pending)} file(s) with {min(self.workers, len(pending))} worker(s)...")
+        failures = 0
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+            futures = {
+                pool.submit(extract_file, source['path'], source['backend'],
+                            self._artifact_path(source['key'])): source
+                for source in pending
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                entry = {'file': str(source['path']), 'backend': source['backend']}
+                try:
+                    entry.update(future.result(), status='done')
+                    print(f"   ✅ {source['path'].name}: {entry['questions']} questions "
+                          f"from {entry['pages']} pages in {entry['seconds']}s")
+                except Exception as exc:
+                    failures += 1
+                    entry.update(status='failed', error=str(exc))
+                    print(f"   ❌ {source['path'].name}: {exc}")
+                self.state['files'][source['key']] = entry
+                self._save_state()
+        return failures
+
+    def merge(self, existing=None, revisions_path=None):
+        """One bank from every source's artifact, in source order.
+
+        Each question records where it came from in 'source' (file and
+        position within that file). Questions that were in `existing`
+        with the same provenance keep their id (and their per-choice
+        rationales while the explanation is unchanged); the rest get ids
+        that were never issued in `revisions_path`'s log.
+        """
+        known = {}
+        for q in existing or []:
+            origin = q.get('source')
+            if isinstance(origin, dict) and isinstance(q.get('id'), int):
+                known[(origin.get('file'), origin.get('position'))] = q
+
+        merged = []
+        for source in self.sources:
+            with open(self._artifact_path(source['key']), 'r', encoding='utf-8') as f:
+                artifact = json.load(f)
+            # Identical files share one artifact, so name the source, not the artifact
+            file_name = source['path'].name
+            for position, q in enumerate(artifact['questions'], 1):
+                q.pop('id', None)
+                q['source'] = {'file': file_name, 'position': position, 'sha256': source['sha256'][:16]}
+                previous = known.get((file_name, position))
+                if previous is None:
+                    merged.append(q)
+                    continue
+                if previous.get('choice_explanations') and previous.get('explanation') == q.get('explanation'):
+                    q['choice_explanations'] = previous['choice_explanations']
+                merged.append({'id': previous['id'], **q})
+        return assign_ids(merged, revisions_path=revisions_path)
+
+
+def revisions_path_for(output):
+    """bank_revisions.json for the CISM bank, <id>_bank_revisions.json for <id>_questions.json"""
+    output = Path(output)
+    if output.name == "cism_questions.json":
+        return output.parent / "bank_revisions.json"
+    stem = output.stem[:-len('_questions')] if output.stem.endswith('_questions') else output.stem
+    return output.parent / f"{stem}_bank_revisions.json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract several practice-exam PDFs in parallel into one bank")
+    parser.add_argument('sources', help="directory of PDFs (.pdf/.txt) or a JSON manifest listing them")
+    parser.add_argument('--output', required=True,
+                        help="bank to write, e.g. ../cisa_questions.json; an existing bank is merged into, "
+                             "and must itself come from ingest_batch.py")
+    parser.add_argument('--backend', choices=list(BACKENDS),
+                        help="text backend for files the manifest doesn't assign one (see pdf_backends.py)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--state-dir', default=str(STATE_DIR),
+                        help="where extracted files are remembered between runs (default: ../ingest_state)")
+    args = parser.parse_args()
+
+    sources = load_sources(args.sources)
+    missing = [str(s['path']) for s in sources if not s['path'].exists()]
+    if missing:
+        print(f"❌ Error: File(s) not found: {', '.join(missing)}")
+        return 1
+    if not sources:
+        print(f"❌ Error: No PDF or text files in {args.sources}")
+        return 1
+
+    output = Path(args.output)
+    existing = []
+    if output.exists():
+        with open(output, 'r', encoding='utf-8') as f:
+            existing = json.load(f)
+        curated = sum(1 for q in existing if not isinstance(q.get('source'), dict))
+        if curated:
+            print(f"❌ Error: {output} has {curated} question(s) that weren't batch-ingested and would be lost; "
+                  f"choose another --output")
+            return 1
+
+    print(f"📚 {len(sources)} source file(s)")
+    ingester = BatchIngester(sources, state_dir=args.state_dir, workers=args.workers, default_backend=args.backend)
+    failures = ingester.run()
+    if failures:
+        print(f"\n⚠️  {failures} file(s) failed; fix them and run again to resume (finished files are kept)")
+        return 1
+
+    print("\n🔗 Merging...")
+    revisions_path = revisions_path_for(output)
+    questions = ingester.merge(existing, revisions_path=revisions_path)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(questions, f, indent=2, ensure_ascii=False)
+    print(f"✓ Saved {len(questions)} questions from {len(sources)} file(s) to {output}")
+    record_revision(questions, 'ingest_batch', revisions_path=revisions_path)
+    return 0
+
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("CISM Batch PDF Ingestion")
+    print("=" * 80 + "\n")
+    exit_code = main()
+    print("\n" + "=" * 80)
+    raise SystemExit(exit_code)
@@ -0,0 +1,127 @@
+"""
+CISM PDF Text Extraction Backends
+Interchangeable page-text extractors (PyPDF2, pypdf, pdfminer layout analysis, pre-extracted text)
+"""
+from pathlib import Path
+
+
+class ExtractionBackend:
+    """Turns a source document into page texts.
+
+    Subclasses set `name` and `package` (what to pip install) and implement
+    pages(); the library is imported there so unused backends cost nothing.
+    """
+
+    name = None
+    package = None
+
+    def available(self):
+        """True if the library this backend needs is installed"""
+        try:
+            self._import()
+            return True
+        except ImportError:
+            return False
+
+    def _import(self):
+        pass
+
+    def pages(self, path):
+        """Yield the text of each page in order"""
+        raise NotImplementedError
+
+
+class PyPDF2Backend(ExtractionBackend):
+    """PyPDF2's extract_text (the original extractor; splits some words: "or ganization")"""
+
+    name = 'pypdf2'
+    package = 'PyPDF2'
+
+    def _import(self):
+        import PyPDF2
+        return PyPDF2
+
+    def pages(self, path):
+        PyPDF2 = self._import()
+        with open(path, 'rb') as file:
+            for page in PyPDF2.PdfReader(file).pages:
+                yield page.extract_text() or ''
+
+
+class PypdfBackend(ExtractionBackend):
+    """pypdf, the maintained successor of PyPDF2"""
+
+    name = 'pypdf'
+    package = 'pypdf'
+
+    def _import(self):
+        import pypdf
+        return pypdf
+
+    def pages(self, path):
+        pypdf = self._import()
+        with open(path, 'rb') as file:
+            for page in pypdf.PdfReader(file).pages:
+                yield page.extract_text() or ''
+
+
+class PdfminerBackend(ExtractionBackend):
+    """pdfminer.six layout analysis: groups characters into lines by position instead of by stream order"""
+
+    name = 'pdfminer'
+    package = 'pdfminer.six'
+
+    def _import(self):
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LAParams, LTTextContainer
+        return extract_pages, LAParams, LTTextContainer
+
+    def pages(self, path):
+        extract_pages, LAParams, LTTextContainer = self._import()
+        for layout in extract_pages(str(path), laparams=LAParams()):
+            yield ''.join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+
+
+class TextBackend(ExtractionBackend):
+    """Text extracted beforehand (e.g. `pdftotext book.pdf book.txt`).
+
+    Accepts a .txt file with form feeds between pages, or a directory
+    holding one .txt file per page (read in name order).
+    """
+
+    name = 'text'
+
+    def pages(self, path):
+        path = Path(path)
+        files = sorted(path.glob('*.txt')) if path.is_dir() else [path]
+        for file in files:
+            with open(file, 'r', encoding='utf-8', errors='replace') as f:
+                content = f.read()
+            if path.is_dir():
+                yield content
+            else:
+                yield from content.rstrip('\f').split('\f')
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend(), PypdfBackend(), PdfminerBackend(), TextBackend())}
+DEFAULT_BACKEND = 'pypdf2'
+
+
+def default_backend_for(path):
+    """'text' for .txt files and page directories, otherwise the default PDF backend"""
+    path = Path(path)
+    return 'text' if path.is_dir() or path.suffix.lower() == '.txt' else DEFAULT_BACKEND
+
+
+def get_backend(name):
+    """Backend by name; raises ValueError if unknown and RuntimeError if its library is missing"""
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"Unknown extraction backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if not backend.available():
+        raise RuntimeError(f"Backend '{name}' needs {backend.package} (pip install {backend.package})")
+    return backend
+
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend.available()]
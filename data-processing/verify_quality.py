@@ -45,6 +45,13 @@ def verify_quality():
             if len(q['choices']) < 4:
                 warnings.append(f"Q{q_num}: Only {len(q['choices'])} choices (expected 4)")
         
+        # Warning: Missing per-choice rationales (run extract_rationales.py)
+        rationales = q.get('choice_explanations')
+        if rationales is None:
+            warnings.append(f"Q{q_num}: No per-choice rationales")
+        elif q.get('choices') and any(not rationales.get(letter) for letter in q['choices']):
+            warnings.append(f"Q{q_num}: Rationale missing for some choices")
+        
         # Warning: Very short explanations
         if len(q.get('explanation', '')) < 50:
             warnings.append(f"Q{q_num}: Explanation is very short ({len(q['explanation'])} chars)")
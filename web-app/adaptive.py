@@ -0,0 +1,182 @@
+"""
+CISM Adaptive Question Selection
+Elo-style ability estimation with a difficulty-sorted question index
+"""
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+SESSION_CACHE_SIZE = 1024         # live sessions kept per index between requests
+
+
+def difficulty_from_stats(attempts, correct):
+    """Rasch difficulty (logit of the error rate), smoothed for sparse data"""
+    return math.log((attempts - correct + 1) / (correct + 1))
+
+
+def probability_correct(ability, difficulty):
+    """Chance a learner of the given ability answers an item correctly"""
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+class DifficultyIndex:
+    """Question ids sorted by estimated difficulty.
+
+    Built once per bank/statistics snapshot and shared by every adaptive
+    session. The Fenwick tree of available positions is shared too; each
+    session only records the decrements its answered questions made, so
+    starting or restoring a session costs O(asked * log n), not O(n).
+    Sessions handed back with remember() are reused by the next request
+    instead of being rebuilt from their stored state.
+    """
+
+    def __init__(self, questions, stats=None):
+        by_id = {s['id']: s for s in (stats or [])}
+        ranked = []
+        for q in questions:
+            s = by_id.get(q['id'])
+            difficulty = difficulty_from_stats(s['attempts'], s['correct']) if s else 0.0
+            ranked.append((difficulty, q['id']))
+        ranked.sort()
+
+        self.difficulties = [d for d, _ in ranked]
+        self.ids = [i for _, i in ranked]
+        self.difficulty_of = {i: d for d, i in ranked}
+        self.position_of = {i: pos for pos, i in enumerate(self.ids)}
+
+        # Fenwick tree with every position available: node i covers lowbit(i) positions
+        size = len(ranked)
+        self._full_tree = array('l', [i & -i for i in range(size + 1)])
+        self._top_bit = 1 << (size.bit_length() - 1) if size else 0
+        self._sessions = OrderedDict()    # session id -> AdaptiveSession, least recently used first
+        self._sessions_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def new_session(self, ability=0.0):
+        return AdaptiveSession(self, ability)
+
+    def restore_session(self, state, session_id=None):
+        """Session for stored AdaptiveSession.to_state(), possibly saved by another instance.
+
+        A session remembered under `session_id` is taken over when it is at
+        the same step as `state`; otherwise the session is rebuilt from it.
+        """
+        with self._sessions_lock:
+            session = self._sessions.pop(session_id, None) if session_id is not None else None
+        asked = state.get('asked', [])
+        if (session is not None and session.answered == state.get('answered', 0)
+                and len(session.asked) == len(asked) and session.asked[-1:] == asked[-1:]):
+            return session
+
+        session = AdaptiveSession(self, state.get('ability', 0.0))
+        session.answered = state.get('answered', 0)
+        session.correct = state.get('correct', 0)
+        for question_id in asked:
+            pos = self.position_of.get(question_id)
+            if pos is not None:
+                session._remove(pos)
+            session.asked.append(question_id)
+        return session
+
+    def remember(self, session_id, session):
+        """Keep a session for the next restore_session() with its id"""
+        with self._sessions_lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > SESSION_CACHE_SIZE:
+                self._sessions.popitem(last=False)
+
+
+class AdaptiveSession:
+    """Tracks one learner's ability estimate and remaining questions"""
+
+    def __init__(self, index, ability=0.0):
+        self.index = index
+        self.ability = ability
+        self.answered = 0
+        self.correct = 0
+        self.remaining = len(index)
+        self.asked = []                   # question ids handed out, in order
+        self._removed = {}                # Fenwick node -> removed positions it covers (lazy decrements)
+
+    def _node(self, i):
+        return self.index._full_tree[i] - self._removed.get(i, 0)
+
+    def _remove(self, pos):
+        i = pos + 1
+        size = len(self.index._full_tree)
+        while i < size:
+            self._removed[i] = self._removed.get(i, 0) + 1
+            i += i & -i
+        self.remaining -= 1
+
+    def _available_before(self, pos):
+        total = 0
+        i = pos
+        while i > 0:
+            total += self._node(i)
+            i -= i & -i
+        return total
+
+    def _kth_available(self, k):
+        """Position of the k-th (1-based) still-available question"""
+        pos = 0
+        size = len(self.index._full_tree)
+        step = self.index._top_bit
+        while step:
+            nxt = pos + step
+            if nxt < size:
+                count = self._node(nxt)
+                if count < k:
+                    pos = nxt
+                    k -= count
+            step >>= 1
+        return pos
+
+    def next_question(self):
+        """Pick the unanswered question closest in difficulty to the ability estimate.
+
+        Under the Rasch model an item is most informative when its difficulty
+        matches the learner's ability, so this is the maximum-information pick.
+        Returns the question id, or None once the bank is exhausted.
+        """
+        if self.remaining == 0:
+            return None
+        difficulties = self.index.difficulties
+        target = bisect_left(difficulties, self.ability)
+        before = self._available_before(target)
+
+        candidates = []
+        if before > 0:
+            candidates.append(self._kth_available(before))
+        if before < self.remaining:
+            candidates.append(self._kth_available(before + 1))
+        pos = min(candidates, key=lambda p: abs(difficulties[p] - self.ability))
+
+        self._remove(pos)
+        self.asked.append(self.index.ids[pos])
+        return self.index.ids[pos]
+
+    def record(self, question_id, is_correct):
+        """Update the ability estimate after an answer (Elo step with decaying gain)"""
+        difficulty = self.index.difficulty_of.get(question_id, 0.0)
+        expected = probability_correct(self.ability, difficulty)
+        gain = max(0.3, 1.5 / math.sqrt(self.answered + 1))
+        self.ability += gain * ((1.0 if is_correct else 0.0) - expected)
+        self.answered += 1
+        if is_correct:
+            self.correct += 1
+        return self.ability
+
+    def to_state(self):
+        """Plain data for storing the session outside this process"""
+        return {
+            'ability': self.ability,
+            'answered': self.answered,
+            'correct': self.correct,
+            'asked': list(self.asked)
+        }
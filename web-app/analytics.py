@@ -0,0 +1,246 @@
+"""
+CISM Quiz Answer Analytics
+Columnar store of answer events with per-question difficulty and distractor statistics
+"""
+import atexit
+import math
+import threading
+import time
+from array import array
+
+from storage import DEFAULT_BANK
+
+CHOICE_LETTERS = "ABCD"
+
+# Longer than this is a tab left open, not time spent on the question
+MAX_LATENCY_MS = 24 * 60 * 60 * 1000
+
+
+def clean_latency(latency_ms):
+    """Milliseconds as an int clamped to 0..MAX_LATENCY_MS, or None if not a finite number"""
+    if isinstance(latency_ms, bool) or not isinstance(latency_ms, (int, float)):
+        return None
+    if not math.isfinite(latency_ms) or latency_ms < 0:
+        return None
+    return int(min(latency_ms, MAX_LATENCY_MS))
+
+
+class AnswerStore:
+    """Answer events kept as parallel typed arrays.
+
+    The answers in the state backend are the source of truth; each column here
+    holds one field of every stored event (question id, chosen letter,
+    correctness, latency, timestamp). New events are buffered and inserted in
+    batches, rows written by other processes are picked up incrementally by
+    rowid, and per-question aggregates are folded from the rows added since
+    the last fold, so reading statistics never rescans the full history.
+    With a `writer` (write_queue.WriteBehindQueue) each event is handed to
+    its worker thread as it is recorded, so it is stored within the queue's
+    flush interval even if no further answer arrives; `batch_size` and
+    `flush_interval` only apply to direct inserts.
+    """
+
+    def __init__(self, storage=None, source=None, batch_size=256, flush_interval=2.0, bank=DEFAULT_BANK,
+                 writer=None):
+        self.storage = storage
+        self.writer = writer
+        self.source = source
+        self.bank = bank
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+
+        # Event columns
+        self.question_col = array('i')
+        self.choice_col = array('b')      # index into CHOICE_LETTERS, -1 if unknown
+        self.correct_col = array('b')
+        self.latency_col = array('l')     # milliseconds, -1 if not measured
+        self.timestamp_col = array('d')
+        self._last_row_id = 0             # newest answers rowid copied into the columns
+
+        # Aggregate columns, one slot per question id
+        self._slots = {}
+        self._attempts = array('l')
+        self._correct = array('l')
+        self._latency_sum = array('q')
+        self._latency_count = array('l')
+        self._picks = array('l')          # len(CHOICE_LETTERS) counters per slot
+        self._aggregated = 0              # rows already folded into the aggregates
+
+        self._pending = []                # events not yet written to storage
+        self._pending_since = None
+        self._listeners = []              # called with (question id, correct) for every folded row
+
+        self._sync()
+        self._aggregate()
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self.question_col) + len(self._pending)
+
+    def _append(self, question, choice, correct, latency_ms, timestamp):
+        letter = (choice or '').upper()
+        self.question_col.append(int(question))
+        self.choice_col.append(CHOICE_LETTERS.index(letter) if len(letter) == 1 and letter in CHOICE_LETTERS else -1)
+        self.correct_col.append(1 if correct else 0)
+        latency_ms = clean_latency(latency_ms)
+        self.latency_col.append(latency_ms if latency_ms is not None else -1)
+        self.timestamp_col.append(float(timestamp))
+
+    def _sync(self):
+        """Copy answer rows added to storage since the last sync into the columns"""
+        if self.storage is None:
+            return
+        for row in self.storage.answers_since(self._last_row_id, bank=self.bank):
+            self._append(row['question_id'], row['choice'], row['correct'],
+                         row['latency_ms'], row['answered_at'])
+            self._last_row_id = row['id']
+
+    def record(self, question, choice, correct, latency_ms=None, timestamp=None):
+        """Record a single answer event for the question with the given bank id.
+
+        `latency_ms` is clamped to MAX_LATENCY_MS; anything but a finite,
+        non-negative number is recorded as not measured.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        latency_ms = clean_latency(latency_ms)
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append((int(question), (choice or '').upper(), 1 if correct else 0,
+                                  latency_ms, timestamp, self.source, self.bank))
+            # The writer batches on its own interval, so nothing waits here for a later answer to flush it
+            if (self.writer is not None or len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._pending_since >= self.flush_interval):
+                self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        if self.storage is None:
+            # No database: keep events in memory only
+            for event in self._pending:
+                self._append(*event[:5])
+        else:
+            try:
+                (self.writer or self.storage).record_answers(self._pending)
+            except Exception as exc:
+                print(f"Error saving answer events: {exc}")
+                return
+        self._pending = []
+        self._pending_since = None
+
+    def _persist(self):
+        """Write pending events and wait until the writer has stored them"""
+        self._write_pending()
+        if self.writer is not None:
+            self.writer.flush()
+
+    def flush(self):
+        """Write pending events to storage and bring the aggregates up to date"""
+        with self._lock:
+            self._persist()
+            self._sync()
+            self._aggregate()
+
+    def refresh(self):
+        """Hand pending events to the writer and fold in the rows already stored, without waiting on the writer"""
+        with self._lock:
+            self._write_pending()
+            self._sync()
+            self._aggregate()
+
+    def close(self):
+        """Flush and stop listening for interpreter exit (for stores that are dropped early)"""
+        self.flush()
+        atexit.unregister(self.flush)
+
+    def _slot(self, question):
+        slot = self._slots.get(question)
+        if slot is None:
+            slot = len(self._attempts)
+            self._slots[question] = slot
+            self._attempts.append(0)
+            self._correct.append(0)
+            self._latency_sum.append(0)
+            self._latency_count.append(0)
+            self._picks.extend([0] * len(CHOICE_LETTERS))
+        return slot
+
+    def _aggregate(self):
+        """Fold rows recorded since the last call into the per-question counters"""
+        width = len(CHOICE_LETTERS)
+        end = len(self.question_col)
+        for row in range(self._aggregated, end):
+            slot = self._slot(self.question_col[row])
+            self._attempts[slot] += 1
+            self._correct[slot] += self.correct_col[row]
+            latency = self.latency_col[row]
+            if latency >= 0:
+                self._latency_sum[slot] += latency
+                self._latency_count[slot] += 1
+            choice = self.choice_col[row]
+            if choice >= 0:
+                self._picks[slot * width + choice] += 1
+            for listener in self._listeners:
+                listener(self.question_col[row], self.correct_col[row])
+        self._aggregated = end
+
+    def subscribe(self, listener):
+        """Feed every answer so far, then each new one, to listener(question_id, correct)"""
+        with self._lock:
+            self._persist()
+            self._sync()
+            self._aggregate()
+            for row in range(self._aggregated):
+                listener(self.question_col[row], self.correct_col[row])
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def columns(self):
+        """Copies of the event columns (question, choice, correct, latency, timestamp) for bulk analytics"""
+        with self._lock:
+            self._persist()
+            self._sync()
+            # Copies, so a reader holding a buffer never blocks the columns from growing
+            return {
+                'question': array('i', self.question_col),
+                'choice': array('b', self.choice_col),
+                'correct': array('b', self.correct_col),
+                'latency': array('l', self.latency_col),
+                'timestamp': array('d', self.timestamp_col)
+            }
+
+    def question_stats(self):
+        """Per-question difficulty, pick rates and average time-to-answer"""
+        with self._lock:
+            self._persist()
+            self._sync()
+            self._aggregate()
+            width = len(CHOICE_LETTERS)
+            stats = []
+            for question in sorted(self._slots):
+                slot = self._slots[question]
+                attempts = self._attempts[slot]
+                correct = self._correct[slot]
+                p_value = correct / attempts if attempts else 0.0
+                picks = self._picks[slot * width:(slot + 1) * width]
+                latency_count = self._latency_count[slot]
+                stats.append({
+                    'id': question,
+                    'attempts': attempts,
+                    'correct': correct,
+                    'p_value': round(p_value, 4),
+                    'difficulty': round(1 - p_value, 4),
+                    'pick_rates': {
+                        letter: round(picks[i] / attempts, 4) if attempts else 0.0
+                        for i, letter in enumerate(CHOICE_LETTERS)
+                    },
+                    'avg_latency_ms': round(self._latency_sum[slot] / latency_count) if latency_count else None,
+                })
+            return stats
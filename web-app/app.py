@@ -2,110 +2,281 @@
 CISM Web-based Quiz Application
 Flask app for interactive browser-based quizzing
 """
-from flask import Flask, render_template, jsonify, request
-import json
-from pathlib import Path
-from datetime import datetime
-import random
+from flask import Flask, Blueprint, current_app, g, render_template, jsonify, request, send_from_directory, abort, make_response
+from werkzeug.local import LocalProxy
+import argparse
 import os
+import random
+import sys
+import uuid
 
-app = Flask(__name__)
-app.config['JSON_SORT_KEYS'] = False
+from storage import open_storage, DEFAULT_BANK
+from banks import BankRegistry
+from write_queue import WriteBehindQueue
 
-# Get the directory where the app is running
-BASE_DIR = Path(__file__).parent.parent
-QUESTIONS_FILE = BASE_DIR / "cism_questions.json"
-CHAPTERS_FILE = BASE_DIR / "chapter_overviews.json"
-questions = []
-chapters = []
+quiz = Blueprint('quiz', __name__)
 
-# Track file modification times for smart caching
-_questions_mtime = None
-_chapters_mtime = None
+# Banks loaded (and their question list serialized) before the first request:
+# comma-separated bank ids, or "none" to load every bank on first use
+PREWARM_BANKS = os.environ.get('QUIZ_PREWARM', DEFAULT_BANK)
 
-def load_questions():
-    """Load questions from JSON file if modified or not loaded"""
-    global questions, _questions_mtime
-    try:
-        if QUESTIONS_FILE.exists():
-            current_mtime = os.path.getmtime(QUESTIONS_FILE)
-            # Only reload if file was modified or hasn't been loaded yet
-            if _questions_mtime is None or current_mtime != _questions_mtime:
-                with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                    questions = json.load(f)
-                _questions_mtime = current_mtime
-                print(f"✓ Loaded {len(questions)} questions from {QUESTIONS_FILE}")
-    except FileNotFoundError:
-        print(f"Warning: {QUESTIONS_FILE} not found!")
-        questions = []
-    except json.JSONDecodeError:
-        print(f"Error: Invalid JSON in {QUESTIONS_FILE}")
-        questions = []
-
-# Load questions on startup
-load_questions()
-
-def load_chapters():
-    """Load chapter overviews if available and not already cached"""
-    global chapters, _chapters_mtime
-    try:
-        if CHAPTERS_FILE.exists():
-            current_mtime = os.path.getmtime(CHAPTERS_FILE)
-            # Only reload if file was modified or hasn't been loaded yet
-            if _chapters_mtime is None or current_mtime != _chapters_mtime:
-                with open(CHAPTERS_FILE, 'r', encoding='utf-8') as f:
-                    chapters = json.load(f)
-                _chapters_mtime = current_mtime
-                print(f"✓ Loaded {len(chapters)} chapters from {CHAPTERS_FILE}")
+# Adaptive quiz sessions live in the state backend so any instance can continue them
+ADAPTIVE_SESSION_TTL = 2 * 60 * 60
+
+
+def create_app(prewarm=None):
+    """Build the Flask app; nothing is opened or loaded until this is called.
+
+    `prewarm` is a list of bank ids to load now, True for the default bank,
+    False for none (everything loads on first request) or None for
+    QUIZ_PREWARM.
+    """
+    if prewarm is None:
+        prewarm = [b.strip() for b in PREWARM_BANKS.split(',') if b.strip() and b.strip() != 'none']
+    elif prewarm is True:
+        prewarm = [DEFAULT_BANK]
+    elif prewarm is False:
+        prewarm = []
+
+    app = Flask(__name__)
+    app.config['JSON_SORT_KEYS'] = False
+
+    # Results, progress, sessions and answer history (shared with the CLI and,
+    # with QUIZ_STATE_BACKEND=redis, with every other app instance)
+    state_backend = open_storage()
+    # Results, progress and answer events are written behind the request by a
+    # background thread (QUIZ_FSYNC_POLICY sets how often batches are fsynced)
+    write_queue = WriteBehindQueue(state_backend)
+    # Question banks (CISM, CISA, CRISC, ...), each loaded on first use
+    registry = BankRegistry(state_backend, writer=write_queue)
+    app.extensions['quiz'] = {'storage': state_backend, 'writes': write_queue, 'banks': registry}
+
+    for bank_id in prewarm:
+        bank = registry.get(bank_id)
+        if bank is None:
+            print(f"Warning: cannot prewarm unknown bank '{bank_id}'")
         else:
-            chapters = []
-    except Exception as exc:
-        print(f"Warning loading chapters: {exc}")
-        chapters = []
+            bank.prewarm()
+            registry.release(bank)
+
+    app.register_blueprint(quiz)
+    return app
 
-# Load chapters on startup
-load_chapters()
 
-@app.route('/')
-def index():
-    """Serve the main quiz page"""
-    return render_template('quiz.html')
+# State of the app handling the current request
+storage = LocalProxy(lambda: current_app.extensions['quiz']['storage'])
+writes = LocalProxy(lambda: current_app.extensions['quiz']['writes'])
+banks = LocalProxy(lambda: current_app.extensions['quiz']['banks'])
+
+def get_bank(bank_id):
+    """Return the requested bank (held until the request ends) or abort with a JSON 404"""
+    bank = banks.get(bank_id)
+    if bank is None:
+        abort(make_response(jsonify({'error': f'Unknown question bank: {bank_id}'}), 404))
+    g.setdefault('quiz_banks', []).append(bank)
+    return bank
+
+@quiz.teardown_request
+def release_banks(exc):
+    """Let the banks this request used be unloaded again"""
+    for bank in g.pop('quiz_banks', []):
+        banks.release(bank)
+
+def json_body(body):
+    """Response for JSON that was already serialized"""
+    return current_app.response_class(body, mimetype='application/json')
+
+def cached_json(body, etag):
+    """Pre-serialized JSON that clients revalidate by ETag (304 when unchanged)"""
+    response = json_body(body)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+@quiz.route('/', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/banks/<bank_id>/')
+def index(bank_id):
+    """Serve the main quiz page for a bank"""
+    bank = get_bank(bank_id)
+    api_base = '/api' if bank_id == DEFAULT_BANK else f'/api/banks/{bank_id}'
+    return render_template('quiz.html', bank_id=bank.id, bank_title=bank.title, api_base=api_base)
+
+@quiz.route('/sw.js')
+def service_worker():
+    """Serve the service worker from the site root so it controls every page"""
+    response = send_from_directory(current_app.static_folder, 'sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@quiz.route('/api/banks')
+def list_banks():
+    """Known question banks and which of them are loaded"""
+    return jsonify({
+        'banks': banks.summary(),
+        'memory_estimate': banks.memory_estimate(),
+        'backend': storage.__class__.__name__,
+        'memory_budget': banks.memory_budget
+    })
 
-@app.route('/api/chapters')
-def get_chapters():
+@quiz.route('/api/chapters', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/chapters')
+def get_chapters(bank_id):
     """API endpoint to get chapter overviews"""
     # Load/reload chapters if file has been modified
-    load_chapters()
+    bank = get_bank(bank_id)
     
-    response = jsonify({
-        'chapters': chapters,
-        'total': len(chapters)
+    body, etag = bank.serialized('chapters', lambda: {
+        'chapters': bank.chapters,
+        'total': len(bank.chapters)
     })
-    # Prevent stale caching of chapter content
-    response.headers['Cache-Control'] = 'no-store'
-    return response
+    return cached_json(body, etag)
+
+@quiz.route('/api/chapters/summary', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/chapters/summary')
+def get_chapter_summary(bank_id):
+    """Chapter numbers, titles, domain weighting and question counts without the overview text"""
+    bank = get_bank(bank_id)
+    body, etag = bank.serialized('chapters-summary', lambda: {
+        'chapters': bank.chapter_summary,
+        'total': len(bank.chapter_summary),
+        'total_questions': len(bank.questions)
+    })
+    return cached_json(body, etag)
+
+@quiz.route('/api/chapters/<int:number>', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/chapters/<int:number>')
+def get_chapter(bank_id, number):
+    """One chapter with its full overview"""
+    bank = get_bank(bank_id)
+    chapter = bank.chapters_by_number.get(number)
+    if chapter is None:
+        return jsonify({'error': 'Chapter not found'}), 404
+    summary = next((c for c in bank.chapter_summary if c['chapter'] == number), {})
+    body, etag = bank.serialized(f'chapter-{number}', lambda: {**chapter, **summary})
+    return cached_json(body, etag)
 
-@app.route('/api/questions')
-def get_questions():
-    """API endpoint to get all questions"""
+@quiz.route('/api/questions', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/questions')
+def get_questions(bank_id):
+    """API endpoint to get all questions, or only those listed in ?ids=1,2,3"""
     # Load/reload questions if file has been modified
-    load_questions()
+    bank = get_bank(bank_id)
+    
+    ids = request.args.get('ids')
+    if ids:
+        try:
+            wanted = [int(i) for i in ids.split(',') if i.strip()]
+        except ValueError:
+            return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+        selected = [bank.questions_by_id[i] for i in wanted if i in bank.questions_by_id]
+        response = jsonify({
+            'questions': selected,
+            'total': len(selected),
+            'version': bank.version
+        })
+    else:
+        # The whole bank is serialized once per version
+        body, _ = bank.questions_body()
+        response = json_body(body)
+    # Let clients revalidate against the bank version instead of re-downloading
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(f"{bank.id}-{bank.version}-{ids or 'all'}")
+    return response.make_conditional(request)
+
+@quiz.route('/api/questions/<int:question_id>/related', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/questions/<int:question_id>/related')
+def get_related_questions(bank_id, question_id):
+    """Most similar questions by id, from the index built offline (no similarity work per request)"""
+    bank = get_bank(bank_id)
+    cached = bank.related_questions(question_id)
+    if cached is None:
+        return jsonify({'error': 'Question not found'}), 404
+    return cached_json(*cached)
+
+@quiz.route('/api/questions/manifest', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/questions/manifest')
+def get_questions_manifest(bank_id):
+    """Bank version plus per-question content hashes for incremental client sync"""
+    bank = get_bank(bank_id)
+    revision = bank.current_revision()
+    
+    body, _ = bank.serialized(f'manifest-{revision}', lambda: {
+        'version': bank.version,
+        'revision': revision,
+        'total': len(bank.questions),
+        'order': [q['id'] for q in bank.questions],
+        'hashes': {str(question_id): h for question_id, h in bank.question_hashes.items()}
+    })
+    response = json_body(body)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(f"{bank.id}-{bank.version}-{revision}")
+    return response.make_conditional(request)
+
+@quiz.route('/api/questions/changes', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/questions/changes')
+def get_question_changes(bank_id):
+    """Questions added, changed and removed since bank revision ?since=<rev>"""
+    try:
+        since = int(request.args.get('since', ''))
+    except ValueError:
+        return jsonify({'error': 'since must be a revision number'}), 400
+    
+    bank = get_bank(bank_id)
+    revision = bank.current_revision()
+    if revision is None or since < 0 or since > revision:
+        # Unknown starting point: the client has to take the whole bank
+        response = jsonify({
+            'revision': revision,
+            'since': since,
+            'full': True,
+            'questions': bank.questions,
+            'total': len(bank.questions)
+        })
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    # The first log event for an id tells whether it existed at `since`
+    existed_before = {}
+    for entry in bank.revisions.get('log', []):
+        if entry['revision'] <= since:
+            continue
+        for question_id in entry.get('added', []):
+            existed_before.setdefault(question_id, False)
+        for question_id in entry.get('changed', []) + entry.get('removed', []):
+            existed_before.setdefault(question_id, True)
+    
+    added, changed, removed = [], [], []
+    for question_id in sorted(existed_before):
+        question = bank.questions_by_id.get(question_id)
+        if question is None:
+            if existed_before[question_id]:
+                removed.append(question_id)
+        elif existed_before[question_id]:
+            changed.append(question)
+        else:
+            added.append(question)
     
     response = jsonify({
-        'questions': questions,
-        'total': len(questions)
+        'revision': revision,
+        'since': since,
+        'full': False,
+        'added': added,
+        'changed': changed,
+        'removed': removed,
+        'order': [q['id'] for q in bank.questions] if (added or removed) else None
     })
-    # Prevent stale caching of questions
-    response.headers['Cache-Control'] = 'no-store'
-    return response
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(f"{bank.id}-{revision}-{since}")
+    return response.make_conditional(request)
 
-@app.route('/api/questions/shuffled')
-def get_shuffled_questions():
+@quiz.route('/api/questions/shuffled', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/questions/shuffled')
+def get_shuffled_questions(bank_id):
     """API endpoint to get shuffled questions"""
     # Load/reload questions if file has been modified
-    load_questions()
+    bank = get_bank(bank_id)
     
-    shuffled = questions.copy()
+    shuffled = bank.questions.copy()
     random.shuffle(shuffled)
     response = jsonify({
         'questions': shuffled,
@@ -115,15 +286,17 @@ def get_shuffled_questions():
     response.headers['Cache-Control'] = 'no-store'
     return response
 
-@app.route('/api/check-answer', methods=['POST'])
-def check_answer():
+@quiz.route('/api/check-answer', methods=['POST'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/check-answer', methods=['POST'])
+def check_answer(bank_id):
     """API endpoint to check if answer is correct"""
+    bank = get_bank(bank_id)
     data = request.get_json()
     question_id = data.get('question_id')
     user_answer = data.get('answer', '').upper()
     
     # Find the question
-    question = next((q for q in questions if q['number'] == question_id), None)
+    question = bank.questions_by_id.get(question_id)
     
     if not question:
         return jsonify({'error': 'Question not found'}), 404
@@ -135,25 +308,22 @@ def check_answer():
     
     is_correct = (user_answer == correct_answer) if correct_answer else False
     
-    # Build explanations for all choices (if present)
-    choice_explanations = {}
+    # Record the answer event for analytics
+    bank.answer_store.record(
+        question_id,
+        user_answer,
+        is_correct,
+        latency_ms=data.get('latency_ms')
+    )
+    
+    # Per-choice rationales are extracted at build time (data-processing/extract_rationales.py);
+    # banks without them get the main explanation for the correct choice
     choices = question.get('choices', {})
     explanation = question.get('explanation', '') or 'No explanation available.'
-    # If explanation contains breakdowns for each choice, parse them (future-proof)
-    # For now, use the main explanation for correct, and the distractor text for wrong answers if present
-    for key, value in choices.items():
-        # If the value contains explanation for wrong answers, use it
-        if key == correct_answer:
-            # For correct answer, use main explanation
-            choice_explanations[key] = explanation
-        else:
-            # For distractors, if explanation is embedded in value, extract after a period
-            if '. ' in value:
-                # Take the part after the first period as explanation
-                parts = value.split('. ', 1)
-                choice_explanations[key] = parts[1].strip() if len(parts) > 1 else ''
-            else:
-                choice_explanations[key] = ''
+    choice_explanations = {key: '' for key in choices}
+    choice_explanations.update(question.get('choice_explanations') or {})
+    if correct_answer and not choice_explanations.get(correct_answer) and question.get('explanation'):
+        choice_explanations[correct_answer] = question['explanation']
 
     return jsonify({
         'correct': is_correct,
@@ -163,86 +333,190 @@ def check_answer():
         'choice_explanations': choice_explanations
     })
 
-@app.route('/api/save-result', methods=['POST'])
-def save_result():
-    """Save quiz result to file"""
-    data = request.get_json()
-    score = data.get('score', 0)
-    total = data.get('total', 0)
-    
-    results_file = BASE_DIR / "quiz_results.txt"
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    percentage = (score / total * 100) if total > 0 else 0
+@quiz.route('/api/save-result', methods=['POST'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/save-result', methods=['POST'])
+def save_result(bank_id):
+    """Save quiz result"""
+    data = request.get_json(silent=True) or {}
+    score = data.get('score')
+    total = data.get('total')
+    # A value the database rejects would otherwise fail in the write queue, long after this response
+    if (not all(isinstance(n, int) and not isinstance(n, bool) for n in (score, total))
+            or not 0 <= score <= total):
+        return jsonify({'error': 'score and total must be integers with 0 <= score <= total'}), 400
+    bank = get_bank(bank_id)
+    incorrect = data.get('incorrect')
+    answered = data.get('answered')
+    # Cohort reports read these back as question ids of this bank
+    for ids in (incorrect, answered):
+        if ids is not None and not (isinstance(ids, list) and all(
+                isinstance(i, int) and not isinstance(i, bool) and i in bank.questions_by_id for i in ids)):
+            return jsonify({'error': 'incorrect and answered must be lists of question ids of this bank'}), 400
     
-    with open(results_file, 'a', encoding='utf-8') as f:
-        f.write(f"\n{'=' * 80}\n")
-        f.write(f"Quiz Date: {timestamp}\n")
-        f.write(f"Score: {score}/{total} ({percentage:.1f}%)\n")
-        f.write(f"{'=' * 80}\n")
+    writes.save_result(score=score, total=total, incorrect=incorrect, source='web', bank=bank.id, answered=answered)
     
     return jsonify({'success': True})
 
-@app.route('/api/statistics')
-def get_statistics():
-    """Get quiz statistics from results file"""
-    results_file = BASE_DIR / "quiz_results.txt"
-    
-    if not results_file.exists():
-        return jsonify({'results': [], 'total': 0})
-    
-    results = []
+@quiz.route('/api/statistics', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/statistics')
+def get_statistics(bank_id):
+    """Get quiz statistics, most recent first"""
+    bank = get_bank(bank_id)
     try:
-        with open(results_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # Parse results - each result is between separator lines
-        entries = content.split('=' * 80)
-        for entry in entries:
-            entry = entry.strip()
-            if not entry:
-                continue
-                
-            lines = entry.split('\n')
-            result = {}
-            for line in lines:
-                if line.startswith('Quiz Date:'):
-                    result['date'] = line.replace('Quiz Date:', '').strip()
-                elif line.startswith('Score:'):
-                    # Parse "Score: 25/50 (50.0%)"
-                    score_part = line.replace('Score:', '').strip()
-                    if '(' in score_part:
-                        score_str, pct_str = score_part.split('(')
-                        result['score_display'] = score_str.strip()
-                        result['percentage'] = pct_str.replace(')', '').strip()
-                        # Extract numeric values
-                        if '/' in score_str:
-                            score, total = score_str.split('/')
-                            result['score'] = int(score.strip())
-                            result['total'] = int(total.strip())
-            
-            if result.get('date'):
-                results.append(result)
-        
-        # Reverse to show most recent first
-        results.reverse()
-        
+        writes.flush()
+        results = storage.get_results(bank=bank.id)
     except Exception as e:
         print(f"Error reading statistics: {e}")
         return jsonify({'results': [], 'total': 0, 'error': str(e)})
     
     return jsonify({'results': results, 'total': len(results)})
 
-@app.route('/api/progress', methods=['GET', 'POST'])
-def manage_progress():
-    """Get or save quiz progress"""
-    PROGRESS_FILE = BASE_DIR / "quiz_progress.json"
+@quiz.route('/api/statistics/report', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/statistics/report')
+def get_cohort_report(bank_id):
+    """Score distribution, pass-rate projection, question discrimination and trends (?period=day|week|month)"""
+    bank = get_bank(bank_id)
+    period = request.args.get('period', 'week')
+    if period not in ('day', 'week', 'month'):
+        return jsonify({'error': 'period must be one of day, week, month'}), 400
+    writes.flush()
+    return jsonify(bank.cohort_store.report(question_ids=[q['id'] for q in bank.questions],
+                                            answer_store=bank.answer_store, period=period))
+
+@quiz.route('/api/analytics/questions', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/analytics/questions')
+def get_question_analytics(bank_id):
+    """Per-question difficulty, distractor pick rates and time-to-answer"""
+    bank = get_bank(bank_id)
+    stats = bank.answer_store.question_stats()
+    for entry in stats:
+        question = bank.questions_by_id.get(entry['id'])
+        entry['number'] = question['number'] if question else None
+    return jsonify({
+        'questions': stats,
+        'total': len(stats),
+        'total_answers': len(bank.answer_store)
+    })
+
+@quiz.route('/api/drill', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/drill')
+def get_drill(bank_id):
+    """A quiz drawn from the questions and chapters answered wrong most often"""
+    try:
+        count = int(request.args.get('count', 20))
+    except ValueError:
+        return jsonify({'error': 'count must be an integer'}), 400
+    
+    bank = get_bank(bank_id)
+    tracker = bank.weak_area_tracker()
+    drill = [bank.questions_by_id[question_id] for question_id in tracker.drill(max(count, 1))]
+    response = jsonify({
+        'questions': drill,
+        'total': len(drill)
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@quiz.route('/api/weak-areas', defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/weak-areas')
+def get_weak_areas(bank_id):
+    """Per-chapter and per-question error rates across all stored answers"""
+    return jsonify(get_bank(bank_id).weak_area_tracker().weak_areas())
+
+@quiz.route('/api/adaptive/start', methods=['POST'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/adaptive/start', methods=['POST'])
+def start_adaptive_quiz(bank_id):
+    """Start an adaptive quiz session and return its first question"""
+    data = request.get_json(silent=True) or {}
+    try:
+        count = int(data['count']) if data.get('count') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'count must be a positive integer'}), 400
+    if count is not None and count <= 0:
+        return jsonify({'error': 'count must be a positive integer'}), 400
+    bank = get_bank(bank_id)
+    index = bank.difficulty_index()
+    limit = count or len(index)
     
+    session = index.new_session()
+    session_id = uuid.uuid4().hex
+    first = session.next_question()
+    storage.save_session(session_id, {
+        'type': 'adaptive',
+        'bank': bank.id,
+        'limit': limit,
+        'current': first,
+        **session.to_state()
+    }, ADAPTIVE_SESSION_TTL)
+    index.remember(session_id, session)
+    
+    return jsonify({
+        'session_id': session_id,
+        'question': bank.questions_by_id.get(first),
+        'ability': session.ability,
+        'total': min(limit, len(index))
+    })
+
+@quiz.route('/api/adaptive/answer', methods=['POST'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/adaptive/answer', methods=['POST'])
+def answer_adaptive_question(bank_id):
+    """Grade an adaptive answer, update the ability estimate and pick the next question"""
+    data = request.get_json(silent=True) or {}
+    user_answer = (data.get('answer') or '').upper()
+    session_id = data.get('session_id')
+    bank = get_bank(bank_id)
+    
+    state = storage.get_session(session_id) if isinstance(session_id, str) else None
+    if not state or state.get('type') != 'adaptive' or state.get('bank') != bank.id:
+        return jsonify({'error': 'Adaptive session not found'}), 404
+    question = bank.questions_by_id.get(state['current'])
+    if not question:
+        return jsonify({'error': 'Adaptive quiz already finished'}), 409
+    
+    index = bank.difficulty_index()
+    session = index.restore_session(state, session_id)
+    correct_answer = (question.get('answer') or '').upper()
+    is_correct = (user_answer == correct_answer) if correct_answer else False
+    session.record(question['id'], is_correct)
+    next_id = session.next_question() if session.answered < state['limit'] else None
+    if next_id is None:
+        storage.delete_session(session_id)
+    else:
+        storage.save_session(session_id, {**state, 'current': next_id, **session.to_state()},
+                             ADAPTIVE_SESSION_TTL)
+        index.remember(session_id, session)
+    
+    bank.answer_store.record(
+        question['id'],
+        user_answer,
+        is_correct,
+        latency_ms=data.get('latency_ms')
+    )
+    
+    return jsonify({
+        'correct': is_correct,
+        'correct_answer': correct_answer,
+        'explanation': question.get('explanation', '') or 'No explanation available.',
+        'ability': session.ability,
+        'answered': session.answered,
+        'score': session.correct,
+        'next_question': bank.questions_by_id.get(next_id),
+        'finished': next_id is None
+    })
+
+@quiz.route('/api/progress', methods=['GET', 'POST'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/progress', methods=['GET', 'POST'])
+def manage_progress(bank_id):
+    """Get or save quiz progress"""
+    bank = get_bank(bank_id)
     if request.method == 'GET':
         # Return saved progress
         try:
-            if PROGRESS_FILE.exists():
-                with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                    progress = json.load(f)
+            # A save still in the write queue is newer than what storage has
+            queued, progress = writes.pending_progress(key=bank.progress_key)
+            if not queued:
+                progress = storage.get_progress(key=bank.progress_key)
+            if progress is not None:
                 return jsonify({'progress': progress, 'found': True})
         except Exception as e:
             print(f"Error reading progress: {e}")
@@ -251,29 +525,57 @@ def manage_progress():
     elif request.method == 'POST':
         # Save progress
         try:
-            data = request.json
-            with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
+            writes.save_progress(request.json, key=bank.progress_key)
             print(f"✓ Saved quiz progress")
             return jsonify({'success': True, 'message': 'Progress saved'})
         except Exception as e:
             print(f"Error saving progress: {e}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/progress/clear', methods=['DELETE'])
-def clear_progress():
+@quiz.route('/api/progress/clear', methods=['DELETE'], defaults={'bank_id': DEFAULT_BANK})
+@quiz.route('/api/banks/<bank_id>/progress/clear', methods=['DELETE'])
+def clear_progress(bank_id):
     """Clear saved progress"""
-    PROGRESS_FILE = BASE_DIR / "quiz_progress.json"
+    bank = get_bank(bank_id)
     try:
-        if PROGRESS_FILE.exists():
-            PROGRESS_FILE.unlink()
+        writes.clear_progress(key=bank.progress_key)
         print(f"✓ Cleared quiz progress")
         return jsonify({'success': True, 'message': 'Progress cleared'})
     except Exception as e:
         print(f"Error clearing progress: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@quiz.route('/api/metrics/write-queue')
+def get_write_queue_metrics():
+    """Write-behind queue depth, batch sizes and flush latency"""
+    return jsonify(writes.metrics())
+
+def profile_startup(output, budget_ms=None):
+    """Profile import and create_app(prewarm=True) and write the report as JSON"""
+    from startup_profile import profile_startup as run_profile
+
+    def start():
+        app = create_app(prewarm=True)
+        state = app.extensions['quiz']
+        bank = state['banks'].get(DEFAULT_BANK)
+        state['writes'].close()
+        return {'banks': {bank.id: {'questions': len(bank.questions), **bank.timings}}}
+
+    report = run_profile('app', 'app', start, output, budget_ms=budget_ms)
+    return 0 if report.get('within_budget', True) else 1
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CISM quiz web application")
+    parser.add_argument('--profile-startup', nargs='?', const='startup_profile_app.json', metavar='FILE',
+                        help="measure import time, bank load timings and peak memory, write them to FILE "
+                             "(default: startup_profile_app.json) and exit")
+    parser.add_argument('--budget-ms', type=float,
+                        help="with --profile-startup, exit with status 1 if the cold start takes longer")
+    args = parser.parse_args()
+    if args.profile_startup:
+        sys.exit(profile_startup(args.profile_startup, budget_ms=args.budget_ms))
+
+    app = create_app()
     print("\n" + "=" * 80)
     print("CISM Quiz - Web Application")
     print("=" * 80)
@@ -0,0 +1,556 @@
+"""
+CISM Quiz Question Banks
+Registry of question banks (CISM, CISA, CRISC, ...) loaded on first use and evicted when cold
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from analytics import AnswerStore
+from adaptive import DifficultyIndex
+from drills import WeakAreaTracker
+from storage import DEFAULT_BANK
+
+BASE_DIR = Path(__file__).parent.parent
+BANKS_FILE = BASE_DIR / "banks.json"
+
+# Budget for loaded banks; the least recently used banks are dropped beyond it
+BANK_MEMORY_BUDGET = int(os.environ.get('QUIZ_BANK_MEMORY_MB', '256')) * 1024 * 1024
+
+# Parsed JSON takes several times its file size once it is Python objects
+OBJECT_OVERHEAD = 4
+ANSWER_ROW_BYTES = 24
+
+ADAPTIVE_INDEX_REFRESH = 500      # new answers before difficulties are re-estimated
+
+# "The entire Information Security Governance domain represents 17 percent of the CISM examination."
+DOMAIN_WEIGHT_PATTERN = re.compile(
+    r'(?:[Tt]he entire\s+(?P<domain>[^.]+?)\s+domain\s+)?represents\s+(?P<weight>\d+(?:\.\d+)?)\s*(?:percent|%)'
+)
+
+
+def question_hash(question):
+    """Stable content hash of a single question (must match data-processing/bank_revisions.py)"""
+    canonical = json.dumps(question, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def bank_files(bank_id):
+    """Default file names of a bank: <id>_questions.json, <id>_chapter_overviews.json, ...
+
+    The CISM bank keeps the names it had before other banks existed.
+    """
+    if bank_id == DEFAULT_BANK:
+        return {
+            'questions': "cism_questions.json",
+            'chapters': "chapter_overviews.json",
+            'revisions': "bank_revisions.json",
+            'related': "related_index.json"
+        }
+    return {
+        'questions': f"{bank_id}_questions.json",
+        'chapters': f"{bank_id}_chapter_overviews.json",
+        'revisions': f"{bank_id}_bank_revisions.json",
+        'related': f"{bank_id}_related_index.json"
+    }
+
+
+def bank_id_for(questions_file):
+    """Bank a questions file belongs to, by the naming rule of bank_files() or its banks.json entry.
+
+    Any other file is a bank of its own, named after the file, so its
+    results never mix into another bank's.
+    """
+    path = Path(questions_file)
+    if path.name.endswith('_questions.json'):
+        return path.name[:-len('_questions.json')].lower()
+    try:
+        with open(path.parent / BANKS_FILE.name, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        for bank_id, entry in config.items():
+            if entry.get('questions') == path.name:
+                return bank_id
+    except (OSError, ValueError, AttributeError):
+        pass
+    return path.stem.lower()
+
+
+class Bank:
+    """One question bank with its chapters, revision log and derived indexes.
+
+    Files are reloaded when their modification time changes; `unload()`
+    drops everything so the registry can reclaim the memory.
+    """
+
+    def __init__(self, bank_id, title=None, questions_file=None, chapters_file=None,
+                 revisions_file=None, related_file=None, storage=None, writer=None):
+        files = bank_files(bank_id)
+        self.id = bank_id
+        self.title = title or bank_id.upper()
+        self.questions_file = Path(questions_file or BASE_DIR / files['questions'])
+        self.chapters_file = Path(chapters_file or BASE_DIR / files['chapters'])
+        self.revisions_file = Path(revisions_file or BASE_DIR / files['revisions'])
+        self.related_file = Path(related_file or BASE_DIR / files['related'])
+        self.storage = storage
+        self.writer = writer
+        self.progress_key = 'default' if bank_id == DEFAULT_BANK else bank_id
+        self.users = 0                    # requests holding the bank (BankRegistry.get/release)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.questions = []
+        self.questions_by_id = {}
+        self.question_hashes = {}
+        self.version = None
+        self.chapters = []
+        self.chapter_summary = []
+        self.chapters_by_number = {}
+        self._chapters_key = None
+        self.revisions = {'revision': 0, 'hashes': {}, 'log': []}
+        self.questions_mtime = None
+        self.chapters_mtime = None
+        self._revisions_mtime = None
+        self.related = {}                 # question id -> [[related id, similarity], ...]
+        self.related_version = None       # bank version the related index was built from
+        self._related_mtime = None
+        self._file_bytes = 0
+        self._serialized = {}
+        self._difficulty_index = None
+        self._difficulty_index_key = None
+        self._weak_area_tracker = None
+        self._weak_area_key = None
+        self._answer_store = None
+        self._cohort_store = None
+        self.timings = {}                 # milliseconds spent in the last parse/index/serialize steps
+
+    @property
+    def loaded(self):
+        return self.questions_mtime is not None
+
+    def exists(self):
+        return self.questions_file.exists()
+
+    # Loading
+
+    def load(self):
+        """Load or refresh the questions and chapters"""
+        with self._lock:
+            self.load_questions()
+            self.load_chapters()
+            if self._chapters_key != (self.questions_mtime, self.chapters_mtime):
+                self._index_chapters()
+
+    def prewarm(self):
+        """Load the bank and serialize the full question list ahead of the first request"""
+        with self._lock:
+            self.load()
+            self.questions_body()
+
+    def _index_questions(self):
+        # Question numbers restart in every chapter; the bank position is the unique id
+        for position, q in enumerate(self.questions, 1):
+            q.setdefault('id', position)
+        self.questions_by_id = {q['id']: q for q in self.questions}
+        self.question_hashes = {q['id']: question_hash(q) for q in self.questions}
+        # Must match bank_version() in data-processing/bank_revisions.py
+        digest = hashlib.sha256()
+        for q in self.questions:
+            digest.update(f"{q['id']}:{self.question_hashes[q['id']]};".encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+        self._serialized = {}
+
+    def load_questions(self):
+        """Load questions from JSON file if modified or not loaded"""
+        with self._lock:
+            try:
+                current_mtime = os.path.getmtime(self.questions_file)
+                # Only reload if file was modified or hasn't been loaded yet
+                if self.questions_mtime is None or current_mtime != self.questions_mtime:
+                    began = time.perf_counter()
+                    with open(self.questions_file, 'r', encoding='utf-8') as f:
+                        questions = json.load(f)
+                    if not isinstance(questions, list) or not all(isinstance(q, dict) for q in questions):
+                        print(f"Error: {self.questions_file} is not a list of questions")
+                        self.questions = []
+                        self._index_questions()
+                        return
+                    self.questions = questions
+                    parsed = time.perf_counter()
+                    self._index_questions()
+                    self.timings['questions_parse_ms'] = _ms(parsed - began)
+                    self.timings['questions_index_ms'] = _ms(time.perf_counter() - parsed)
+                    self.questions_mtime = current_mtime
+                    print(f"✓ Loaded {len(self.questions)} {self.title} questions from {self.questions_file}")
+                    self._publish_version()
+            except FileNotFoundError:
+                print(f"Warning: {self.questions_file} not found!")
+                self.questions = []
+                self._index_questions()
+            except json.JSONDecodeError:
+                print(f"Error: Invalid JSON in {self.questions_file}")
+                self.questions = []
+                self._index_questions()
+
+    def _publish_version(self):
+        # Lets instances sharing a state backend see which bank version each one loaded last
+        if self.storage is None:
+            return
+        try:
+            self.storage.set_bank_version(self.version, bank=self.id)
+        except Exception as exc:
+            print(f"Warning publishing bank version: {exc}")
+
+    def load_chapters(self):
+        """Load chapter overviews if available and not already cached"""
+        with self._lock:
+            try:
+                if self.chapters_file.exists():
+                    current_mtime = os.path.getmtime(self.chapters_file)
+                    if self.chapters_mtime is None or current_mtime != self.chapters_mtime:
+                        began = time.perf_counter()
+                        with open(self.chapters_file, 'r', encoding='utf-8') as f:
+                            self.chapters = json.load(f)
+                        self.timings['chapters_parse_ms'] = _ms(time.perf_counter() - began)
+                        self.chapters_mtime = current_mtime
+                        print(f"✓ Loaded {len(self.chapters)} {self.title} chapters from {self.chapters_file}")
+                else:
+                    self.chapters = []
+                    self.chapters_mtime = None
+            except Exception as exc:
+                print(f"Warning loading chapters: {exc}")
+                self.chapters = []
+
+    def _index_chapters(self):
+        """Precompute the chapter summary and each chapter's JSON body"""
+        began = time.perf_counter()
+        ordered = sorted(self.chapters, key=lambda c: c.get('start_question', 0))
+        summary = []
+        for i, chapter in enumerate(ordered):
+            start = chapter.get('start_question', 1)
+            end = ordered[i + 1].get('start_question', 1) if i + 1 < len(ordered) else len(self.questions) + 1
+            overview = chapter.get('overview') or []
+            text = ' '.join(overview) if isinstance(overview, list) else str(overview)
+            weighting = DOMAIN_WEIGHT_PATTERN.search(text)
+            summary.append({
+                'chapter': chapter.get('chapter'),
+                'title': chapter.get('title', ''),
+                'start_question': start,
+                'question_count': max(end - start, 0),
+                'domain': weighting.group('domain') if weighting and weighting.group('domain') else None,
+                'domain_weight': float(weighting.group('weight')) if weighting else None
+            })
+        self.chapter_summary = summary
+        self.chapters_by_number = {c.get('chapter'): c for c in self.chapters}
+        self._chapters_key = (self.questions_mtime, self.chapters_mtime)
+        indexed = time.perf_counter()
+
+        for key in [key for key in self._serialized if key.startswith('chapter')]:
+            del self._serialized[key]
+        self.serialized('chapters-summary', lambda: {
+            'chapters': self.chapter_summary,
+            'total': len(self.chapter_summary),
+            'total_questions': len(self.questions)
+        })
+        for entry in self.chapter_summary:
+            chapter = self.chapters_by_number[entry['chapter']]
+            self.serialized(f"chapter-{entry['chapter']}", lambda: {**chapter, **entry})
+        self.timings['chapters_index_ms'] = _ms(indexed - began)
+        self.timings['chapters_serialize_ms'] = _ms(time.perf_counter() - indexed)
+
+    def load_revisions(self):
+        """Load the bank revision log written by the data-processing tools"""
+        with self._lock:
+            try:
+                if self.revisions_file.exists():
+                    current_mtime = os.path.getmtime(self.revisions_file)
+                    if self._revisions_mtime is None or current_mtime != self._revisions_mtime:
+                        with open(self.revisions_file, 'r', encoding='utf-8') as f:
+                            self.revisions = json.load(f)
+                        self._revisions_mtime = current_mtime
+            except Exception as exc:
+                print(f"Warning loading bank revisions: {exc}")
+
+    def load_related(self):
+        """Load the related-questions index built by data-processing/build_related_index.py"""
+        with self._lock:
+            try:
+                current_mtime = os.path.getmtime(self.related_file) if self.related_file.exists() else None
+                if current_mtime == self._related_mtime and (current_mtime is not None or not self.related):
+                    return
+                for key in [key for key in self._serialized if key.startswith('related-')]:
+                    del self._serialized[key]
+                if current_mtime is None:
+                    self.related, self.related_version, self._related_mtime = {}, None, None
+                    return
+                with open(self.related_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                self.related = {int(question_id): row for question_id, row in index['neighbors'].items()}
+                self.related_version = index.get('bank_version')
+                self._related_mtime = current_mtime
+                print(f"✓ Loaded related questions for {len(self.related)} {self.title} questions")
+            except Exception as exc:
+                print(f"Warning loading related questions: {exc}")
+
+    def related_questions(self, question_id):
+        """(JSON bytes, ETag) of a question's precomputed related questions; None if the question is unknown"""
+        with self._lock:
+            self.load_related()
+            if question_id not in self.questions_by_id:
+                return None
+            return self.serialized(f'related-{question_id}', lambda: {
+                'id': question_id,
+                'related': [{
+                    'id': related_id,
+                    'number': self.questions_by_id[related_id].get('number'),
+                    'question': self.questions_by_id[related_id].get('question', ''),
+                    'similarity': similarity
+                } for related_id, similarity in self.related.get(question_id, [])
+                    if related_id in self.questions_by_id],
+                'available': bool(self.related),
+                # Built from another version of the bank: neighbours may have been edited since
+                'stale': bool(self.related) and self.related_version != self.version
+            })
+
+    def current_revision(self):
+        """Revision number of the loaded bank, or None if it was edited outside the tools"""
+        self.load_questions()
+        self.load_revisions()
+        head = self.revisions.get('hashes', {})
+        if len(head) != len(self.question_hashes):
+            return None
+        if any(head.get(str(question_id)) != h for question_id, h in self.question_hashes.items()):
+            return None
+        return self.revisions.get('revision')
+
+    def unload(self):
+        """Drop questions, indexes and caches; the bank reloads on next use"""
+        with self._lock:
+            if self._answer_store is not None:
+                self._answer_store.close()
+            self._reset()
+
+    # Caches
+
+    def serialized(self, key, build):
+        """(JSON bytes, ETag) for `key`, built once per bank version"""
+        with self._lock:
+            cached = self._serialized.get(key)
+            if cached is None:
+                body = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+                cached = (body, hashlib.sha256(body).hexdigest()[:16])
+                self._serialized[key] = cached
+            return cached
+
+    def questions_body(self):
+        """(JSON bytes, ETag) of the whole question list; serialized once per bank version"""
+        with self._lock:
+            if 'questions' not in self._serialized:
+                began = time.perf_counter()
+                self.serialized('questions', lambda: {
+                    'questions': self.questions,
+                    'total': len(self.questions),
+                    'version': self.version
+                })
+                self.timings['questions_serialize_ms'] = _ms(time.perf_counter() - began)
+            return self._serialized['questions']
+
+    def memory_estimate(self):
+        """Rough bytes held by this bank, for the registry's memory budget"""
+        if not self.loaded:
+            return 0
+        if not self._file_bytes:
+            for path in (self.questions_file, self.chapters_file, self.revisions_file, self.related_file):
+                try:
+                    self._file_bytes += path.stat().st_size
+                except OSError:
+                    pass
+        answers = len(self._answer_store) if self._answer_store is not None else 0
+        cohorts = self._cohort_store.nbytes if self._cohort_store is not None else 0
+        # A snapshot: requests add serialized bodies under the bank lock while the registry estimates
+        serialized = self._serialized.copy()
+        return (self._file_bytes * OBJECT_OVERHEAD
+                + sum(len(body) for body, _ in serialized.values())
+                + answers * ANSWER_ROW_BYTES
+                + cohorts)
+
+    # Answer history and derived indexes
+
+    @property
+    def answer_store(self):
+        with self._lock:
+            if self._answer_store is None:
+                self._answer_store = AnswerStore(self.storage, source='web', bank=self.id, writer=self.writer)
+            return self._answer_store
+
+    @property
+    def cohort_store(self):
+        """Result history as NumPy columns for cohort reports, loaded on first use"""
+        with self._lock:
+            if self._cohort_store is None:
+                # NumPy is imported on the first report, not at worker startup
+                from cohorts import CohortStore, cache_path_for
+                self._cohort_store = CohortStore(self.storage, bank=self.id,
+                                                 cache_file=cache_path_for(self.storage, self.id))
+            return self._cohort_store
+
+    def difficulty_index(self):
+        """Return the difficulty index, rebuilding it when the bank or statistics moved on"""
+        with self._lock:
+            self.load_questions()
+            answer_count = len(self.answer_store)
+            if (self._difficulty_index is None
+                    or self._difficulty_index_key[0] != self.questions_mtime
+                    or answer_count - self._difficulty_index_key[1] >= ADAPTIVE_INDEX_REFRESH):
+                self._difficulty_index = DifficultyIndex(self.questions, self.answer_store.question_stats())
+                self._difficulty_index_key = (self.questions_mtime, answer_count)
+            return self._difficulty_index
+
+    def weak_area_tracker(self):
+        """Return the weak-area tracker, rebuilding it when the bank or chapters change"""
+        with self._lock:
+            self.load()
+            if self._weak_area_tracker is None or self._weak_area_key != (self.questions_mtime, self.chapters_mtime):
+                if self._weak_area_tracker is not None:
+                    self.answer_store.unsubscribe(self._weak_area_tracker.observe)
+                self._weak_area_tracker = WeakAreaTracker(self.questions, self.chapters)
+                self._weak_area_key = (self.questions_mtime, self.chapters_mtime)
+                self.answer_store.subscribe(self._weak_area_tracker.observe)
+            else:
+                # Answers still in the write queue reach the tracker once committed
+                self.answer_store.refresh()
+            return self._weak_area_tracker
+
+
+class BankRegistry:
+    """Known banks, loaded lazily and kept in least-recently-used order.
+
+    Banks come from `banks.json` ({"cisa": {"title": "CISA", "questions": "cisa_questions.json", ...}})
+    and from any `<id>_questions.json` next to it. After each access the
+    coldest loaded banks are unloaded until the estimate fits the budget.
+    get() holds the bank until release(), and held banks are never
+    unloaded, so a request never sees its bank emptied underneath it.
+    """
+
+    def __init__(self, storage=None, memory_budget=BANK_MEMORY_BUDGET, base_dir=BASE_DIR, writer=None):
+        self.storage = storage
+        self.writer = writer
+        self.memory_budget = memory_budget
+        self.base_dir = Path(base_dir)
+        self._banks = {}
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self.discover()
+
+    def discover(self):
+        """Register banks from banks.json and <id>_questions.json files"""
+        config = {}
+        banks_file = self.base_dir / BANKS_FILE.name
+        try:
+            if banks_file.exists():
+                with open(banks_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"Warning loading {banks_file}: {exc}")
+
+        found = {DEFAULT_BANK: {}}
+        for path in self.base_dir.glob('*_questions.json'):
+            found.setdefault(path.name[:-len('_questions.json')].lower(), {})
+        found.update(config)
+
+        with self._lock:
+            for bank_id, entry in found.items():
+                if bank_id in self._banks:
+                    continue
+                files = {key: self.base_dir / entry.get(key, name) for key, name in bank_files(bank_id).items()}
+                self._banks[bank_id] = Bank(
+                    bank_id,
+                    title=entry.get('title'),
+                    questions_file=files['questions'],
+                    chapters_file=files['chapters'],
+                    revisions_file=files['revisions'],
+                    related_file=files['related'],
+                    storage=self.storage,
+                    writer=self.writer
+                )
+
+    def get(self, bank_id):
+        """Return the loaded bank, held until release(), or None if no such bank exists"""
+        bank = self._banks.get(bank_id)
+        if bank is None:
+            self.discover()
+            bank = self._banks.get(bank_id)
+        if bank is None or not bank.exists():
+            return None
+
+        with self._lock:
+            bank.users += 1
+        try:
+            bank.load()
+        except Exception:
+            self.release(bank)
+            raise
+        with self._lock:
+            self._loaded[bank_id] = bank
+            self._loaded.move_to_end(bank_id)
+            cold = self._evict()
+        # Unloading flushes answer writes, so it happens outside the registry lock
+        for victim in cold:
+            self._unload(victim)
+        return bank
+
+    def release(self, bank):
+        """Let a bank returned by get() be unloaded again"""
+        with self._lock:
+            bank.users -= 1
+
+    def _evict(self):
+        """Drop the coldest unheld banks from the loaded list until the rest fit the budget; returns them"""
+        total = sum(bank.memory_estimate() for bank in self._loaded.values())
+        cold = []
+        for bank_id in list(self._loaded):
+            if total <= self.memory_budget:
+                break
+            if self._loaded[bank_id].users:
+                continue
+            bank = self._loaded.pop(bank_id)
+            total -= bank.memory_estimate()
+            cold.append(bank)
+        return cold
+
+    def _unload(self, bank):
+        # get() counts a user before load() takes the bank lock, so under the bank lock
+        # a bank nobody holds or reloaded since it was evicted stays unused until unload() returns
+        with bank._lock:
+            with self._lock:
+                if bank.users or bank.id in self._loaded:
+                    return
+            bank.unload()
+        print(f"✓ Unloaded cold question bank '{bank.id}'")
+
+    def summary(self):
+        """Every known bank with whether it is currently in memory"""
+        self.discover()
+        with self._lock:
+            return [{
+                'id': bank.id,
+                'title': bank.title,
+                'available': bank.exists(),
+                'loaded': bank_id in self._loaded,
+                'total': len(bank.questions) if bank_id in self._loaded else None,
+                'version': bank.version,
+                'published_version': self.storage.get_bank_version(bank=bank_id) if self.storage else None
+            } for bank_id, bank in sorted(self._banks.items())]
+
+    def memory_estimate(self):
+        with self._lock:
+            return sum(bank.memory_estimate() for bank in self._loaded.values())
@@ -2,27 +2,80 @@
 CISM Interactive Quiz Application
 Presents multiple choice questions with explanations
 """
+import argparse
+import contextlib
 import json
 import random
 import os
+import sys
+import time
 from pathlib import Path
 from datetime import datetime
 
+from analytics import AnswerStore
+from banks import bank_files, bank_id_for
+from storage import open_storage
+from adaptive import DifficultyIndex
+from drills import WeakAreaTracker
+
+
+BASE_DIR = Path(__file__).parent.parent
+
+# ANSI: clear screen and move the cursor home (no subprocess per redraw)
+CLEAR_SCREEN = "\033[2J\033[H"
+
 
 class CISMQuiz:
     def __init__(self, questions_file):
         self.questions_file = questions_file
-        self.questions = []
+        # Results and answers are kept per bank, as in the web app
+        self.bank = bank_id_for(questions_file)
+        self._questions = None
+        self._storage = None
+        self._answer_store = None
+        self.timings = {}
         self.current_question = 0
         self.score = 0
         self.incorrect_questions = []
-        self.load_questions()
+        self.answered_questions = []
+    
+    @property
+    def questions(self):
+        """Question bank, parsed on first use so the menu appears immediately"""
+        if self._questions is None:
+            self.load_questions()
+        return self._questions
+    
+    @questions.setter
+    def questions(self, value):
+        self._questions = value
+    
+    @property
+    def storage(self):
+        """Results/progress store shared with the web app (see QUIZ_STATE_BACKEND), opened on first use"""
+        if self._storage is None:
+            self._storage = open_storage()
+        return self._storage
+    
+    @property
+    def answer_store(self):
+        """Answer-event store, loaded on first use"""
+        if self._answer_store is None:
+            self._answer_store = AnswerStore(self.storage, source='cli', bank=self.bank)
+        return self._answer_store
         
     def load_questions(self):
         """Load questions from JSON file"""
         try:
+            began = time.perf_counter()
             with open(self.questions_file, 'r', encoding='utf-8') as f:
                 self.questions = json.load(f)
+            parsed = time.perf_counter()
+            # Question numbers restart in every chapter; the bank position is the unique id
+            for position, q in enumerate(self.questions, 1):
+                q.setdefault('id', position)
+            self.timings['questions_parse_ms'] = round((parsed - began) * 1000, 2)
+            self.timings['questions_index_ms'] = round((time.perf_counter() - parsed) * 1000, 2)
             print(f"✓ Loaded {len(self.questions)} questions")
         except FileNotFoundError:
             print(f"Error: Questions file '{self.questions_file}' not found!")
@@ -34,7 +87,7 @@ class CISMQuiz:
     
     def clear_screen(self):
         """Clear the console screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        print(CLEAR_SCREEN, end='', flush=True)
     
     def display_question(self, question):
         """Display a single question with choices"""
@@ -79,13 +132,13 @@ class CISMQuiz:
         print("-" * 80)
         input("\nPress Enter for next question...")
     
-    def run_quiz(self, shuffle=False, num_questions=None):
-        """Run the quiz"""
+    def run_quiz(self, shuffle=False, num_questions=None, question_list=None):
+        """Run the quiz (over `question_list` if given, otherwise the whole bank)"""
         if not self.questions:
             return
         
         # Prepare questions
-        questions_to_use = self.questions.copy()
+        questions_to_use = list(question_list) if question_list is not None else self.questions.copy()
         if shuffle:
             random.shuffle(questions_to_use)
         if num_questions:
@@ -93,6 +146,7 @@ class CISMQuiz:
         
         self.score = 0
         self.incorrect_questions = []
+        self.answered_questions = []
         
         print("\n" + "=" * 80)
         print("CISM PRACTICE QUIZ")
@@ -107,9 +161,11 @@ class CISMQuiz:
             
             # Display question
             self.display_question(question)
+            shown_at = time.monotonic()
             
             # Get user answer
             user_answer = self.get_user_answer()
+            latency_ms = int((time.monotonic() - shown_at) * 1000)
             
             if user_answer == 'Q':
                 print("\nQuiz terminated by user.")
@@ -118,11 +174,14 @@ class CISMQuiz:
             # Check answer immediately
             correct_answer = question.get('answer', '').upper()
             is_correct = (user_answer == correct_answer) if correct_answer else False
+            self.answer_store.record(question['id'], user_answer, is_correct, latency_ms=latency_ms)
+            self.answered_questions.append(question['id'])
             
             if is_correct:
                 self.score += 1
             else:
                 self.incorrect_questions.append({
+                    'id': question['id'],
                     'number': question['number'],
                     'question': question['question'],
                     'user_answer': user_answer,
@@ -133,8 +192,100 @@ class CISMQuiz:
             self.show_explanation(question, user_answer, is_correct)
         
         # Show final results
+        self.answer_store.flush()
         self.show_results(len(questions_to_use))
     
+    def load_chapters(self):
+        """Chapter overviews (for per-chapter weak areas), if available"""
+        chapters_file = Path(self.questions_file).parent / bank_files(self.bank)['chapters']
+        try:
+            with open(chapters_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return []
+    
+    def run_drill(self, num_questions=20):
+        """Quiz on the questions and chapters answered wrong most often"""
+        if not self.questions:
+            return
+        
+        # Replay the stored answer history into a fresh tracker
+        tracker = WeakAreaTracker(self.questions, self.load_chapters())
+        self.answer_store.subscribe(tracker.observe)
+        self.answer_store.unsubscribe(tracker.observe)
+        by_id = {q['id']: q for q in self.questions}
+        drill = [by_id[question_id] for question_id in tracker.drill(num_questions)]
+        
+        weak = [c for c in tracker.weak_areas()['chapters'] if c['error_rate']]
+        if weak:
+            print("\nWeakest chapters:")
+            for chapter in weak[:3]:
+                print(f"  Chapter {chapter['chapter']}: {chapter['title']} "
+                      f"({chapter['error_rate'] * 100:.0f}% incorrect over {chapter['attempts']} answers)")
+        
+        self.run_quiz(question_list=drill)
+    
+    def run_adaptive_quiz(self, num_questions=20):
+        """Run a quiz that picks each question to match the estimated ability"""
+        if not self.questions:
+            return
+        
+        index = DifficultyIndex(self.questions, self.answer_store.question_stats())
+        session = index.new_session()
+        by_id = {q['id']: q for q in self.questions}
+        total = min(num_questions, len(index))
+        
+        self.score = 0
+        self.incorrect_questions = []
+        self.answered_questions = []
+        
+        print("\n" + "=" * 80)
+        print("CISM ADAPTIVE QUIZ")
+        print("=" * 80)
+        print(f"Total questions: {total}")
+        print("Each question is chosen to match your current ability estimate.")
+        print("=" * 80)
+        input("\nPress Enter to start...")
+        
+        while session.answered < total:
+            question_id = session.next_question()
+            if question_id is None:
+                break
+            question = by_id[question_id]
+            self.current_question = session.answered + 1
+            
+            self.display_question(question)
+            shown_at = time.monotonic()
+            user_answer = self.get_user_answer()
+            latency_ms = int((time.monotonic() - shown_at) * 1000)
+            
+            if user_answer == 'Q':
+                print("\nQuiz terminated by user.")
+                break
+            
+            correct_answer = (question.get('answer') or '').upper()
+            is_correct = (user_answer == correct_answer) if correct_answer else False
+            session.record(question_id, is_correct)
+            self.answer_store.record(question_id, user_answer, is_correct, latency_ms=latency_ms)
+            self.answered_questions.append(question_id)
+            
+            if is_correct:
+                self.score += 1
+            else:
+                self.incorrect_questions.append({
+                    'id': question['id'],
+                    'number': question['number'],
+                    'question': question['question'],
+                    'user_answer': user_answer,
+                    'correct_answer': correct_answer
+                })
+            
+            print(f"\nEstimated ability: {session.ability:+.2f}")
+            self.show_explanation(question, user_answer, is_correct)
+        
+        self.answer_store.flush()
+        self.show_results(session.answered)
+    
     def show_results(self, total_questions):
         """Display final quiz results"""
         self.clear_screen()
@@ -176,17 +327,68 @@ class CISMQuiz:
         self.save_results(total_questions, percentage)
     
     def save_results(self, total_questions, percentage):
-        """Save quiz results to file"""
-        results_file = "quiz_results.txt"
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """Save quiz results to the shared results database"""
+        self.storage.save_result(
+            self.score,
+            total_questions,
+            incorrect=[q['id'] for q in self.incorrect_questions],
+            source='cli',
+            bank=self.bank,
+            answered=self.answered_questions
+        )
+    
+    def show_statistics(self, recent=10):
+        """Print a summary of past results (CLI and web) and the most recent quizzes"""
+        summary = self.storage.result_summary(bank=self.bank)
+        if not summary['quizzes']:
+            print("\nNo quiz results found yet.")
+            return
         
-        with open(results_file, 'a', encoding='utf-8') as f:
-            f.write(f"\n{'=' * 80}\n")
-            f.write(f"Quiz Date: {timestamp}\n")
-            f.write(f"Score: {self.score}/{total_questions} ({percentage:.1f}%)\n")
-            if self.incorrect_questions:
-                f.write(f"Incorrect questions: {', '.join([str(q['number']) for q in self.incorrect_questions])}\n")
-            f.write(f"{'=' * 80}\n")
+        print("\n" + "=" * 80)
+        print("QUIZ STATISTICS")
+        print("=" * 80)
+        print(f"\nQuizzes taken: {summary['quizzes']}")
+        print(f"Average score: {summary['average_percentage']:.1f}%")
+        print(f"Best score:    {summary['best_percentage']:.1f}%")
+        print(f"\nMost recent {min(recent, summary['quizzes'])}:")
+        print("-" * 80)
+        for result in self.storage.get_results(limit=recent, bank=self.bank):
+            source = f" [{result['source']}]" if result['source'] else ""
+            print(f"{result['date']}  {result['score_display']:>9}  ({result['percentage']}){source}")
+        print("=" * 80)
+    
+    def grade_batch(self, answers):
+        """Grade answers given as {question id: letter} without any prompts"""
+        by_id = {q['id']: q for q in self.questions}
+        results = []
+        unknown = []
+        score = 0
+        for question_id, user_answer in answers.items():
+            question = by_id.get(question_id)
+            if question is None:
+                unknown.append(question_id)
+                continue
+            user_answer = (user_answer or '').strip().upper()
+            correct_answer = (question.get('answer') or '').upper()
+            is_correct = (user_answer == correct_answer) if correct_answer else False
+            if is_correct:
+                score += 1
+            results.append({
+                'id': question_id,
+                'number': question['number'],
+                'answer': user_answer,
+                'correct_answer': correct_answer,
+                'correct': is_correct
+            })
+        
+        graded = len(results)
+        return {
+            'score': score,
+            'total': graded,
+            'percentage': round(score / graded * 100, 1) if graded else 0.0,
+            'results': results,
+            'unknown_ids': unknown
+        }
     
     def practice_mode(self):
         """Practice mode - review questions without scoring"""
@@ -223,14 +425,199 @@ def display_menu():
     print("2. Take Custom Quiz (specify number of questions)")
     print("3. Practice Mode (review with answers)")
     print("4. Shuffle Questions")
-    print("5. View Statistics")
-    print("6. Exit")
+    print("5. Adaptive Quiz (questions matched to your level)")
+    print("6. Drill Weak Spots (questions you often get wrong)")
+    print("7. View Statistics")
+    print("8. Exit")
+    print("\n" + "=" * 80)
+
+
+def parse_batch_answers(text):
+    """Parse batch answers: a JSON object {"id": "A"}, a JSON list of
+    {"id": ..., "answer": ...}, or one "<id> <answer>" pair per line.
+
+    Returns ({question id: answer}, rejected), where rejected lists each
+    entry that isn't an integer id with a non-empty string answer.
+    """
+    text = text.strip()
+    if text.startswith('{'):
+        entries = [(key, value, {key: value}) for key, value in json.loads(text).items()]
+    elif text.startswith('['):
+        entries = []
+        for item in json.loads(text):
+            if isinstance(item, dict):
+                entries.append((item.get('id'), item.get('answer'), item))
+            else:
+                entries.append((None, None, item))
+    else:
+        entries = []
+        for line_no, line in enumerate(text.splitlines(), 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.replace(',', ' ').replace(':', ' ').split()
+            if len(parts) != 2:
+                entries.append((None, None, f"line {line_no}: {line}"))
+            else:
+                entries.append((parts[0], parts[1], f"line {line_no}: {line}"))
+    
+    answers = {}
+    rejected = []
+    for question_id, answer, entry in entries:
+        error = _batch_entry_error(question_id, answer)
+        if error:
+            rejected.append({'entry': entry, 'error': error})
+        else:
+            answers[int(question_id)] = answer
+    return answers, rejected
+
+
+def _batch_entry_error(question_id, answer):
+    if isinstance(question_id, bool) or not isinstance(question_id, (int, str)):
+        return "expected an integer id and an answer letter"
+    if isinstance(question_id, str) and not question_id.strip().isdigit():
+        return f"id must be an integer, got {question_id!r}"
+    if not isinstance(answer, str) or not answer.strip():
+        return f"answer must be a letter, got {answer!r}"
+    return None
+
+
+def run_batch(questions_file, answers_path, output_path=None):
+    """Grade a file of answers (or stdin with '-') and emit the results as JSON"""
+    # Keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        quiz = CISMQuiz(questions_file)
+        if not quiz.questions:
+            return 1
+    
+    try:
+        if answers_path == '-':
+            text = sys.stdin.read()
+        else:
+            with open(answers_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        answers, rejected = parse_batch_answers(text)
+    except (OSError, ValueError) as exc:
+        print(f"Error reading answers: {exc}", file=sys.stderr)
+        return 1
+    
+    report = quiz.grade_batch(answers)
+    report['rejected'] = rejected
+    report['questions_file'] = str(questions_file)
+    report['graded_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    if rejected:
+        print(f"Error: {len(rejected)} answer(s) rejected (see 'rejected'), e.g. {rejected[0]['entry']!r}: "
+              f"{rejected[0]['error']}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_report(questions_file, output_path=None, period='week'):
+    """Print the cohort report over every stored result (JSON to `output_path` if given)"""
+    # NumPy is only needed here, so the quiz itself starts without it
+    from cohorts import cohort_report
+    
+    with contextlib.redirect_stdout(sys.stderr):
+        quiz = CISMQuiz(questions_file)
+        question_ids = [q['id'] for q in quiz.questions]
+    report = cohort_report(quiz.storage, bank=quiz.bank, question_ids=question_ids, answer_store=quiz.answer_store,
+                           period=period)
+    
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    distribution, projection = report['distribution'], report['projection']
     print("\n" + "=" * 80)
+    print("COHORT REPORT")
+    print("=" * 80)
+    print(f"\nSessions: {report['sessions']}  " + "  ".join(f"{s}: {n}" for s, n in report['sources'].items()))
+    if distribution['sessions']:
+        print(f"Scores:   mean {distribution['mean']}%  median {distribution['median']}%  "
+              f"std {distribution['std']}  (~{distribution['mean_scaled_score']:.0f} scaled)")
+        for bucket in distribution['histogram']:
+            bar = '█' * round(bucket['count'] / distribution['sessions'] * 50)
+            print(f"  {bucket['from']:>5.0f}-{bucket['to']:<5.0f} {bucket['count']:>7}  {bar}")
+    if projection.get('projected_pass_rate') is not None:
+        print(f"\nPass rate at {projection['pass_percentage']:.0f}% (≈{projection['cut_score']} scaled): "
+              f"observed {projection['observed_pass_rate']}%, projected for the exam "
+              f"{projection['projected_pass_rate']}% over {projection['sessions']} sessions")
+    
+    flagged = [q for q in report['discrimination']['questions'] if q['flag']]
+    if flagged:
+        print(f"\nQuestions that barely separate strong from weak sessions ({len(flagged)}):")
+        for q in flagged[:10]:
+            print(f"  #{q['id']:<5} D={q['discrimination']:+.2f}  r_pb={q['point_biserial']}  "
+                  f"p={q['p_value']}  ({q['attempts']} attempts)")
+    
+    trends = report['trends']
+    if trends['periods']:
+        slope = trends['slope_points_per_week']
+        print(f"\nBy {period}" + (f" (trend {slope:+.2f} points/week)" if slope is not None else "") + ":")
+        for row in trends['periods'][-8:]:
+            print(f"  {row['start']}  {row['sessions']:>6} sessions  mean {row['mean']:>5}%  pass {row['pass_rate']:>5}%")
+    print(f"\nComputed in {report['timings']['sync_ms'] + report['timings']['compute_ms']:.0f} ms")
+    if output_path:
+        print(f"✓ Report written to {output_path}")
+    print("=" * 80)
+    return 0
+
+
+def profile_startup(questions_file, output, budget_ms=None):
+    """Profile import, question loading and opening the answer history, and write the report as JSON"""
+    from startup_profile import profile_startup as run_profile
+
+    def start():
+        quiz = CISMQuiz(questions_file)
+        quiz.load_questions()
+        began = time.perf_counter()
+        answers = len(quiz.answer_store)
+        quiz.timings['answer_history_ms'] = round((time.perf_counter() - began) * 1000, 2)
+        quiz.answer_store.close()
+        return {'questions': len(quiz.questions), 'answers': answers, **quiz.timings}
+
+    report = run_profile('cism_quiz', 'cism_quiz', start, output, budget_ms=budget_ms)
+    return 0 if report.get('within_budget', True) else 1
 
 
 def main():
-    # Default questions file
-    questions_file = "cism_questions.json"
+    parser = argparse.ArgumentParser(description="CISM practice quiz")
+    parser.add_argument('--questions', default=str(BASE_DIR / "cism_questions.json"),
+                        help="path to the questions JSON file (default: ../cism_questions.json)")
+    parser.add_argument('--batch', metavar='ANSWERS',
+                        help="grade answers non-interactively from a file ('-' for stdin) and print JSON results; "
+                             "batch runs are not added to your statistics")
+    parser.add_argument('--output', metavar='FILE',
+                        help="write batch results (or the --report JSON) to FILE instead of stdout")
+    parser.add_argument('--report', action='store_true',
+                        help="print score distribution, pass-rate projection, question discrimination "
+                             "and trends over all stored results (needs numpy)")
+    parser.add_argument('--period', choices=['day', 'week', 'month'], default='week',
+                        help="trend period for --report (default: week)")
+    parser.add_argument('--profile-startup', nargs='?', const='startup_profile_cli.json', metavar='FILE',
+                        help="measure import time, question loading and peak memory, write them to FILE "
+                             "(default: startup_profile_cli.json) and exit")
+    parser.add_argument('--budget-ms', type=float,
+                        help="with --profile-startup, exit with status 1 if the cold start takes longer")
+    args = parser.parse_args()
+    
+    questions_file = args.questions
+    
+    if args.report:
+        return run_report(questions_file, args.output, args.period)
+    
+    if args.profile_startup:
+        return profile_startup(questions_file, args.profile_startup, budget_ms=args.budget_ms)
+    
+    if args.batch:
+        return run_batch(questions_file, args.batch, args.output)
     
     # Check if questions file exists
     if not Path(questions_file).exists():
@@ -240,17 +627,17 @@ def main():
             questions_file = custom_path
         else:
             print("Exiting...")
-            return
+            return 0
     
-    quiz = CISMQuiz(questions_file)
+    if os.name == 'nt':
+        os.system('')  # enables ANSI escape handling in the Windows console
     
-    if not quiz.questions:
-        print("\nNo questions loaded. Exiting...")
-        return
+    # Questions are loaded lazily when a mode is first chosen
+    quiz = CISMQuiz(questions_file)
     
     while True:
         display_menu()
-        choice = input("Select an option (1-6): ").strip()
+        choice = input("Select an option (1-8): ").strip()
         
         if choice == '1':
             quiz.run_quiz()
@@ -265,18 +652,26 @@ def main():
         elif choice == '4':
             quiz.run_quiz(shuffle=True)
         elif choice == '5':
-            if Path("quiz_results.txt").exists():
-                with open("quiz_results.txt", 'r', encoding='utf-8') as f:
-                    print(f.read())
-            else:
-                print("\nNo quiz results found yet.")
-            input("\nPress Enter to continue...")
+            try:
+                num = int(input("How many questions? [20] ") or 20)
+                quiz.run_adaptive_quiz(num_questions=num)
+            except ValueError:
+                print("Invalid number!")
         elif choice == '6':
+            try:
+                num = int(input("How many questions? [20] ") or 20)
+                quiz.run_drill(num_questions=num)
+            except ValueError:
+                print("Invalid number!")
+        elif choice == '7':
+            quiz.show_statistics()
+            input("\nPress Enter to continue...")
+        elif choice == '8':
             print("\nThank you for using CISM Quiz! Good luck with your exam! 📚")
-            break
+            return 0
         else:
             print("Invalid option. Please try again.")
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
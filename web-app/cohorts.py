@@ -0,0 +1,461 @@
+"""
+CISM Quiz Cohort Analytics
+Score distributions, pass-rate projections, discrimination indices and trends over all stored results, using NumPy
+"""
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+
+import numpy as np
+
+from storage import DEFAULT_BANK
+
+# ISACA reports CISM results on a 200-800 scale with 450 to pass, but doesn't publish
+# the raw-to-scaled conversion; 65% correct is the commonly quoted equivalent
+SCALED_MIN, SCALED_MAX, CUT_SCORE = 200, 800, 450
+PASS_PERCENTAGE = float(os.environ.get('QUIZ_PASS_PERCENTAGE', '65'))
+EXAM_QUESTIONS = 150
+
+MIN_PROJECTION_QUESTIONS = 10     # shorter quizzes say too little about exam readiness
+RECENT_DAYS = 30
+DISCRIMINATION_GROUP = 0.27       # share of sessions in the upper and lower groups (Kelley)
+MIN_GROUP_ATTEMPTS = 5            # attempts per question in each group before it gets an index
+POOR_DISCRIMINATION = 0.2         # below this a question hardly separates strong from weak candidates
+TREND_PERIODS = ('day', 'week', 'month')
+CACHE_MIN_NEW = 1000              # new results before the column cache is rewritten
+MAX_QUESTION_ID = np.iinfo(np.int32).max
+CACHED_COLUMNS = ('taken_at', 'score', 'total', 'percentage', 'source', 'has_items',
+                  'answered_session', 'answered_question', 'incorrect_session', 'incorrect_question')
+
+
+class CohortStore:
+    """Stored results of one bank as NumPy columns, brought up to date incrementally.
+
+    Session columns hold one entry per result. Item columns hold one entry
+    per answered question, and one per incorrectly answered question, with the
+    result's row in the session columns. Results saved before quizzes recorded
+    which questions they asked contribute items only if they covered the
+    whole bank. Like AnswerStore, sync() fetches only the results stored
+    since the previous sync, so repeated reports never re-read the history.
+    With a `cache_file` the columns are also kept on disk (.npz), so a new
+    process only parses the results stored since the cache was written.
+    """
+
+    def __init__(self, storage, bank=DEFAULT_BANK, cache_file=None):
+        self.storage = storage
+        self.bank = bank
+        self.cache_file = Path(cache_file) if cache_file else None
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._last_id = 0
+        self._last_row = ''               # digest of the last row, to notice a replaced database
+        self._cached_id = 0               # last row id written to the cache file
+
+        self.taken_at = np.empty(0, dtype='datetime64[s]')
+        self.score = np.empty(0, dtype=np.int32)
+        self.total = np.empty(0, dtype=np.int32)
+        self.percentage = np.empty(0, dtype=np.float64)
+        self.source = np.empty(0, dtype=np.int8)         # index into source_names
+        self.source_names = []
+        self.has_items = np.empty(0, dtype=bool)
+
+        self.answered_session = np.empty(0, dtype=np.int32)
+        self.answered_question = np.empty(0, dtype=np.int32)
+        self.incorrect_session = np.empty(0, dtype=np.int32)
+        self.incorrect_question = np.empty(0, dtype=np.int32)
+        self._sections = (None, None)    # (last row id, period) -> report sections derived from results
+
+    def __len__(self):
+        return len(self.score)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in CACHED_COLUMNS)
+
+    def sync(self, question_ids=None):
+        """Append results stored since the last sync; `question_ids` is the bank, for older full-bank quizzes"""
+        with self._lock:
+            if self._last_id == 0 and self.cache_file is not None:
+                self._load_cache()
+            if self._last_id:
+                # Re-read the last known row too, to check the results are still the ones loaded
+                columns = self.storage.result_columns(bank=self.bank, after_id=self._last_id - 1)
+                if self._continues(columns):
+                    columns = {name: values[1:] for name, values in columns.items()}
+                else:
+                    print(f"Warning: stored {self.bank} results changed; reloading them")
+                    self._clear()
+                    columns = self.storage.result_columns(bank=self.bank)
+            else:
+                columns = self.storage.result_columns(bank=self.bank)
+            if columns['id']:
+                self._append(columns, question_ids)
+            if self.cache_file is not None and self._last_id != self._cached_id and (
+                    self._cached_id == 0 or self._last_id - self._cached_id >= CACHE_MIN_NEW):
+                self._save_cache()
+
+    def _continues(self, columns):
+        return bool(columns['id']) and columns['id'][0] == self._last_id and _row_digest(columns, 0) == self._last_row
+
+    def _append(self, columns, question_ids):
+        offset = len(self.score)
+
+        answered = columns['answered']
+        if question_ids:
+            bank_size = len(question_ids)
+            full_bank = '[' + ','.join(str(i) for i in question_ids) + ']'
+            answered = [text if text is not None or total != bank_size else full_bank
+                        for text, total in zip(answered, columns['total'])]
+        answered_session, answered_question, lengths, _ = _parse_id_lists(answered, offset)
+        incorrect_session, incorrect_question, _, incorrect_parsed = _parse_id_lists(columns['incorrect'], offset)
+        # Without its mistakes every answer of a session would count as correct: leave it out of item statistics
+        has_items = (lengths > 0) & incorrect_parsed
+        kept = has_items[answered_session - offset]
+        answered_session, answered_question = answered_session[kept], answered_question[kept]
+        # Mistakes of sessions that didn't record their questions can't be placed in a group
+        known = has_items[incorrect_session - offset]
+        incorrect_session, incorrect_question = incorrect_session[known], incorrect_question[known]
+
+        score = np.array(columns['score'], dtype=np.int32)
+        total = np.array(columns['total'], dtype=np.int32)
+        codes = {name: code for code, name in enumerate(self.source_names)}
+        source = np.fromiter((codes.setdefault(name or '', len(codes)) for name in columns['source']),
+                             dtype=np.int8, count=len(score))
+        self.source_names = list(codes)
+
+        self.taken_at = np.concatenate([self.taken_at, np.array(columns['taken_at'], dtype='datetime64[s]')])
+        self.score = np.concatenate([self.score, score])
+        self.total = np.concatenate([self.total, total])
+        self.percentage = np.concatenate([self.percentage, np.divide(
+            score * 100.0, total, out=np.zeros(len(score)), where=total > 0)])
+        self.source = np.concatenate([self.source, source])
+        self.has_items = np.concatenate([self.has_items, has_items])
+        self.answered_session = np.concatenate([self.answered_session, answered_session])
+        self.answered_question = np.concatenate([self.answered_question, answered_question])
+        self.incorrect_session = np.concatenate([self.incorrect_session, incorrect_session])
+        self.incorrect_question = np.concatenate([self.incorrect_question, incorrect_question])
+        self._last_id = columns['id'][-1]
+        self._last_row = _row_digest(columns, -1)
+
+    def _load_cache(self):
+        if not self.cache_file.exists():
+            return
+        try:
+            with np.load(self.cache_file) as cache:
+                if str(cache['bank']) != self.bank:
+                    return
+                for name in CACHED_COLUMNS:
+                    setattr(self, name, cache[name])
+                self.source_names = [str(name) for name in cache['source_names']]
+                self._last_id = self._cached_id = int(cache['last_id'])
+                self._last_row = str(cache['last_row'])
+        except Exception as exc:
+            print(f"Warning loading cohort cache {self.cache_file}: {exc}")
+            self._clear()
+
+    def _save_cache(self):
+        tmp_path = self.cache_file.with_name(self.cache_file.name + '.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, bank=self.bank, last_id=self._last_id, last_row=self._last_row,
+                         source_names=np.array(self.source_names, dtype=str),
+                         **{name: getattr(self, name) for name in CACHED_COLUMNS})
+            os.replace(tmp_path, self.cache_file)
+            self._cached_id = self._last_id
+        except OSError as exc:
+            print(f"Warning writing cohort cache {self.cache_file}: {exc}")
+
+    def report(self, question_ids=None, answer_store=None, period='week'):
+        """Every cohort statistic for the bank in one dict"""
+        if period not in TREND_PERIODS:
+            raise ValueError(f"Unknown period '{period}' (choose from {', '.join(TREND_PERIODS)})")
+        began = time.perf_counter()
+        self.sync(question_ids)
+        synced = time.perf_counter()
+        with self._lock:
+            key, sections = self._sections
+            if key != (self._last_id, period):
+                source_counts = np.bincount(self.source, minlength=len(self.source_names))
+                sections = {
+                    'sessions': len(self),
+                    'sources': {name or 'unknown': int(n) for name, n in zip(self.source_names, source_counts)},
+                    'distribution': score_distribution(self),
+                    'projection': pass_projection(self),
+                    'discrimination': discrimination(self),
+                    'trends': time_trends(self, period)
+                }
+                self._sections = ((self._last_id, period), sections)
+        report = {
+            'bank': self.bank,
+            'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            **sections
+        }
+        if answer_store is not None:
+            report['answers'] = answer_trends(answer_store, period)
+        report['timings'] = {
+            'sync_ms': round((synced - began) * 1000, 1),
+            'compute_ms': round((time.perf_counter() - synced) * 1000, 1)
+        }
+        return report
+
+
+def _row_digest(columns, row):
+    values = [columns[name][row] for name in ('id', 'taken_at', 'score', 'total', 'source', 'incorrect', 'answered')]
+    return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()[:16]
+
+
+def _id_list(text):
+    """Ids of one stored JSON list, or None if it isn't a list of question ids"""
+    try:
+        values = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(values, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) and 0 <= i <= MAX_QUESTION_ID for i in values):
+        return None
+    return values
+
+
+def _parse_id_lists(texts, offset=0):
+    """(row, id) int32 arrays, per-row lengths and a per-row parsed flag from JSON id lists like "[3, 17, 42]".
+
+    None and "[]" are empty rows. Plain integer lists are parsed by NumPy in
+    one pass instead of building a Python int per id. Rows that aren't lists
+    of question ids (hand-edited, or saved before ids were validated) are
+    empty and flagged as not parsed.
+    """
+    bodies = [text[1:-1].strip() if text else '' for text in texts]
+    lengths = np.fromiter((body.count(',') + 1 if body else 0 for body in bodies),
+                          dtype=np.int64, count=len(bodies))
+    parsed = np.ones(len(texts), dtype=bool)
+    joined = ','.join(body for body in bodies if body)
+    try:
+        ids = np.fromstring(joined, dtype=np.int64, sep=',') if joined else np.empty(0, dtype=np.int64)
+    except ValueError:
+        ids = None
+    if ids is None or ids.size != lengths.sum() or (ids.size and (ids.min() < 0 or ids.max() > MAX_QUESTION_ID)):
+        # Not plain id lists: parse row by row with the JSON parser and skip the rows it rejects
+        lists = [_id_list(text) if text else [] for text in texts]
+        parsed = np.fromiter((values is not None for values in lists), dtype=bool, count=len(lists))
+        lists = [values or [] for values in lists]
+        lengths = np.fromiter((len(values) for values in lists), dtype=np.int64, count=len(lists))
+        ids = np.fromiter(chain.from_iterable(lists), dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(offset, offset + len(texts), dtype=np.int32), lengths)
+    return rows, ids.astype(np.int32), lengths, parsed
+
+
+def _normal_cdf(z):
+    """Standard normal CDF (Abramowitz & Stegun 7.1.26, error below 1.5e-7)"""
+    x = np.abs(z) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return 0.5 * (1 + np.sign(z) * (1 - poly * np.exp(-x * x)))
+
+
+def _round(value, digits=1):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def scaled_score(percentage):
+    """Rough 200-800 scaled score: linear through 0% -> 200, PASS_PERCENTAGE -> 450 and 100% -> 800"""
+    return np.interp(percentage, [0, PASS_PERCENTAGE, 100], [SCALED_MIN, CUT_SCORE, SCALED_MAX])
+
+
+def score_distribution(data, bins=10):
+    """Histogram, percentiles and spread of session percentages"""
+    pct = data.percentage
+    if not len(pct):
+        return {'sessions': 0}
+    counts, edges = np.histogram(pct, bins=bins, range=(0, 100))
+    percentiles = np.percentile(pct, [10, 25, 50, 75, 90])
+    return {
+        'sessions': len(pct),
+        'mean': _round(pct.mean()),
+        'median': _round(percentiles[2]),
+        'std': _round(pct.std()),
+        'percentiles': {str(p): _round(v) for p, v in zip((10, 25, 50, 75, 90), percentiles)},
+        'mean_scaled_score': _round(scaled_score(pct).mean(), 0),
+        'histogram': [{'from': _round(lo), 'to': _round(hi), 'count': int(n)}
+                      for lo, hi, n in zip(edges[:-1], edges[1:], counts)]
+    }
+
+
+def pass_projection(data, now=None):
+    """Observed pass rate and the projected chance of passing a full exam.
+
+    Each session of at least MIN_PROJECTION_QUESTIONS questions estimates its
+    candidate's proportion correct; the chance that a 150-question exam lands
+    at or above PASS_PERCENTAGE follows from a normal approximation that
+    includes the uncertainty of the quiz itself.
+    """
+    mask = data.total >= MIN_PROJECTION_QUESTIONS
+    result = {
+        'pass_percentage': PASS_PERCENTAGE,
+        'cut_score': CUT_SCORE,
+        'exam_questions': EXAM_QUESTIONS,
+        'sessions': int(mask.sum())
+    }
+    if not mask.any():
+        return result
+
+    score, total = data.score[mask], data.total[mask]
+    p = (score + 0.5) / (total + 1)        # keeps 0% and 100% quizzes off the boundaries
+    cut = PASS_PERCENTAGE / 100
+    spread = np.sqrt(p * (1 - p) * (1 / EXAM_QUESTIONS + 1 / total))
+    chance = _normal_cdf((p - cut) / spread)
+
+    now = np.datetime64(now or datetime.now(), 's')
+    recent = data.taken_at[mask] >= now - np.timedelta64(RECENT_DAYS, 'D')
+    result.update({
+        'observed_pass_rate': _round((data.percentage[mask] >= PASS_PERCENTAGE).mean() * 100),
+        'projected_pass_rate': _round(chance.mean() * 100),
+        'recent_sessions': int(recent.sum()),
+        'recent_projected_pass_rate': _round(chance[recent].mean() * 100) if recent.any() else None
+    })
+    return result
+
+
+def discrimination(data, min_attempts=MIN_GROUP_ATTEMPTS):
+    """Upper-lower discrimination index and point-biserial correlation per question.
+
+    Sessions are ranked by percentage; D is the proportion correct in the top
+    27% minus that in the bottom 27%. The point-biserial correlation relates
+    answering the question correctly to the session percentage over all
+    sessions. Correct counts are answered minus incorrectly answered items,
+    so no item-level join is needed. Only questions with `min_attempts` in
+    both groups are listed, least discriminating first.
+    """
+    sessions = np.flatnonzero(data.has_items)
+    result = {'sessions': len(sessions), 'questions': []}
+    group_size = int(round(len(sessions) * DISCRIMINATION_GROUP))
+    if group_size < 1 or group_size * 2 > len(sessions):
+        return result
+
+    ranked = sessions[np.argsort(data.percentage[sessions], kind='stable')]
+    group = np.zeros(len(data), dtype=np.int8)
+    group[ranked[:group_size]] = -1
+    group[ranked[-group_size:]] = 1
+
+    # One bincount per sum over a (question, group) key gives the whole, upper and lower counts at once
+    k = int(data.answered_question.max()) + 1
+    answered_key = data.answered_question.astype(np.intp) * 3 + group[data.answered_session] + 1
+    incorrect_key = data.incorrect_question.astype(np.intp) * 3 + group[data.incorrect_session] + 1
+    x = data.percentage[data.answered_session]
+    by_group = (np.bincount(answered_key, minlength=3 * k).reshape(k, 3),
+                np.bincount(answered_key, weights=x, minlength=3 * k).reshape(k, 3),
+                np.bincount(answered_key, weights=x * x, minlength=3 * k).reshape(k, 3))
+    wrong_by_group = (np.bincount(incorrect_key, minlength=3 * k)[:3 * k].reshape(k, 3),
+                      np.bincount(incorrect_key, weights=data.percentage[data.incorrect_session],
+                                  minlength=3 * k)[:3 * k].reshape(k, 3))
+    lower_n, upper_n = by_group[0][:, 0], by_group[0][:, 2]
+    lower_correct = lower_n - wrong_by_group[0][:, 0]
+    upper_correct = upper_n - wrong_by_group[0][:, 2]
+    n = by_group[0].sum(axis=1)
+    n_correct = n - wrong_by_group[0].sum(axis=1)
+    sum_x, sum_x2 = by_group[1].sum(axis=1), by_group[2].sum(axis=1)
+    sum_x_correct = sum_x - wrong_by_group[1].sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index_d = upper_correct / upper_n - lower_correct / lower_n
+        p = n_correct / n
+        spread = np.sqrt(np.maximum(sum_x2 / n - (sum_x / n) ** 2, 0))
+        mean_correct = sum_x_correct / n_correct
+        mean_wrong = (sum_x - sum_x_correct) / (n - n_correct)
+        point_biserial = (mean_correct - mean_wrong) / spread * np.sqrt(p * (1 - p))
+
+    listed = np.flatnonzero((upper_n >= min_attempts) & (lower_n >= min_attempts))
+    listed = listed[np.argsort(index_d[listed], kind='stable')]
+    for question in listed:
+        d = float(index_d[question])
+        result['questions'].append({
+            'id': int(question),
+            'attempts': int(n[question]),
+            'p_value': _round(p[question], 3),
+            'discrimination': _round(d, 3),
+            'point_biserial': _round(point_biserial[question], 3),
+            'flag': 'negative' if d < 0 else 'poor' if d < POOR_DISCRIMINATION else None
+        })
+    result['poor'] = sum(1 for q in result['questions'] if q['flag'])
+    return result
+
+
+def _period_starts(timestamps, period):
+    """Start of the day, week (Monday) or month each datetime64 falls in"""
+    if period == 'month':
+        return timestamps.astype('datetime64[M]').astype('datetime64[D]')
+    days = timestamps.astype('datetime64[D]')
+    if period == 'week':
+        # 1970-01-01 was a Thursday
+        days = days - (days.astype(np.int64) + 3) % 7
+    return days
+
+
+def time_trends(data, period='week'):
+    """Sessions, mean percentage and pass rate per period, plus the overall slope"""
+    if not len(data):
+        return {'period': period, 'periods': []}
+    starts, index = np.unique(_period_starts(data.taken_at, period), return_inverse=True)
+    counts = np.bincount(index)
+    means = np.bincount(index, weights=data.percentage) / counts
+    passes = np.bincount(index, weights=data.percentage >= PASS_PERCENTAGE) / counts
+
+    days = (data.taken_at - data.taken_at.min()).astype(np.float64) / 86400
+    slope = np.polyfit(days, data.percentage, 1)[0] * 7 if np.ptp(days) > 0 else None
+    return {
+        'period': period,
+        'slope_points_per_week': _round(slope, 2),
+        'periods': [{
+            'start': str(start),
+            'sessions': int(count),
+            'mean': _round(mean),
+            'pass_rate': _round(rate * 100)
+        } for start, count, mean, rate in zip(starts, counts, means, passes)]
+    }
+
+
+def answer_trends(answer_store, period='week'):
+    """Answers, accuracy and mean time-to-answer per period from the answer history"""
+    columns = answer_store.columns()
+    if not len(columns['timestamp']):
+        return {'period': period, 'answers': 0, 'periods': []}
+    correct = np.frombuffer(columns['correct'], dtype=np.int8).astype(np.float64)
+    latency = np.frombuffer(columns['latency'], dtype=np.dtype(columns['latency'].typecode))
+    stamps = (np.frombuffer(columns['timestamp'], dtype=np.float64) * 1000).astype('datetime64[ms]')
+
+    starts, index = np.unique(_period_starts(stamps, period), return_inverse=True)
+    counts = np.bincount(index)
+    timed = latency >= 0
+    timed_counts = np.bincount(index, weights=timed)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        latency_means = np.bincount(index, weights=np.where(timed, latency, 0)) / timed_counts
+    accuracy = np.bincount(index, weights=correct) / counts
+    return {
+        'period': period,
+        'answers': int(counts.sum()),
+        'periods': [{
+            'start': str(start),
+            'answers': int(count),
+            'accuracy': _round(rate * 100),
+            'avg_latency_ms': _round(latency_mean, 0)
+        } for start, count, rate, latency_mean in zip(starts, counts, accuracy, latency_means)]
+    }
+
+
+def cache_path_for(storage, bank=DEFAULT_BANK):
+    """<db>_cohorts_<bank>.npz next to a SQLite database; None for other backends"""
+    db_path = getattr(storage, 'db_path', None)
+    return db_path.with_name(f"{db_path.stem}_cohorts_{bank}.npz") if db_path is not None else None
+
+
+def cohort_report(storage, bank=DEFAULT_BANK, question_ids=None, answer_store=None, period='week'):
+    """One-off report (the CLI), starting from the column cache; the web app keeps a CohortStore per bank"""
+    store = CohortStore(storage, bank, cache_file=cache_path_for(storage, bank))
+    return store.report(question_ids, answer_store, period)
@@ -0,0 +1,159 @@
+"""
+CISM Weak-Area Drills
+Per-question and per-chapter error rates from answer history, sampled through an alias table
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+# Beta prior on the error rate so unseen questions still get drawn occasionally
+PRIOR_INCORRECT = 0.5
+PRIOR_ATTEMPTS = 2.0
+
+# A drill reuses the alias table until this many answers arrived or it is this old
+TABLE_REBUILD_ANSWERS = 200
+TABLE_REBUILD_SECONDS = 30.0
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        self.prob = array('d', [0.0] * n)
+        self.alias = array('l', [0] * n)
+        total = sum(weights)
+        if n == 0 or total <= 0:
+            return
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng=random):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class WeakAreaTracker:
+    """Running error counts per question and chapter.
+
+    Fed one answer at a time (see AnswerStore.subscribe). The alias table
+    is rebuilt by a drill only once TABLE_REBUILD_ANSWERS new answers have
+    arrived or the table is TABLE_REBUILD_SECONDS old, so under steady
+    traffic most drills just sample the current table.
+    """
+
+    def __init__(self, questions, chapters=None):
+        self.ids = [q['id'] for q in questions]
+        self._position = {question_id: i for i, question_id in enumerate(self.ids)}
+
+        # Chapters start at a bank position (1-based), as in chapter_overviews.json
+        chapters = sorted(chapters or [], key=lambda c: c.get('start_question', 0))
+        starts = [c.get('start_question', 1) for c in chapters]
+        self.chapters = [{'chapter': c.get('chapter'), 'title': c.get('title', '')} for c in chapters]
+        self._chapter_of = [max(bisect_right(starts, i + 1) - 1, 0) if starts else None
+                            for i in range(len(self.ids))]
+
+        self._attempts = array('l', [0] * len(self.ids))
+        self._incorrect = array('l', [0] * len(self.ids))
+        self._chapter_attempts = array('l', [0] * len(self.chapters))
+        self._chapter_incorrect = array('l', [0] * len(self.chapters))
+
+        self._lock = threading.Lock()
+        self._table = None
+        self._table_built = 0.0           # monotonic time of the last rebuild
+        self._unseen = 0                  # answers counted since the last rebuild
+
+    def observe(self, question_id, correct):
+        """Count one answer"""
+        i = self._position.get(question_id)
+        if i is None:
+            return
+        with self._lock:
+            self._attempts[i] += 1
+            chapter = self._chapter_of[i]
+            if chapter is not None:
+                self._chapter_attempts[chapter] += 1
+            if not correct:
+                self._incorrect[i] += 1
+                if chapter is not None:
+                    self._chapter_incorrect[chapter] += 1
+            self._unseen += 1
+
+    def error_rate(self, i):
+        return (self._incorrect[i] + PRIOR_INCORRECT) / (self._attempts[i] + PRIOR_ATTEMPTS)
+
+    def chapter_error_rate(self, chapter):
+        return ((self._chapter_incorrect[chapter] + PRIOR_INCORRECT)
+                / (self._chapter_attempts[chapter] + PRIOR_ATTEMPTS))
+
+    def _weights(self):
+        weights = []
+        for i in range(len(self.ids)):
+            chapter = self._chapter_of[i]
+            boost = 1.0 + (self.chapter_error_rate(chapter) if chapter is not None else 0.0)
+            weights.append(self.error_rate(i) * boost)
+        return weights
+
+    def drill(self, count=20, rng=random):
+        """Pick up to `count` distinct question ids, favouring weak questions and chapters"""
+        with self._lock:
+            if self._table is None or (self._unseen and (
+                    self._unseen >= TABLE_REBUILD_ANSWERS
+                    or time.monotonic() - self._table_built >= TABLE_REBUILD_SECONDS)):
+                self._table = AliasTable(self._weights())
+                self._table_built = time.monotonic()
+                self._unseen = 0
+            table = self._table
+        count = min(count, len(table))
+
+        chosen = []
+        seen = set()
+        for _ in range(count * 20):
+            if len(chosen) == count:
+                break
+            i = table.draw(rng)
+            if i not in seen:
+                seen.add(i)
+                chosen.append(self.ids[i])
+        if len(chosen) < count:
+            # Nearly the whole bank was requested: top up with the weakest remaining questions
+            rest = sorted((i for i in range(len(self.ids)) if i not in seen), key=self.error_rate, reverse=True)
+            chosen.extend(self.ids[i] for i in rest[:count - len(chosen)])
+        return chosen
+
+    def weak_areas(self, limit=10):
+        """Chapters and questions ordered by observed error rate"""
+        with self._lock:
+            chapters = [{
+                **info,
+                'attempts': self._chapter_attempts[c],
+                'incorrect': self._chapter_incorrect[c],
+                'error_rate': round(self._chapter_incorrect[c] / self._chapter_attempts[c], 4)
+                if self._chapter_attempts[c] else None
+            } for c, info in enumerate(self.chapters)]
+            attempted = [i for i in range(len(self.ids)) if self._incorrect[i]]
+            attempted.sort(key=lambda i: (self._incorrect[i] / self._attempts[i], self._incorrect[i]), reverse=True)
+            questions = [{
+                'id': self.ids[i],
+                'attempts': self._attempts[i],
+                'incorrect': self._incorrect[i],
+                'error_rate': round(self._incorrect[i] / self._attempts[i], 4)
+            } for i in attempted[:limit]]
+        chapters.sort(key=lambda c: c['error_rate'] if c['error_rate'] is not None else -1, reverse=True)
+        return {'chapters': chapters, 'questions': questions}
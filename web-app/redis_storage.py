@@ -0,0 +1,234 @@
+"""
+CISM Quiz Redis Storage
+Results, progress, sessions and answer history in Redis, shared by every app instance
+"""
+import json
+import uuid
+from datetime import datetime
+
+from storage import StateBackend, DEFAULT_BANK
+
+try:
+    import redis
+except ImportError:  # optional: only needed for QUIZ_STATE_BACKEND=redis
+    redis = None
+
+
+class RedisStorage(StateBackend):
+    """State backend for several app instances behind a load balancer.
+
+    Keys (all under `prefix`):
+      results:<bank>         list of result JSON, newest first
+      results:<bank>:summary hash with quiz count and percentage sum
+      results:<bank>:best    sorted set of result percentages
+      progress:<key>         progress JSON
+      session:<id>           session JSON with a TTL
+      bank_versions          hash of bank id -> version
+      answers:<bank>         list of answer JSON; the 1-based list position is the row id
+
+    Writes that touch several keys go through one non-transactional
+    pipeline, so each call is a single round trip.
+    """
+
+    transient_errors = (redis.ConnectionError, redis.TimeoutError, OSError) if redis else (OSError,)
+
+    def __init__(self, url='redis://localhost:6379/0', client=None, prefix='quiz'):
+        if client is None:
+            client = connect(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, *parts):
+        return ':'.join((self.prefix,) + parts)
+
+    # Results
+
+    def save_result(self, score, total, incorrect=None, source=None, taken_at=None, bank=DEFAULT_BANK,
+                    answered=None):
+        """Store one finished quiz; `incorrect` and `answered` are lists of question ids"""
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_result(pipe, score, total, incorrect, source, taken_at, bank, answered)
+        pipe.execute()
+
+    def _queue_result(self, pipe, score, total, incorrect=None, source=None, taken_at=None, bank=DEFAULT_BANK,
+                      answered=None):
+        percentage = (score / total * 100) if total > 0 else 0
+        entry = {
+            'taken_at': taken_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'score': score,
+            'total': total,
+            'percentage': percentage,
+            'source': source,
+            'incorrect': incorrect or [],
+            'answered': answered or None
+        }
+        pipe.lpush(self._key('results', bank), json.dumps(entry))
+        pipe.hincrby(self._key('results', bank, 'summary'), 'quizzes', 1)
+        pipe.hincrbyfloat(self._key('results', bank, 'summary'), 'percentage_sum', percentage)
+        pipe.zadd(self._key('results', bank, 'best'), {uuid.uuid4().hex: percentage})
+
+    def get_results(self, limit=None, bank=DEFAULT_BANK):
+        """Stored quiz results for one bank, most recent first"""
+        rows = self.client.lrange(self._key('results', bank), 0, (limit or 0) - 1)
+        results = []
+        for raw in rows:
+            row = json.loads(raw)
+            results.append({
+                'date': row['taken_at'],
+                'score': row['score'],
+                'total': row['total'],
+                'score_display': f"{row['score']}/{row['total']}",
+                'percentage': f"{row['percentage']:.1f}%",
+                'source': row['source'],
+                'incorrect': row['incorrect']
+            })
+        return results
+
+    def result_columns(self, bank=DEFAULT_BANK, after_id=0):
+        """Results of one bank stored after row `after_id` as columns, oldest first.
+
+        The row id is the 1-based position from the oldest result; `incorrect`
+        and `answered` are JSON text like the SQLite backend returns them.
+        """
+        # Newest first: everything except the `after_id` oldest entries
+        rows = self.client.lrange(self._key('results', bank), 0, -(after_id + 1))
+        # One parser call for the whole batch
+        entries = json.loads('[' + ','.join(_text(raw) for raw in reversed(rows)) + ']')
+        columns = {column: [entry.get(column) for entry in entries]
+                   for column in ('taken_at', 'score', 'total', 'source')}
+        for column in ('incorrect', 'answered'):
+            columns[column] = [json.dumps(entry[column]) if entry.get(column) is not None else None
+                               for entry in entries]
+        columns['id'] = list(range(after_id + 1, after_id + len(entries) + 1))
+        return columns
+
+    def result_summary(self, bank=DEFAULT_BANK):
+        """Count, average and best percentage across all results of one bank"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(self._key('results', bank, 'summary'))
+        pipe.zrevrange(self._key('results', bank, 'best'), 0, 0, withscores=True)
+        summary, best = pipe.execute()
+        summary = {_text(k): float(v) for k, v in summary.items()}
+        quizzes = int(summary.get('quizzes', 0))
+        return {
+            'quizzes': quizzes,
+            'average_percentage': round(summary['percentage_sum'] / quizzes, 1) if quizzes else None,
+            'best_percentage': round(best[0][1], 1) if best else None
+        }
+
+    # Progress
+
+    def get_progress(self, key='default'):
+        raw = self.client.get(self._key('progress', key))
+        return json.loads(raw) if raw is not None else None
+
+    def save_progress(self, data, key='default'):
+        self.client.set(self._key('progress', key), json.dumps(data))
+
+    def clear_progress(self, key='default'):
+        self.client.delete(self._key('progress', key))
+
+    # Sessions
+
+    def get_session(self, session_id):
+        """Session data, or None if unknown or expired"""
+        raw = self.client.get(self._key('session', session_id))
+        return json.loads(raw) if raw is not None else None
+
+    def save_session(self, session_id, data, ttl):
+        """Store session data for `ttl` seconds (renewed on every save)"""
+        self.client.set(self._key('session', session_id), json.dumps(data), ex=int(ttl))
+
+    def delete_session(self, session_id):
+        self.client.delete(self._key('session', session_id))
+
+    # Bank versions
+
+    def get_bank_version(self, bank=DEFAULT_BANK):
+        """Version of the bank last published by any app instance"""
+        version = self.client.hget(self._key('bank_versions'), bank)
+        return _text(version) if version is not None else None
+
+    def set_bank_version(self, version, bank=DEFAULT_BANK):
+        self.client.hset(self._key('bank_versions'), bank, version)
+
+    # Answer history
+
+    def record_answers(self, events):
+        """Append a batch of answer events with one RPUSH per bank.
+
+        Each event is a tuple (question_id, choice, correct, latency_ms, answered_at, source, bank).
+        """
+        if not events:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        self._queue_answers(pipe, events)
+        pipe.execute()
+
+    def _queue_answers(self, pipe, events):
+        by_bank = {}
+        for question_id, choice, correct, latency_ms, answered_at, source, bank in events:
+            by_bank.setdefault(bank, []).append(json.dumps({
+                'question_id': question_id,
+                'choice': choice,
+                'correct': correct,
+                'latency_ms': latency_ms,
+                'answered_at': answered_at,
+                'source': source
+            }))
+        for bank, rows in by_bank.items():
+            pipe.rpush(self._key('answers', bank), *rows)
+
+    def answers_since(self, last_id=0, bank=DEFAULT_BANK):
+        """Answer rows of one bank after row `last_id`, oldest first"""
+        rows = self.client.lrange(self._key('answers', bank), last_id, -1)
+        return [{**json.loads(raw), 'id': last_id + i} for i, raw in enumerate(rows, 1)]
+
+    # Batched writes
+
+    def write_batch(self, operations, synchronous='NORMAL'):
+        """Apply queued writes in one pipelined round trip.
+
+        Durability follows the server's appendfsync setting, so
+        `synchronous` is ignored here.
+        """
+        if not operations:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for op in operations:
+            if op[0] == 'result':
+                self._queue_result(pipe, **op[1])
+            elif op[0] == 'progress':
+                pipe.set(self._key('progress', op[1]), json.dumps(op[2]))
+            elif op[0] == 'clear_progress':
+                pipe.delete(self._key('progress', op[1]))
+            elif op[0] == 'answers':
+                self._queue_answers(pipe, op[1])
+        pipe.execute()
+
+    def close(self):
+        self.client.close()
+
+
+# fakeredis:// clients in one process share this server, like clients of one Redis
+_fake_server = None
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def connect(url):
+    """Redis client for `url`; "fakeredis://" gives an in-process stand-in"""
+    global _fake_server
+    if url.startswith('fakeredis://'):
+        try:
+            import fakeredis
+        except ImportError:
+            raise RuntimeError("fakeredis:// needs the fakeredis package (pip install fakeredis)")
+        if _fake_server is None:
+            _fake_server = fakeredis.FakeServer()
+        return fakeredis.FakeRedis(server=_fake_server)
+    if redis is None:
+        raise RuntimeError("QUIZ_STATE_BACKEND=redis needs the redis package (pip install redis)")
+    return redis.Redis.from_url(url)
@@ -0,0 +1,90 @@
+"""
+CISM Quiz Startup Profiler
+Import times, bank load timings and peak memory of a cold start, written as JSON
+"""
+import contextlib
+import io
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+WEB_APP_DIR = Path(__file__).parent
+SLOWEST_IMPORTS = 25
+
+
+def import_times(module):
+    """Per-module import times of `import module` in a fresh interpreter (python -X importtime)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=WEB_APP_DIR, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': round(int(self_us) / 1000, 2),
+            'cumulative_ms': round(int(cumulative_us) / 1000, 2)
+        })
+
+    # The target is the last top-level row; the rows since the previous one are what it pulled in
+    end = max((i for i, row in enumerate(rows) if row['depth'] == 0 and row['module'] == module), default=None)
+    if end is None:
+        return {'module': module, 'error': result.stderr.strip().splitlines()[-1:] or 'import failed'}
+    start = end
+    while start > 0 and rows[start - 1]['depth'] > 0:
+        start -= 1
+    imported = rows[start:end + 1]
+    return {
+        'module': module,
+        'total_ms': rows[end]['cumulative_ms'],
+        'modules': len(imported),
+        'slowest': sorted(imported[:-1], key=lambda row: row['self_ms'], reverse=True)[:SLOWEST_IMPORTS]
+    }
+
+
+def profile_startup(target, module, start, output, budget_ms=None):
+    """Profile a cold start of `target` and write the report to `output`; returns the report.
+
+    `start()` performs the startup and returns its own timings (e.g. per-bank
+    parse/index/serialize). It runs twice: once timed, once under tracemalloc
+    for peak memory, so the tracing overhead doesn't skew the timings.
+    """
+    report = {
+        'target': target,
+        'python': sys.version.split()[0],
+        'created_at': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'imports': import_times(module)
+    }
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        began = time.perf_counter()
+        report['startup'] = start()
+        report['startup_ms'] = round((time.perf_counter() - began) * 1000, 2)
+
+        tracemalloc.start()
+        start()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    report['peak_memory_bytes'] = peak
+
+    cold_start_ms = report['imports'].get('total_ms', 0) + report['startup_ms']
+    report['cold_start_ms'] = round(cold_start_ms, 2)
+    if budget_ms is not None:
+        report['budget_ms'] = budget_ms
+        report['within_budget'] = cold_start_ms <= budget_ms
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"⏱️  {target} cold start: {cold_start_ms:.1f} ms "
+          f"(imports {report['imports'].get('total_ms', 0):.1f} ms, startup {report['startup_ms']:.1f} ms), "
+          f"peak memory {peak / 1024 / 1024:.1f} MB")
+    if budget_ms is not None and not report['within_budget']:
+        print(f"⚠️  Over the {budget_ms} ms budget")
+    print(f"✓ Startup profile written to {output}")
+    return report
@@ -0,0 +1,60 @@
+// CISM Quiz service worker
+// Keeps the quiz pages and chapter overviews of every bank available offline.
+// The question banks themselves are cached by the page in IndexedDB and synced
+// by version.
+const SHELL_CACHE = 'cism-shell-v3';
+const SHELL_URLS = ['/', '/api/chapters/summary'];
+// Other banks: their page (/banks/<id>/) and chapters (/api/banks/<id>/chapters/...)
+const BANK_PAGE = /^\/banks\/[^/]+\/$/;
+const BANK_CHAPTERS = /^\/api\/banks\/[^/]+\/chapters\//;
+
+function isCacheable(pathname) {
+    return SHELL_URLS.includes(pathname) || pathname.startsWith('/api/chapters/') ||
+        BANK_PAGE.test(pathname) || BANK_CHAPTERS.test(pathname);
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(SHELL_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(key => key !== SHELL_CACHE).map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+// A bank page asks for its own shell, since the install step only knows the CISM bank
+self.addEventListener('message', event => {
+    const urls = ((event.data && event.data.cache) || []).filter(isCacheable);
+    if (urls.length) {
+        event.waitUntil(caches.open(SHELL_CACHE).then(cache => cache.addAll(urls)).catch(() => {}));
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    // Chapter overviews (/api/chapters/<n>) are cached as they are opened
+    if (url.origin !== self.location.origin || !isCacheable(url.pathname)) return;
+
+    // Network first so edits show up immediately; the cached copy is the offline fallback
+    event.respondWith(
+        fetch(request)
+            .then(response => {
+                if (response.ok) {
+                    const copy = response.clone();
+                    caches.open(SHELL_CACHE).then(cache => cache.put(url.pathname, copy));
+                }
+                return response;
+            })
+            .catch(() => caches.match(url.pathname))
+    );
+});
@@ -0,0 +1,508 @@
+"""
+CISM Quiz Storage
+SQLite-backed results, progress, sessions and answer history shared by the CLI and web app
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+DB_FILE = BASE_DIR / "quiz_data.db"
+
+# Rows written before banks existed belong to the CISM bank
+DEFAULT_BANK = 'cism'
+
+# Files written by earlier versions; imported once into a new database
+# (the CLI wrote results to the directory it was started from, usually web-app/)
+LEGACY_RESULTS_FILES = (BASE_DIR / "quiz_results.txt", Path(__file__).parent / "quiz_results.txt")
+LEGACY_PROGRESS_FILE = BASE_DIR / "quiz_progress.json"
+LEGACY_EVENTS_FILE = BASE_DIR / "answer_events.jsonl"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    percentage REAL NOT NULL,
+    source TEXT,
+    incorrect TEXT,
+    bank TEXT NOT NULL DEFAULT 'cism',
+    answered TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_taken_at ON results (taken_at);
+CREATE TABLE IF NOT EXISTS progress (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL,
+    choice TEXT,
+    correct INTEGER NOT NULL,
+    latency_ms INTEGER,
+    answered_at REAL NOT NULL,
+    source TEXT,
+    bank TEXT NOT NULL DEFAULT 'cism'
+);
+CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id);
+CREATE INDEX IF NOT EXISTS idx_answers_answered_at ON answers (answered_at);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bank_versions (
+    bank TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Columns added after the first release: (table, column, definition)
+MIGRATIONS = (
+    ('results', 'bank', "TEXT NOT NULL DEFAULT 'cism'"),
+    ('answers', 'bank', "TEXT NOT NULL DEFAULT 'cism'"),
+    ('results', 'answered', "TEXT"),
+)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_results_bank ON results (bank, taken_at);
+CREATE INDEX IF NOT EXISTS idx_answers_bank ON answers (bank, id);
+CREATE INDEX IF NOT EXISTS idx_results_bank_id ON results (bank, id);
+"""
+
+
+class StateBackend:
+    """Everything the app and CLI keep between requests and runs.
+
+    Implementations: QuizStorage (SQLite, one machine) and RedisStorage
+    (redis_storage.py, shared by several app instances). Pick one with
+    open_storage().
+    """
+
+    # Errors that mean the backend is busy or unreachable, so the same write may succeed later;
+    # anything else is a bad operation that would fail on every retry
+    transient_errors = (OSError,)
+
+    def save_result(self, score, total, incorrect=None, source=None, taken_at=None, bank=DEFAULT_BANK,
+                    answered=None):
+        raise NotImplementedError
+
+    def get_results(self, limit=None, bank=DEFAULT_BANK):
+        raise NotImplementedError
+
+    def result_columns(self, bank=DEFAULT_BANK, after_id=0):
+        raise NotImplementedError
+
+    def result_summary(self, bank=DEFAULT_BANK):
+        raise NotImplementedError
+
+    def get_progress(self, key='default'):
+        raise NotImplementedError
+
+    def save_progress(self, data, key='default'):
+        raise NotImplementedError
+
+    def clear_progress(self, key='default'):
+        raise NotImplementedError
+
+    def get_session(self, session_id):
+        raise NotImplementedError
+
+    def save_session(self, session_id, data, ttl):
+        raise NotImplementedError
+
+    def delete_session(self, session_id):
+        raise NotImplementedError
+
+    def get_bank_version(self, bank=DEFAULT_BANK):
+        raise NotImplementedError
+
+    def set_bank_version(self, version, bank=DEFAULT_BANK):
+        raise NotImplementedError
+
+    def record_answers(self, events):
+        raise NotImplementedError
+
+    def answers_since(self, last_id=0, bank=DEFAULT_BANK):
+        raise NotImplementedError
+
+    def write_batch(self, operations, synchronous='NORMAL'):
+        """Apply writes queued by write_queue.WriteBehindQueue, in order.
+
+        Operations: ('result', save_result kwargs), ('progress', key, data),
+        ('clear_progress', key) and ('answers', events). Backends override
+        this to apply a batch in one transaction or round trip.
+        """
+        for op in operations:
+            if op[0] == 'result':
+                self.save_result(**op[1])
+            elif op[0] == 'progress':
+                self.save_progress(op[2], key=op[1])
+            elif op[0] == 'clear_progress':
+                self.clear_progress(key=op[1])
+            elif op[0] == 'answers':
+                self.record_answers(op[1])
+
+    def sync(self):
+        """Make writes committed without an fsync durable (write_batch with synchronous below FULL)"""
+
+    def close(self):
+        pass
+
+
+class QuizStorage(StateBackend):
+    """Small pool of SQLite connections in WAL mode.
+
+    WAL lets the web app and the CLI read while the other writes; each
+    connection is used by one thread at a time and returned to the pool.
+    """
+
+    # "database is locked", disk I/O errors
+    transient_errors = (sqlite3.OperationalError, OSError)
+
+    def __init__(self, db_path=DB_FILE, pool_size=4):
+        self.db_path = Path(db_path)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; commits on success, rolls back on error"""
+        self._ensure_schema()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Close every pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _ensure_schema(self):
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn = self._connect()
+            try:
+                conn.executescript(SCHEMA)
+                for table, column, definition in MIGRATIONS:
+                    columns = [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                conn.executescript(INDEXES)
+                imported = conn.execute("SELECT value FROM meta WHERE key = 'legacy_imported'").fetchone()
+                if not imported:
+                    self._import_legacy(conn)
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                                 (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),))
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    # Results
+
+    def save_result(self, score, total, incorrect=None, source=None, taken_at=None, bank=DEFAULT_BANK,
+                    answered=None):
+        """Store one finished quiz; `incorrect` and `answered` are lists of question ids"""
+        with self.connection() as conn:
+            self._insert_result(conn, score, total, incorrect, source, taken_at, bank, answered)
+
+    def _insert_result(self, conn, score, total, incorrect=None, source=None, taken_at=None, bank=DEFAULT_BANK,
+                       answered=None):
+        percentage = (score / total * 100) if total > 0 else 0
+        taken_at = taken_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute(
+            "INSERT INTO results (taken_at, score, total, percentage, source, incorrect, bank, answered) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (taken_at, score, total, percentage, source, json.dumps(incorrect) if incorrect else None, bank,
+             json.dumps(answered) if answered else None)
+        )
+
+    def get_results(self, limit=None, bank=DEFAULT_BANK):
+        """Stored quiz results for one bank, most recent first"""
+        sql = ("SELECT taken_at, score, total, percentage, source, incorrect FROM results "
+               "WHERE bank = ? ORDER BY taken_at DESC, id DESC")
+        params = (bank,)
+        if limit:
+            sql += " LIMIT ?"
+            params = (bank, limit)
+        with self.connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return [{
+            'date': row['taken_at'],
+            'score': row['score'],
+            'total': row['total'],
+            'score_display': f"{row['score']}/{row['total']}",
+            'percentage': f"{row['percentage']:.1f}%",
+            'source': row['source'],
+            'incorrect': json.loads(row['incorrect']) if row['incorrect'] else []
+        } for row in rows]
+
+    def result_columns(self, bank=DEFAULT_BANK, after_id=0):
+        """Results of one bank stored after row `after_id` as columns, in insertion order.
+
+        For bulk analytics: `incorrect` and `answered` stay JSON text (None
+        when not recorded) so the caller can parse them all at once.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None     # plain tuples: much faster to build than Row objects
+            rows = cursor.execute(
+                "SELECT id, taken_at, score, total, source, incorrect, answered FROM results "
+                "WHERE bank = ? AND id > ? ORDER BY id",
+                (bank, after_id)
+            ).fetchall()
+        columns = zip(*rows) if rows else ((),) * 7
+        return dict(zip(('id', 'taken_at', 'score', 'total', 'source', 'incorrect', 'answered'), columns))
+
+    def result_summary(self, bank=DEFAULT_BANK):
+        """Count, average and best percentage across all results of one bank"""
+        with self.connection() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS quizzes, AVG(percentage) AS average, MAX(percentage) AS best "
+                "FROM results WHERE bank = ?",
+                (bank,)
+            ).fetchone()
+        return {
+            'quizzes': row['quizzes'],
+            'average_percentage': round(row['average'], 1) if row['average'] is not None else None,
+            'best_percentage': round(row['best'], 1) if row['best'] is not None else None
+        }
+
+    # Progress
+
+    def get_progress(self, key='default'):
+        with self.connection() as conn:
+            row = conn.execute("SELECT data FROM progress WHERE key = ?", (key,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def save_progress(self, data, key='default'):
+        with self.connection() as conn:
+            self._put_progress(conn, key, data)
+
+    def _put_progress(self, conn, key, data):
+        conn.execute(
+            "INSERT OR REPLACE INTO progress (key, data, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(data), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+    def clear_progress(self, key='default'):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM progress WHERE key = ?", (key,))
+
+    # Sessions
+
+    def get_session(self, session_id):
+        """Session data, or None if unknown or expired"""
+        with self.connection() as conn:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ? AND expires_at > ?",
+                               (session_id, time.time())).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def save_session(self, session_id, data, ttl):
+        """Store session data for `ttl` seconds (renewed on every save)"""
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                         (session_id, json.dumps(data), now + ttl))
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete_session(self, session_id):
+        with self.connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    # Bank versions
+
+    def get_bank_version(self, bank=DEFAULT_BANK):
+        """Version of the bank last published by any app instance"""
+        with self.connection() as conn:
+            row = conn.execute("SELECT version FROM bank_versions WHERE bank = ?", (bank,)).fetchone()
+        return row['version'] if row else None
+
+    def set_bank_version(self, version, bank=DEFAULT_BANK):
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO bank_versions (bank, version, updated_at) VALUES (?, ?, ?)",
+                         (bank, version, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    # Answer history
+
+    def record_answers(self, events):
+        """Insert a batch of answer events in one transaction.
+
+        Each event is a tuple (question_id, choice, correct, latency_ms, answered_at, source, bank).
+        """
+        if not events:
+            return
+        with self.connection() as conn:
+            self._insert_answers(conn, events)
+
+    def _insert_answers(self, conn, events):
+        conn.executemany(
+            "INSERT INTO answers (question_id, choice, correct, latency_ms, answered_at, source, bank) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            events
+        )
+
+    def answers_since(self, last_id=0, bank=DEFAULT_BANK):
+        """Answer rows of one bank with a rowid greater than `last_id`, oldest first"""
+        with self.connection() as conn:
+            return conn.execute(
+                "SELECT id, question_id, choice, correct, latency_ms, answered_at FROM answers "
+                "WHERE bank = ? AND id > ? ORDER BY id",
+                (bank, last_id)
+            ).fetchall()
+
+    # Batched writes
+
+    def write_batch(self, operations, synchronous='NORMAL'):
+        """Apply queued writes in one transaction.
+
+        `synchronous` is the SQLite sync level for this commit: FULL fsyncs
+        the WAL before returning, NORMAL leaves it to the next checkpoint and
+        OFF leaves it to the operating system.
+        """
+        if not operations:
+            return
+        with self.connection() as conn:
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+            try:
+                for op in operations:
+                    if op[0] == 'result':
+                        self._insert_result(conn, **op[1])
+                    elif op[0] == 'progress':
+                        self._put_progress(conn, op[1], op[2])
+                    elif op[0] == 'clear_progress':
+                        conn.execute("DELETE FROM progress WHERE key = ?", (op[1],))
+                    elif op[0] == 'answers':
+                        self._insert_answers(conn, op[1])
+                conn.commit()
+            except Exception:
+                # The sync level can't change inside a transaction: end it first so this error is the one raised
+                conn.rollback()
+                raise
+            finally:
+                conn.execute("PRAGMA synchronous=NORMAL")
+
+    def sync(self):
+        """Checkpoint the WAL; in NORMAL mode SQLite fsyncs the WAL before copying it back"""
+        with self.connection() as conn:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    # Legacy files
+
+    def _import_legacy(self, conn):
+        """Bring results, progress and answer events from the old flat files into the database"""
+        imported = 0
+        for results_file in LEGACY_RESULTS_FILES:
+            for entry in parse_results_text(results_file):
+                percentage = (entry['score'] / entry['total'] * 100) if entry['total'] > 0 else 0
+                conn.execute(
+                    "INSERT INTO results (taken_at, score, total, percentage, source) VALUES (?, ?, ?, ?, 'legacy')",
+                    (entry['date'], entry['score'], entry['total'], percentage)
+                )
+                imported += 1
+
+        try:
+            if LEGACY_PROGRESS_FILE.exists():
+                with open(LEGACY_PROGRESS_FILE, 'r', encoding='utf-8') as f:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO progress (key, data, updated_at) VALUES ('default', ?, ?)",
+                        (json.dumps(json.load(f)), datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                    )
+        except (OSError, json.JSONDecodeError) as exc:
+            print(f"Warning importing {LEGACY_PROGRESS_FILE}: {exc}")
+
+        try:
+            if LEGACY_EVENTS_FILE.exists():
+                with open(LEGACY_EVENTS_FILE, 'r', encoding='utf-8') as f:
+                    events = [json.loads(line) for line in f if line.strip()]
+                conn.executemany(
+                    "INSERT INTO answers (question_id, choice, correct, latency_ms, answered_at, source) "
+                    "VALUES (?, ?, ?, ?, ?, 'legacy')",
+                    [(e['q'], e.get('c'), 1 if e.get('ok') else 0, e.get('ms'), e.get('t', 0.0)) for e in events]
+                )
+                imported += len(events)
+        except (OSError, json.JSONDecodeError, KeyError) as exc:
+            print(f"Warning importing {LEGACY_EVENTS_FILE}: {exc}")
+
+        if imported:
+            print(f"✓ Imported {imported} legacy records into {self.db_path}")
+
+
+def open_storage():
+    """State backend chosen by QUIZ_STATE_BACKEND: 'sqlite' (default) or 'redis'.
+
+    QUIZ_DB_PATH overrides the SQLite file; QUIZ_REDIS_URL selects the Redis
+    server (a "fakeredis://" URL gives an in-process stand-in for testing).
+    """
+    backend = os.environ.get('QUIZ_STATE_BACKEND', 'sqlite').lower()
+    if backend == 'sqlite':
+        return QuizStorage(os.environ.get('QUIZ_DB_PATH', DB_FILE))
+    if backend == 'redis':
+        from redis_storage import RedisStorage
+        return RedisStorage(os.environ.get('QUIZ_REDIS_URL', 'redis://localhost:6379/0'))
+    raise ValueError(f"Unknown QUIZ_STATE_BACKEND: {backend} (expected 'sqlite' or 'redis')")
+
+
+def parse_results_text(results_file):
+    """Parse the old banner-delimited quiz_results.txt format"""
+    results_file = Path(results_file)
+    if not results_file.exists():
+        return []
+    with open(results_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    results = []
+    for entry in content.split('=' * 80):
+        result = {}
+        for line in entry.strip().split('\n'):
+            if line.startswith('Quiz Date:'):
+                result['date'] = line.replace('Quiz Date:', '').strip()
+            elif line.startswith('Score:'):
+                # "Score: 25/50 (50.0%)"
+                score_str = line.replace('Score:', '').split('(')[0].strip()
+                if '/' in score_str:
+                    score, total = score_str.split('/')
+                    result['score'] = int(score.strip())
+                    result['total'] = int(total.strip())
+        if result.get('date') and 'score' in result:
+            results.append(result)
+    return results
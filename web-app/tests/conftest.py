@@ -0,0 +1,19 @@
+"""
+Shared fixtures for the web-app tests (run from web-app/: python -m pytest tests)
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from storage import QuizStorage  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """A fresh SQLite state backend in a temporary folder"""
+    db = QuizStorage(tmp_path / "quiz_data.db")
+    yield db
+    db.close()
@@ -0,0 +1,85 @@
+import random
+
+from adaptive import DifficultyIndex
+
+
+def make_index(size=50, seed=1):
+    rng = random.Random(seed)
+    questions = [{'id': i} for i in range(1, size + 1)]
+    stats = []
+    for q in questions:
+        attempts = rng.randint(1, 40)
+        stats.append({'id': q['id'], 'attempts': attempts, 'correct': rng.randint(0, attempts)})
+    return DifficultyIndex(questions, stats)
+
+
+def test_questions_are_sorted_by_difficulty():
+    index = make_index()
+    assert index.difficulties == sorted(index.difficulties)
+    assert sorted(index.ids) == list(range(1, 51))
+
+
+def test_picks_the_unanswered_question_closest_to_the_ability():
+    index = make_index()
+    rng = random.Random(2)
+    session = index.new_session()
+    remaining = set(index.ids)
+    while remaining:
+        best = min(abs(index.difficulty_of[i] - session.ability) for i in remaining)
+        question_id = session.next_question()
+        assert question_id in remaining
+        assert abs(index.difficulty_of[question_id] - session.ability) == best
+        remaining.discard(question_id)
+        session.record(question_id, rng.random() < 0.5)
+
+    assert session.remaining == 0
+    assert session.next_question() is None
+
+
+def test_ability_moves_with_answers():
+    index = make_index()
+    session = index.new_session()
+    question_id = session.next_question()
+    before = session.ability
+    session.record(question_id, True)
+    assert session.ability > before
+    assert (session.answered, session.correct) == (1, 1)
+
+
+def test_restored_session_excludes_asked_questions():
+    index = make_index()
+    session = index.new_session()
+    asked = [session.next_question() for _ in range(20)]
+    state = session.to_state()
+
+    restored = make_index().restore_session(state)
+    assert restored.remaining == 30
+    rest = [restored.next_question() for _ in range(30)]
+    assert sorted(asked + rest) == list(range(1, 51))
+    assert restored.next_question() is None
+
+
+def test_sessions_do_not_share_removals():
+    index = make_index()
+    first, second = index.new_session(), index.new_session()
+    for _ in range(10):
+        first.next_question()
+
+    assert second.remaining == 50
+    assert len({second.next_question() for _ in range(50)}) == 50
+
+
+def test_remembered_session_is_reused_only_at_the_same_step():
+    index = make_index()
+    session = index.new_session()
+    session.next_question()
+    index.remember('abc', session)
+    assert index.restore_session(session.to_state(), 'abc') is session
+
+    # Advanced elsewhere since it was remembered: rebuilt from the stored state
+    index.remember('abc', session)
+    state = session.to_state()
+    state['asked'] = state['asked'] + [q for q in index.ids if q not in state['asked']][:1]
+    rebuilt = index.restore_session(state, 'abc')
+    assert rebuilt is not session
+    assert rebuilt.remaining == 48
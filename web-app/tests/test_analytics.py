@@ -0,0 +1,109 @@
+from analytics import MAX_LATENCY_MS, AnswerStore
+from write_queue import WriteBehindQueue
+
+
+def stats_by_id(store):
+    return {s['id']: s for s in store.question_stats()}
+
+
+def test_aggregates_attempts_picks_and_latency(storage):
+    store = AnswerStore(storage, source='web')
+    store.record(7, 'a', True, latency_ms=1000)
+    store.record(7, 'B', False, latency_ms=3000)
+    store.record(7, 'b', False)
+    store.record(9, 'C', True)
+
+    stats = stats_by_id(store)
+    assert stats[7]['attempts'] == 3
+    assert stats[7]['correct'] == 1
+    assert stats[7]['pick_rates'] == {'A': 0.3333, 'B': 0.6667, 'C': 0.0, 'D': 0.0}
+    assert stats[7]['avg_latency_ms'] == 2000
+    assert stats[9]['p_value'] == 1.0
+    store.close()
+
+
+def test_picks_up_rows_written_by_another_store(storage):
+    first = AnswerStore(storage, source='web')
+    second = AnswerStore(storage, source='cli')
+    first.record(1, 'A', True)
+    first.flush()
+    second.record(1, 'B', False)
+
+    assert stats_by_id(second)[1]['attempts'] == 2
+    assert stats_by_id(first)[1]['attempts'] == 2
+    # Only the new rows are read on the next sync
+    first.record(1, 'C', False)
+    assert len(first) == 3
+    assert stats_by_id(first)[1]['attempts'] == 3
+    first.close()
+    second.close()
+
+
+def test_answers_are_kept_per_bank(storage):
+    cism = AnswerStore(storage, bank='cism')
+    cisa = AnswerStore(storage, bank='cisa')
+    cism.record(1, 'A', True)
+    cism.flush()
+
+    reopened = AnswerStore(storage, bank='cism')
+    assert stats_by_id(cisa) == {}
+    assert stats_by_id(reopened)[1]['attempts'] == 1
+    for store in (cism, cisa, reopened):
+        store.close()
+
+
+def test_listeners_see_history_then_new_answers(storage):
+    store = AnswerStore(storage)
+    store.record(1, 'A', True)
+    seen = []
+    store.subscribe(lambda question_id, correct: seen.append((question_id, correct)))
+    store.record(2, 'B', False)
+    store.flush()
+
+    assert seen == [(1, 1), (2, 0)]
+    store.close()
+
+
+def test_refresh_does_not_wait_for_the_writer(storage):
+    writer = WriteBehindQueue(storage, flush_interval=60)
+    store = AnswerStore(storage, writer=writer)
+    store.record(1, 'A', True)
+    store.refresh()
+
+    # Handed to the queue, not yet committed
+    assert writer.metrics()['depth'] == 1
+    assert len(store.columns()['question']) == 1    # columns() waits for the writer
+    writer.close()
+    store.close()
+
+
+def test_without_storage_events_stay_in_memory():
+    store = AnswerStore(None)
+    store.record(3, 'D', False)
+    store.flush()
+
+    assert stats_by_id(store)[3]['pick_rates']['D'] == 1.0
+    store.close()
+
+
+def test_latency_is_clamped_and_non_numbers_are_not_measured(storage):
+    store = AnswerStore(storage)
+    for latency in (1e20, float('inf'), float('nan'), -5, '900', True, 1500.7):
+        store.record(4, 'A', True, latency_ms=latency)
+
+    assert list(store.columns()['latency']) == [MAX_LATENCY_MS, -1, -1, -1, -1, -1, 1500]
+    assert stats_by_id(store)[4]['attempts'] == 7
+    store.close()
+
+
+def test_answers_reach_storage_without_another_answer_or_flush(storage):
+    writer = WriteBehindQueue(storage, flush_interval=0.01)
+    store = AnswerStore(storage, writer=writer, flush_interval=3600)
+    store.record(1, 'A', True)
+    store.record(2, 'B', False)
+
+    # Only the queue is flushed: nothing is left behind in the store
+    assert writer.flush()
+    assert [row['question_id'] for row in storage.answers_since(0)] == [1, 2]
+    writer.close()
+    store.close()
@@ -0,0 +1,231 @@
+import json
+import os
+
+import pytest
+
+from app import create_app
+from banks import BankRegistry, question_hash
+
+
+def question(question_id, text):
+    return {'id': question_id, 'number': question_id, 'question': text,
+            'choices': {'A': 'Yes', 'B': 'No', 'C': 'Maybe', 'D': 'Never'}, 'answer': 'C', 'explanation': ''}
+
+
+def chapter(number, title, start_question, overview):
+    return {'chapter': number, 'title': title, 'start_question': start_question, 'overview': overview}
+
+
+def write_chapters(tmp_path, chapters):
+    path = tmp_path / 'chapter_overviews.json'
+    path.write_text(json.dumps(chapters), encoding='utf-8')
+    return path
+
+
+def revision_entry(revision, added=(), changed=(), removed=()):
+    return {'revision': revision, 'timestamp': '2026-01-01 00:00:00', 'source': 'test',
+            'added': list(added), 'changed': list(changed), 'removed': list(removed)}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """App on a temporary database and bank folder.
+
+    The bank went through two revisions: 1 added questions 1-3, 2 edited
+    question 2, removed question 3 and added question 4.
+    """
+    questions = [question(1, 'One'), question(2, 'Two, edited'), question(4, 'Four')]
+    (tmp_path / 'cism_questions.json').write_text(json.dumps(questions), encoding='utf-8')
+    (tmp_path / 'bank_revisions.json').write_text(json.dumps({
+        'revision': 2,
+        'max_id': 4,
+        'hashes': {str(q['id']): question_hash(q) for q in questions},
+        'log': [revision_entry(1, added=[1, 2, 3]),
+                revision_entry(2, added=[4], changed=[2], removed=[3])]
+    }), encoding='utf-8')
+
+    monkeypatch.setenv('QUIZ_STATE_BACKEND', 'sqlite')
+    monkeypatch.setenv('QUIZ_DB_PATH', str(tmp_path / 'quiz_data.db'))
+    app = create_app(prewarm=False)
+    state = app.extensions['quiz']
+    state['banks'] = BankRegistry(state['storage'], base_dir=tmp_path, writer=state['writes'])
+    yield app.test_client()
+    state['writes'].close()
+    state['storage'].close()
+
+
+def test_changes_since_an_older_revision(client):
+    body = client.get('/api/questions/changes?since=1').get_json()
+
+    assert (body['revision'], body['since'], body['full']) == (2, 1, False)
+    assert [q['id'] for q in body['added']] == [4]
+    assert [(q['id'], q['question']) for q in body['changed']] == [(2, 'Two, edited')]
+    assert body['removed'] == [3]
+    assert body['order'] == [1, 2, 4]
+
+
+def test_changes_since_the_first_revision_add_everything_still_present(client):
+    body = client.get('/api/questions/changes?since=0').get_json()
+
+    assert [q['id'] for q in body['added']] == [1, 2, 4]
+    assert body['changed'] == [] and body['removed'] == []
+
+
+def test_changes_since_the_current_revision_are_empty(client):
+    body = client.get('/api/questions/changes?since=2').get_json()
+
+    assert body['full'] is False
+    assert body['added'] == body['changed'] == body['removed'] == []
+    assert body['order'] is None
+
+
+def test_unknown_revision_returns_the_whole_bank(client):
+    body = client.get('/api/questions/changes?since=5').get_json()
+
+    assert body['full'] is True
+    assert [q['id'] for q in body['questions']] == [1, 2, 4]
+
+
+def test_bank_edited_outside_the_tools_returns_the_whole_bank(client, tmp_path):
+    path = tmp_path / 'cism_questions.json'
+    questions = json.loads(path.read_text(encoding='utf-8'))
+    questions[0]['question'] = 'One, hand edited'
+    path.write_text(json.dumps(questions), encoding='utf-8')
+
+    body = client.get('/api/questions/changes?since=1').get_json()
+    assert body['revision'] is None
+    assert body['full'] is True
+
+
+def test_since_must_be_a_number(client):
+    assert client.get('/api/questions/changes?since=x').status_code == 400
+    assert client.get('/api/questions/changes').status_code == 400
+
+
+def test_unchanged_response_revalidates_with_etag(client):
+    first = client.get('/api/questions/changes?since=1')
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = client.get('/api/questions/changes?since=1', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_save_result_rejects_scores_the_database_cannot_store(client):
+    for payload in ({'score': '3', 'total': '5'}, {'score': 6, 'total': 5}, {'score': -1, 'total': 5},
+                    {'score': True, 'total': 5}, {}):
+        assert client.post('/api/save-result', json=payload).status_code == 400
+    assert client.post('/api/save-result', json={'score': 3, 'total': 5}).status_code == 200
+
+
+def test_check_answer_with_an_absurd_latency_is_still_recorded(client):
+    for latency in (1e20, float('inf')):
+        response = client.post('/api/check-answer', data=json.dumps({'question_id': 1, 'answer': 'C',
+                                                                     'latency_ms': latency}),
+                               content_type='application/json')
+        assert response.status_code == 200
+
+    body = client.get('/api/analytics/questions').get_json()
+    assert body['total_answers'] == 2
+
+
+def test_save_result_accepts_only_question_ids_of_the_bank(client):
+    for ids in (['x'], [3], [-1], [True], 'all'):
+        for field in ('incorrect', 'answered'):
+            payload = {'score': 1, 'total': 2, field: ids}
+            assert client.post('/api/save-result', json=payload).status_code == 400, (field, ids)
+    payload = {'score': 1, 'total': 2, 'incorrect': [4], 'answered': [1, 4]}
+    assert client.post('/api/save-result', json=payload).status_code == 200
+    assert client.get('/api/statistics/report').status_code == 200
+
+
+def test_chapter_summary_counts_questions_and_parses_domain_weighting(client, tmp_path):
+    write_chapters(tmp_path, [
+        chapter(2, 'Risk', 3, ['Risk management.']),
+        chapter(1, 'Governance', 1, ['Intro.', 'The entire Information Security Governance domain represents '
+                                            '17 percent of the CISM examination.'])
+    ])
+    body = client.get('/api/chapters/summary').get_json()
+
+    assert (body['total'], body['total_questions']) == (2, 3)
+    assert [(c['chapter'], c['start_question'], c['question_count']) for c in body['chapters']] == [
+        (1, 1, 2), (2, 3, 1)]
+    assert (body['chapters'][0]['domain'], body['chapters'][0]['domain_weight']) == (
+        'Information Security Governance', 17.0)
+    assert body['chapters'][1]['domain_weight'] is None
+    assert 'overview' not in body['chapters'][0]
+
+
+def test_one_chapter_carries_its_overview_and_summary(client, tmp_path):
+    write_chapters(tmp_path, [chapter(1, 'Governance', 1, ['Intro.'])])
+
+    body = client.get('/api/chapters/1').get_json()
+    assert (body['title'], body['overview'], body['question_count']) == ('Governance', ['Intro.'], 3)
+    assert client.get('/api/chapters/9').status_code == 404
+
+
+def test_chapters_revalidate_until_the_file_changes(client, tmp_path):
+    path = write_chapters(tmp_path, [chapter(1, 'Governance', 1, ['Intro.'])])
+    for url in ('/api/chapters/summary', '/api/chapters/1'):
+        first = client.get(url)
+        assert first.status_code == 200
+        assert client.get(url, headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    etag = client.get('/api/chapters/1').headers['ETag']
+    write_chapters(tmp_path, [chapter(1, 'Governance, revised', 1, ['Intro.'])])
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    changed = client.get('/api/chapters/1', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.get_json()['title'] == 'Governance, revised'
+
+
+def write_related(tmp_path, bank_version, neighbors):
+    path = tmp_path / 'related_index.json'
+    path.write_text(json.dumps({'bank_version': bank_version, 'method': 'tfidf-cosine', 'k': 2,
+                                'neighbors': neighbors}), encoding='utf-8')
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+
+def test_related_questions_from_the_index(client, tmp_path):
+    version = client.get('/api/questions?ids=1').get_json()['version']
+    # Question 3 was removed from the bank after the index was built
+    write_related(tmp_path, version, {'1': [[3, 0.9], [2, 0.5], [4, 0.25]]})
+
+    body = client.get('/api/questions/1/related').get_json()
+    assert [(q['id'], q['question'], q['similarity']) for q in body['related']] == [
+        (2, 'Two, edited', 0.5), (4, 'Four', 0.25)]
+    assert (body['available'], body['stale']) == (True, False)
+    assert client.get('/api/questions/2/related').get_json()['related'] == []
+
+
+def test_related_questions_from_another_bank_version_are_stale(client, tmp_path):
+    write_related(tmp_path, 'older', {'1': [[2, 0.5]]})
+
+    first = client.get('/api/questions/1/related')
+    assert first.get_json()['stale'] is True
+    assert client.get('/api/questions/1/related',
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    version = client.get('/api/questions?ids=1').get_json()['version']
+    write_related(tmp_path, version, {'1': [[2, 0.5]]})
+    assert client.get('/api/questions/1/related').get_json()['stale'] is False
+
+
+def test_related_questions_without_an_index_or_question(client):
+    body = client.get('/api/questions/1/related').get_json()
+    assert (body['related'], body['available'], body['stale']) == ([], False, False)
+    assert client.get('/api/questions/3/related').status_code == 404
+
+
+def test_requests_release_the_banks_they_use(client, tmp_path):
+    (tmp_path / 'cisa_questions.json').write_text(json.dumps([question(1, 'Audit')]), encoding='utf-8')
+    registry = client.application.extensions['quiz']['banks']
+
+    body = client.get('/api/banks/cisa/questions').get_json()
+    assert [q['question'] for q in body['questions']] == ['Audit']
+    client.get('/api/questions')
+    assert client.get('/api/banks/nope/questions').status_code == 404
+
+    assert {bank['id']: bank['loaded'] for bank in registry.summary()} == {'cism': True, 'cisa': True}
+    assert all(bank.users == 0 for bank in registry._banks.values())
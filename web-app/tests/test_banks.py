@@ -0,0 +1,102 @@
+import json
+import threading
+
+import pytest
+
+from banks import Bank, BankRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    """Three small banks and a budget that fits only one of them"""
+    for name in ('cism_questions.json', 'cisa_questions.json', 'crisc_questions.json'):
+        questions = [{'number': n, 'question': f'{name} {n}', 'choices': {'A': 'a', 'B': 'b'}, 'answer': 'A'}
+                     for n in range(1, 21)]
+        (tmp_path / name).write_text(json.dumps(questions), encoding='utf-8')
+    return BankRegistry(memory_budget=1, base_dir=tmp_path)
+
+
+def loaded_ids(registry):
+    return {bank['id'] for bank in registry.summary() if bank['loaded']}
+
+
+def test_cold_banks_are_unloaded_once_released(registry):
+    cism = registry.get('cism')
+    registry.release(cism)
+    cisa = registry.get('cisa')
+
+    assert loaded_ids(registry) == {'cisa'}
+    assert not cism.loaded and cisa.loaded
+    registry.release(cisa)
+
+
+def test_held_banks_are_never_unloaded(registry):
+    cism = registry.get('cism')
+    registry.get('cisa')
+    registry.get('crisc')
+
+    assert loaded_ids(registry) == {'cism', 'cisa', 'crisc'}
+    assert len(cism.questions) == 20
+    registry.release(cism)
+    registry.release(registry.get('cisa'))
+    assert 'cism' not in loaded_ids(registry)
+
+
+def test_unknown_bank_is_none(registry):
+    assert registry.get('nope') is None
+
+
+def test_unloading_does_not_block_other_banks(registry, monkeypatch):
+    unloading, finish = threading.Event(), threading.Event()
+    original = Bank.unload
+
+    def slow_unload(bank):
+        unloading.set()
+        finish.wait(5)
+        original(bank)
+
+    monkeypatch.setattr(Bank, 'unload', slow_unload)
+    registry.release(registry.get('cism'))
+    evicting = threading.Thread(target=lambda: registry.release(registry.get('cisa')))
+    evicting.start()
+    assert unloading.wait(5)
+
+    # cism is being unloaded (e.g. flushing its answers); other requests must not wait for it
+    got = []
+    other = threading.Thread(target=lambda: got.append(registry.get('crisc')))
+    other.start()
+    other.join(1)
+    finished_first = bool(got)
+    finish.set()
+    evicting.join(5)
+    other.join(5)
+    assert finished_first
+    registry.release(got[0])
+
+
+def test_bank_taken_again_after_eviction_is_not_unloaded(registry):
+    registry.memory_budget = 10 ** 9
+    cism = registry.get('cism')
+    registry.release(cism)
+    registry.memory_budget = 1
+    with registry._lock:
+        cold = registry._evict()
+    assert cold == [cism]
+
+    # A request gets the bank before the evicting one unloads it
+    held = registry.get('cism')
+    registry._unload(cism)
+    assert held is cism and cism.loaded and len(cism.questions) == 20
+    registry.release(held)
+
+
+def test_least_recently_used_bank_is_unloaded_first(registry):
+    cism = registry.get('cism')
+    registry.memory_budget = cism.memory_estimate() * 2.5
+    registry.release(cism)
+    registry.release(registry.get('cisa'))
+    registry.release(registry.get('cism'))
+    registry.release(registry.get('crisc'))
+
+    assert loaded_ids(registry) == {'cism', 'crisc'}
+    assert 0 < registry.memory_estimate() <= registry.memory_budget
@@ -0,0 +1,97 @@
+import io
+import json
+import sys
+
+import pytest
+
+from banks import bank_id_for
+from cism_quiz import CISMQuiz, parse_batch_answers, run_batch
+
+
+def write_bank(path, count=3):
+    questions = [{'id': n, 'number': n, 'question': f'Q{n}', 'choices': {'A': 'a', 'B': 'b'}, 'answer': 'A',
+                  'explanation': ''} for n in range(1, count + 1)]
+    path.write_text(json.dumps(questions), encoding='utf-8')
+    return path
+
+
+def test_bank_id_follows_the_file_naming_rule(tmp_path):
+    assert bank_id_for(tmp_path / 'cism_questions.json') == 'cism'
+    assert bank_id_for(tmp_path / 'CISA_questions.json') == 'cisa'
+    (tmp_path / 'banks.json').write_text(json.dumps({'crisc': {'questions': 'crisc_bank.json'}}), encoding='utf-8')
+    assert bank_id_for(tmp_path / 'crisc_bank.json') == 'crisc'
+    assert bank_id_for(tmp_path / 'scratch.json') == 'scratch'
+
+
+def test_results_and_answers_go_to_the_bank_of_the_questions_file(tmp_path, storage):
+    quiz = CISMQuiz(str(write_bank(tmp_path / 'cisa_questions.json')))
+    quiz._storage = storage
+    quiz.score = 2
+    quiz.answered_questions = [1, 2, 3]
+    quiz.incorrect_questions = [quiz.questions[2]]
+    quiz.save_results(3, 66.7)
+    quiz.answer_store.record(3, 'B', False)
+    quiz.answer_store.close()
+
+    assert storage.result_summary(bank='cisa')['quizzes'] == 1
+    assert storage.result_summary(bank='cism')['quizzes'] == 0
+    assert len(storage.answers_since(0, bank='cisa')) == 1
+    assert storage.answers_since(0, bank='cism') == []
+
+
+@pytest.mark.parametrize('text', [
+    '{"1": "A", "3": "b"}',
+    '[{"id": 1, "answer": "A"}, {"id": "3", "answer": "b"}]',
+    '# id answer\n1 A\n3, b\n\n',
+])
+def test_batch_answers_in_every_format(text):
+    answers, rejected = parse_batch_answers(text)
+    assert answers == {1: 'A', 3: 'b'}
+    assert rejected == []
+
+
+def test_malformed_batch_entries_are_rejected_not_guessed():
+    answers, rejected = parse_batch_answers('1 A\nx B\n2\n3 A B\n')
+    assert answers == {1: 'A'}
+    assert [r['entry'] for r in rejected] == ['line 2: x B', 'line 3: 2', 'line 4: 3 A B']
+
+    answers, rejected = parse_batch_answers('[{"id": true, "answer": "A"}, {"id": 2, "answer": ""}, 5]')
+    assert answers == {}
+    assert len(rejected) == 3
+
+
+def test_run_batch_grades_without_prompts(tmp_path, capsys):
+    bank = write_bank(tmp_path / 'cism_questions.json')
+    answers = tmp_path / 'answers.txt'
+    answers.write_text('1 a\n2 B\n9 A\n', encoding='utf-8')
+    output = tmp_path / 'report.json'
+
+    assert run_batch(str(bank), str(answers), str(output)) == 0
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert (report['score'], report['total'], report['percentage']) == (1, 2, 50.0)
+    assert [r['correct'] for r in report['results']] == [True, False]
+    assert report['unknown_ids'] == [9]
+    assert report['rejected'] == []
+    assert capsys.readouterr().out == ''
+
+
+def test_run_batch_reads_stdin_and_fails_on_rejected_entries(tmp_path, capsys, monkeypatch):
+    bank = write_bank(tmp_path / 'cism_questions.json')
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('{"1": "A", "two": "B"}'))
+
+    assert run_batch(str(bank), '-') == 1
+    captured = capsys.readouterr()
+    report = json.loads(captured.out)
+    assert report['score'] == 1
+    assert report['rejected'][0]['entry'] == {'two': 'B'}
+    assert '1 answer(s) rejected' in captured.err
+
+
+def test_run_batch_reports_unreadable_answers(tmp_path, capsys):
+    bank = write_bank(tmp_path / 'cism_questions.json')
+    answers = tmp_path / 'answers.json'
+    answers.write_text('{"1": ', encoding='utf-8')
+
+    assert run_batch(str(bank), str(answers)) == 1
+    assert run_batch(str(bank), str(tmp_path / 'missing.txt')) == 1
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import numpy as np
+
+from cohorts import (CohortStore, _parse_id_lists, cache_path_for, discrimination, pass_projection,
+                     time_trends)
+from storage import QuizStorage
+
+
+def test_unparseable_id_lists_are_skipped():
+    rows, ids, lengths, parsed = _parse_id_lists(['[3, 17]', '["x"]', None, '[-4]', '[5]', '{"a": 1}'])
+
+    assert rows.tolist() == [0, 0, 4]
+    assert ids.tolist() == [3, 17, 5]
+    assert lengths.tolist() == [2, 0, 0, 0, 1, 0]
+    assert parsed.tolist() == [True, False, True, False, True, False]
+
+
+def test_report_survives_results_with_bad_id_lists(storage):
+    for n in range(12):
+        storage.save_result(score=n % 4, total=3 + n % 2, incorrect=[1], answered=[1, 2, 3], bank='cism')
+    storage.save_result(score=1, total=3, answered=['x'], bank='cism')
+    storage.save_result(score=1, total=3, incorrect=['x'], answered=[1, 2, 3], bank='cism')
+    storage.save_result(score=1, total=3, incorrect=[-1], answered=[-2, 1], bank='cism')
+
+    store = CohortStore(storage)
+    report = store.report(question_ids=[1, 2, 3])
+
+    assert report['sessions'] == 15
+    # Only the twelve well-formed results place their answers
+    assert np.count_nonzero(store.has_items) == 12
+    assert store.answered_question.min() >= 0
+
+
+def test_score_distribution(storage):
+    for score in (0, 5, 10, 10):
+        storage.save_result(score=score, total=10)
+    report = CohortStore(storage).report()
+
+    distribution = report['distribution']
+    assert (distribution['sessions'], distribution['mean'], distribution['median']) == (4, 62.5, 75.0)
+    assert [bucket['count'] for bucket in distribution['histogram']] == [1, 0, 0, 0, 0, 1, 0, 0, 0, 2]
+    assert report['sources'] == {'unknown': 4}
+
+
+def test_pass_projection_counts_only_long_enough_quizzes(storage):
+    storage.save_result(score=150, total=150, taken_at='2020-01-01 10:00:00')
+    storage.save_result(score=0, total=150, taken_at='2020-01-01 11:00:00')
+    storage.save_result(score=5, total=5, taken_at='2020-01-01 12:00:00')
+    store = CohortStore(storage)
+    store.sync()
+
+    projection = pass_projection(store, now=datetime(2020, 1, 15))
+    assert projection['sessions'] == 2
+    assert projection['observed_pass_rate'] == 50.0
+    # A perfect and an empty exam-length quiz: one certain pass, one certain fail
+    assert projection['projected_pass_rate'] == 50.0
+    assert projection['recent_sessions'] == 2
+
+    later = pass_projection(store, now=datetime(2020, 6, 1))
+    assert later['recent_sessions'] == 0 and later['recent_projected_pass_rate'] is None
+
+
+def test_discrimination_separates_strong_and_weak_sessions(storage):
+    # Ten sessions from 0% to 90%: the weakest three miss question 1, the strongest three miss question 2
+    for n in range(10):
+        incorrect = [1] if n < 3 else [2] if n >= 7 else []
+        storage.save_result(score=n, total=10, incorrect=incorrect, answered=[1, 2, 3])
+    store = CohortStore(storage)
+    store.sync()
+
+    result = discrimination(store, min_attempts=3)
+    by_id = {q['id']: q for q in result['questions']}
+    assert [q['id'] for q in result['questions']] == [2, 3, 1]
+    assert (by_id[1]['discrimination'], by_id[1]['flag']) == (1.0, None)
+    assert (by_id[2]['discrimination'], by_id[2]['flag']) == (-1.0, 'negative')
+    assert (by_id[3]['discrimination'], by_id[3]['flag']) == (0.0, 'poor')
+    assert by_id[1]['point_biserial'] > 0 > by_id[2]['point_biserial']
+    assert by_id[3]['point_biserial'] is None     # answered correctly by everyone
+    assert result['poor'] == 2
+    assert discrimination(store)['questions'] == []
+
+
+def test_time_trends_per_week_and_month(storage):
+    for taken_at, score in (('2026-01-05 09:00:00', 4), ('2026-01-07 09:00:00', 6), ('2026-01-14 09:00:00', 8)):
+        storage.save_result(score=score, total=10, taken_at=taken_at)
+    store = CohortStore(storage)
+    store.sync()
+
+    weekly = time_trends(store, 'week')
+    assert [(p['start'], p['sessions'], p['mean']) for p in weekly['periods']] == [
+        ('2026-01-05', 2, 50.0), ('2026-01-12', 1, 80.0)]
+    assert weekly['slope_points_per_week'] > 0
+    assert [(p['start'], p['sessions']) for p in time_trends(store, 'month')['periods']] == [('2026-01-01', 3)]
+
+
+def test_cache_is_reused_and_only_new_results_are_read(storage, monkeypatch):
+    for n in range(3):
+        storage.save_result(score=n, total=10, incorrect=[1], answered=[1, 2])
+    cache_file = cache_path_for(storage)
+    CohortStore(storage, cache_file=cache_file).sync()
+    assert cache_file.exists()
+
+    storage.save_result(score=9, total=10, incorrect=[], answered=[1, 2])
+    reads = []
+    result_columns = storage.result_columns
+    monkeypatch.setattr(storage, 'result_columns', lambda **kw: reads.append(kw) or result_columns(**kw))
+    store = CohortStore(storage, cache_file=cache_file)
+    store.sync()
+
+    assert reads == [{'bank': 'cism', 'after_id': 2}]
+    assert store.score.tolist() == [0, 1, 2, 9]
+    assert store.answered_session.tolist() == [0, 0, 1, 1, 2, 2, 3, 3]
+    assert store.incorrect_session.tolist() == [0, 1, 2]
+
+
+def test_cache_of_another_database_is_discarded(storage, tmp_path):
+    for n in range(3):
+        storage.save_result(score=n, total=10)
+    cache_file = tmp_path / 'cohorts.npz'
+    CohortStore(storage, cache_file=cache_file).sync()
+
+    other = QuizStorage(tmp_path / 'other.db')
+    other.save_result(score=7, total=10)
+    store = CohortStore(other, cache_file=cache_file)
+    store.sync()
+    assert store.score.tolist() == [7]
+    other.close()
@@ -0,0 +1,78 @@
+import random
+from collections import Counter
+
+import drills
+from drills import AliasTable, WeakAreaTracker
+
+
+def test_alias_table_draws_follow_the_weights():
+    weights = [1, 2, 3, 4, 0, 10]
+    table = AliasTable(weights)
+    rng = random.Random(5)
+    draws = 200_000
+    counts = Counter(table.draw(rng) for _ in range(draws))
+
+    total = sum(weights)
+    for i, weight in enumerate(weights):
+        assert abs(counts[i] / draws - weight / total) < 0.005
+    assert counts[4] == 0
+
+
+def test_alias_table_with_equal_weights_is_uniform():
+    table = AliasTable([2.5] * 4)
+    assert list(table.prob) == [1.0] * 4
+
+
+def make_tracker(size=30):
+    questions = [{'id': 100 + i} for i in range(size)]
+    chapters = [{'chapter': 1, 'title': 'One', 'start_question': 1},
+                {'chapter': 2, 'title': 'Two', 'start_question': size // 2 + 1}]
+    return WeakAreaTracker(questions, chapters)
+
+
+def test_drill_returns_distinct_questions_favouring_weak_ones():
+    tracker = make_tracker()
+    for _ in range(40):
+        tracker.observe(105, False)
+        tracker.observe(106, True)
+
+    rng = random.Random(3)
+    picks = Counter()
+    for _ in range(200):
+        drill = tracker.drill(5, rng)
+        assert len(drill) == len(set(drill)) == 5
+        picks.update(drill)
+    assert picks[105] > picks[106] * 5
+
+
+def test_drill_of_the_whole_bank_returns_every_question():
+    tracker = make_tracker()
+    assert sorted(tracker.drill(30)) == [100 + i for i in range(30)]
+
+
+def test_weak_areas_rank_chapters_and_questions():
+    tracker = make_tracker()
+    tracker.observe(120, False)
+    tracker.observe(120, False)
+    tracker.observe(101, True)
+    tracker.observe(999, False)        # not in the bank: ignored
+
+    areas = tracker.weak_areas()
+    assert areas['chapters'][0]['chapter'] == 2
+    assert areas['questions'] == [{'id': 120, 'attempts': 2, 'incorrect': 2, 'error_rate': 1.0}]
+
+
+def test_alias_table_is_rebuilt_only_after_enough_answers(monkeypatch):
+    monkeypatch.setattr(drills, 'TABLE_REBUILD_ANSWERS', 3)
+    tracker = make_tracker()
+    tracker.drill(1)
+    table = tracker._table
+
+    tracker.observe(101, False)
+    tracker.drill(1)
+    assert tracker._table is table
+
+    tracker.observe(101, False)
+    tracker.observe(101, False)
+    tracker.drill(1)
+    assert tracker._table is not table
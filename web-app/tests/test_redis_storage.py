@@ -0,0 +1,113 @@
+"""
+StateBackend contract, run against SQLite and against RedisStorage on fakeredis
+"""
+import json
+import time
+
+import pytest
+
+from storage import QuizStorage
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from redis_storage import RedisStorage  # noqa: E402
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        db = QuizStorage(tmp_path / "quiz_data.db")
+    else:
+        db = RedisStorage(client=fakeredis.FakeRedis(server=fakeredis.FakeServer()))
+    yield db
+    db.close()
+
+
+def test_result_columns_after_id(backend):
+    backend.save_result(1, 4, incorrect=[2, 3, 4], source='web', taken_at='2026-01-01 10:00:00',
+                        answered=[1, 2, 3, 4])
+    backend.save_result(3, 4, incorrect=[4], source='cli', taken_at='2026-01-02 10:00:00')
+    backend.save_result(2, 2, source='web', taken_at='2026-01-03 10:00:00', bank='cisa')
+    backend.save_result(4, 4, source='web', taken_at='2026-01-04 10:00:00')
+
+    columns = backend.result_columns()
+    assert list(columns['score']) == [1, 3, 4]
+    assert columns['taken_at'][0] == '2026-01-01 10:00:00'
+    assert json.loads(columns['incorrect'][0]) == [2, 3, 4]
+    assert json.loads(columns['answered'][0]) == [1, 2, 3, 4] and columns['answered'][1] is None
+
+    newer = backend.result_columns(after_id=columns['id'][1])
+    assert list(newer['score']) == [4] and list(newer['id']) == list(columns['id'][2:])
+    assert list(backend.result_columns(after_id=columns['id'][2])['id']) == []
+    assert list(backend.result_columns(bank='cisa')['score']) == [2]
+
+
+def test_results_and_summary_are_per_bank(backend):
+    backend.save_result(1, 2)
+    backend.save_result(2, 2)
+    backend.save_result(0, 5, bank='cisa')
+
+    assert backend.result_summary() == {'quizzes': 2, 'average_percentage': 75.0, 'best_percentage': 100.0}
+    assert backend.result_summary(bank='crisc')['quizzes'] == 0
+    recent = backend.get_results(limit=1)
+    assert [r['score_display'] for r in recent] == ['2/2']
+
+
+def test_answers_since_is_incremental_and_per_bank(backend):
+    backend.record_answers([(1, 'A', 1, 900, 100.0, 'web', 'cism'),
+                            (2, 'B', 0, None, 101.0, 'web', 'cisa'),
+                            (3, 'C', 0, 1200, 102.0, 'cli', 'cism')])
+    rows = backend.answers_since(0)
+    assert [(r['question_id'], r['choice'], r['correct'], r['latency_ms']) for r in rows] == [
+        (1, 'A', 1, 900), (3, 'C', 0, 1200)]
+
+    backend.record_answers([(4, 'D', 1, 500, 103.0, 'web', 'cism')])
+    newer = backend.answers_since(rows[-1]['id'])
+    assert [r['question_id'] for r in newer] == [4]
+    assert newer[0]['id'] > rows[-1]['id']
+    assert [r['question_id'] for r in backend.answers_since(0, bank='cisa')] == [2]
+
+
+def test_sessions_expire_after_their_ttl(backend):
+    backend.save_session('abc', {'step': 1}, ttl=60)
+    backend.save_session('short', {'step': 1}, ttl=1)
+    assert backend.get_session('abc') == {'step': 1}
+
+    time.sleep(1.1)
+    assert backend.get_session('short') is None
+    assert backend.get_session('abc') == {'step': 1}
+    backend.delete_session('abc')
+    assert backend.get_session('abc') is None
+
+
+def test_write_batch_applies_every_operation(backend):
+    backend.save_progress({'old': True}, key='cisa')
+    backend.write_batch([
+        ('result', {'score': 3, 'total': 4, 'incorrect': [7], 'source': 'web', 'bank': 'cism'}),
+        ('progress', 'cism', {'current': 5}),
+        ('clear_progress', 'cisa'),
+        ('answers', [(7, 'B', 0, 800, 100.0, 'web', 'cism')]),
+    ])
+
+    assert backend.result_summary()['quizzes'] == 1
+    assert backend.get_progress('cism') == {'current': 5}
+    assert backend.get_progress('cisa') is None
+    assert [r['question_id'] for r in backend.answers_since(0)] == [7]
+
+
+def test_bank_versions(backend):
+    assert backend.get_bank_version() is None
+    backend.set_bank_version('abc123')
+    assert backend.get_bank_version() == 'abc123'
+    assert backend.get_bank_version(bank='cisa') is None
+
+
+def test_instances_on_one_server_share_state():
+    server = fakeredis.FakeServer()
+    first = RedisStorage(client=fakeredis.FakeRedis(server=server))
+    second = RedisStorage(client=fakeredis.FakeRedis(server=server))
+
+    first.save_session('abc', {'asked': [1, 2]}, ttl=60)
+    first.record_answers([(1, 'A', 1, None, 100.0, 'web', 'cism')])
+    assert second.get_session('abc') == {'asked': [1, 2]}
+    assert len(second.answers_since(0)) == 1
@@ -0,0 +1,11 @@
+import pytest
+
+
+def test_failed_batch_raises_its_own_error_and_writes_nothing(storage):
+    with pytest.raises(OverflowError):
+        storage.write_batch([('result', {'score': 1, 'total': 2}),
+                             ('answers', [(1, 'A', 1, 10 ** 20, 0.0, 'web', 'cism')])], synchronous='FULL')
+
+    assert storage.result_summary()['quizzes'] == 0
+    storage.write_batch([('answers', [(1, 'A', 1, 5, 0.0, 'web', 'cism')])])
+    assert len(storage.answers_since(0)) == 1
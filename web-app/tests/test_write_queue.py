@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+
+import pytest
+
+from storage import QuizStorage
+from write_queue import WriteBehindQueue
+
+
+class GatedStorage(QuizStorage):
+    """SQLite storage whose batch writes wait until the test opens the gate"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.batches = []
+
+    def write_batch(self, operations, synchronous='NORMAL'):
+        self.entered.set()
+        self.gate.wait(5)
+        self.batches.append(list(operations))
+        super().write_batch(operations, synchronous)
+
+
+@pytest.fixture
+def gated(tmp_path):
+    db = GatedStorage(tmp_path / "quiz_data.db")
+    yield db
+    db.gate.set()
+    db.close()
+
+
+def test_progress_saves_are_coalesced_per_key(storage):
+    writes = WriteBehindQueue(storage, flush_interval=60)
+    for step in range(5):
+        writes.save_progress({'step': step}, key='cism')
+    writes.save_progress({'step': 0}, key='cisa')
+
+    assert writes.metrics()['depth'] == 2
+    assert writes.flush()
+    assert storage.get_progress('cism') == {'step': 4}
+    assert storage.get_progress('cisa') == {'step': 0}
+    assert writes.metrics()['enqueued'] == 6
+    writes.close()
+
+
+def test_queued_progress_is_readable_before_it_is_written(storage):
+    storage.save_progress({'v': 1})
+    writes = WriteBehindQueue(storage, flush_interval=60)
+    writes.save_progress({'v': 2})
+
+    assert storage.get_progress() == {'v': 1}
+    assert writes.pending_progress() == (True, {'v': 2})
+    writes.clear_progress()
+    assert writes.pending_progress() == (True, None)
+    writes.flush()
+    assert writes.pending_progress() == (False, None)
+    assert storage.get_progress() is None
+    writes.close()
+
+
+def test_progress_being_written_stays_readable_until_committed(gated):
+    gated.save_progress({'v': 1})
+    writes = WriteBehindQueue(gated, flush_interval=0)
+    writes.save_progress({'v': 2})
+    assert gated.entered.wait(5)
+
+    # The worker holds the batch; reads must not fall back to the stored row
+    assert writes.pending_progress() == (True, {'v': 2})
+    writes.save_progress({'v': 3})
+    assert writes.pending_progress() == (True, {'v': 3})
+
+    gated.gate.set()
+    assert writes.flush()
+    assert gated.get_progress() == {'v': 3}
+    assert writes.pending_progress() == (False, None)
+    writes.close()
+
+
+def test_overflow_does_not_let_an_older_snapshot_win(storage):
+    writes = WriteBehindQueue(storage, flush_interval=60, max_queue=1)
+    writes.save_progress({'v': 1})
+    writes.save_result(score=1, total=2)          # queue full from here on
+    writes.save_progress({'v': 2})                # replaces the queued snapshot
+
+    writes.flush()
+    assert storage.get_progress() == {'v': 2}
+    assert writes.metrics()['overflows'] == 1
+    assert storage.result_summary()['quizzes'] == 1
+    writes.close()
+
+
+def test_full_queue_writes_synchronously(storage):
+    writes = WriteBehindQueue(storage, flush_interval=60, max_queue=1)
+    writes.save_result(score=1, total=2)
+    writes.save_result(score=2, total=2)
+
+    assert storage.result_summary()['quizzes'] == 1
+    assert writes.metrics()['overflows'] == 1
+    writes.close()
+    assert storage.result_summary()['quizzes'] == 2
+
+
+def test_close_drains_the_queue(storage):
+    writes = WriteBehindQueue(storage, flush_interval=60)
+    writes.save_result(score=3, total=4, incorrect=[9])
+    writes.record_answers([(9, 'A', 0, None, 0.0, 'web', 'cism')])
+    writes.save_progress({'done': True})
+    writes.close()
+
+    assert storage.result_summary()['quizzes'] == 1
+    assert len(storage.answers_since(0)) == 1
+    assert storage.get_progress() == {'done': True}
+    # Writes after shutdown go straight to storage
+    writes.save_result(score=4, total=4)
+    assert storage.result_summary()['quizzes'] == 2
+
+
+def test_batch_is_retried_while_the_database_is_busy(storage):
+    writes = WriteBehindQueue(storage, flush_interval=0)
+    original = storage.write_batch
+    calls = []
+
+    def flaky(operations, synchronous='NORMAL'):
+        calls.append(len(operations))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        original(operations, synchronous)
+
+    storage.write_batch = flaky
+    writes.save_result(score=1, total=1)
+    assert writes.flush()
+    assert storage.result_summary()['quizzes'] == 1
+    assert writes.metrics()['failures'] == 1
+    writes.close()
+
+
+def test_bad_operation_is_dropped_without_blocking_the_rest(storage):
+    writes = WriteBehindQueue(storage, flush_interval=60)
+    writes.save_result(score=1, total=2)
+    writes.save_result(score='3', total='5')      # fails on its own, every time
+    writes.record_answers([(1, 'A', 1, 10 ** 20, 0.0, 'web', 'cism'),
+                           (2, 'B', 0, 900, 0.0, 'web', 'cism')])
+    writes.save_progress({'v': 1})
+
+    assert writes.flush()
+    assert storage.result_summary()['quizzes'] == 1
+    assert [row['question_id'] for row in storage.answers_since(0)] == [2]
+    assert storage.get_progress() == {'v': 1}
+    metrics = writes.metrics()
+    assert (metrics['dropped'], metrics['failures'], metrics['depth']) == (2, 0, 0)
+
+    writes.save_result(score=2, total=2)
+    assert writes.flush()
+    assert storage.result_summary()['quizzes'] == 2
+    writes.close()
+
+
+def test_rejects_unknown_fsync_policy(storage):
+    with pytest.raises(ValueError):
+        WriteBehindQueue(storage, fsync_policy='sometimes')
@@ -0,0 +1,320 @@
+"""
+CISM Quiz Write-Behind Queue
+Requests enqueue their writes and return; a background thread persists them in batches
+"""
+import atexit
+import os
+import threading
+import time
+from collections import deque
+
+# How often batches are made durable (QUIZ_FSYNC_POLICY):
+#   always    every batch is fsynced before it counts as flushed
+#   interval  at most one fsynced batch per FSYNC_INTERVAL seconds, the rest are written without waiting
+#   never     leave syncing to the operating system
+FSYNC_POLICIES = ('always', 'interval', 'never')
+FSYNC_POLICY = os.environ.get('QUIZ_FSYNC_POLICY', 'interval')
+FSYNC_INTERVAL = float(os.environ.get('QUIZ_FSYNC_INTERVAL', '1.0'))
+WRITE_BATCH_SIZE = int(os.environ.get('QUIZ_WRITE_BATCH_SIZE', '500'))
+WRITE_FLUSH_INTERVAL = float(os.environ.get('QUIZ_WRITE_FLUSH_INTERVAL', '0.05'))
+WRITE_QUEUE_MAX = int(os.environ.get('QUIZ_WRITE_QUEUE_MAX', '10000'))
+
+
+class WriteBehindQueue:
+    """In-process queue of state-backend writes drained by one worker thread.
+
+    Operations use the StateBackend.write_batch format. The worker wakes when
+    `batch_size` operations are waiting or `flush_interval` seconds after the
+    first one arrived, and applies everything waiting in one batch. Progress
+    writes are coalesced per key (only the newest snapshot is written) and
+    can be read back with pending_progress() until they are committed. When
+    the queue holds `max_queue` operations, callers write synchronously
+    instead of growing it further. A batch that fails because the backend
+    is busy or unreachable is retried; one that fails on a bad operation is
+    applied an operation at a time, and the operations that fail on their
+    own are logged and dropped. Under the interval fsync policy, writes left
+    unsynced are synced once the worker has been idle for FSYNC_INTERVAL.
+    close() drains the queue on shutdown.
+    """
+
+    def __init__(self, storage, batch_size=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 fsync_policy=FSYNC_POLICY, max_queue=WRITE_QUEUE_MAX):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}' (choose from {', '.join(FSYNC_POLICIES)})")
+        self.storage = storage
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.max_queue = max_queue
+
+        self._queue = deque()
+        self._progress = {}               # key -> newest queued progress op (None data = cleared)
+        self._flushing = {}               # key -> progress op taken by the worker, until it is committed
+        self._cond = threading.Condition()
+        self._oldest = None               # monotonic time the oldest queued op arrived
+        self._in_flight = 0               # ops taken by the worker but not yet written
+        self._urgent = False              # flush() is waiting: don't hold the batch back
+        self._last_fsync = 0.0
+        self._unsynced = False            # batches were committed without an fsync since the last one
+        self._closed = False
+
+        # Metrics
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0                  # operations (or answer events) discarded as unwritable
+        self.overflows = 0
+        self.max_depth = 0
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+        self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    # Producers
+
+    def submit(self, op):
+        """Queue one write operation; returns immediately"""
+        with self._cond:
+            progress = op[0] in ('progress', 'clear_progress')
+            if progress and op[1] in self._progress:
+                # Still queued: replace the snapshot in place
+                self._progress[op[1]][:] = op
+                self.enqueued += 1
+                return
+            if (op[0] == 'answers' and self._queue and self._queue[-1][0] == 'answers'
+                    and not self._closed and len(self._queue) < self.max_queue):
+                # Answers recorded one at a time share one insert
+                self._queue[-1][1].extend(op[1])
+                self.enqueued += 1
+                return
+            # An older snapshot of the key being written must not land after this one, so queue it anyway
+            overflow = ((self._closed or len(self._queue) >= self.max_queue)
+                        and not (progress and op[1] in self._flushing))
+            if overflow:
+                self.overflows += 1
+            else:
+                if progress:
+                    op = list(op)
+                    self._progress[op[1]] = op
+                if not self._queue:
+                    self._oldest = time.monotonic()
+                self._queue.append(op)
+                self.enqueued += 1
+                self.max_depth = max(self.max_depth, len(self._queue))
+                if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                    self._cond.notify_all()
+        if overflow:
+            # Backpressure: the caller pays for its own write
+            self.storage.write_batch([tuple(op)], synchronous=self._sync_level())
+
+    def save_result(self, **kwargs):
+        self.submit(('result', kwargs))
+
+    def save_progress(self, data, key='default'):
+        self.submit(('progress', key, data))
+
+    def clear_progress(self, key='default'):
+        self.submit(('clear_progress', key))
+
+    def record_answers(self, events):
+        if events:
+            self.submit(('answers', list(events)))
+
+    def pending_progress(self, key='default'):
+        """(True, data) if a progress write for `key` isn't committed yet (data None if cleared), else (False, None)"""
+        with self._cond:
+            op = self._progress.get(key) or self._flushing.get(key)
+            if op is None:
+                return False, None
+            return True, (op[2] if op[0] == 'progress' else None)
+
+    # Worker
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed and not self._sync_due():
+                    self._cond.wait(self._sync_wait())
+                if self._queue:
+                    # Give the batch time to fill unless it is already full or someone is waiting on it
+                    while (not self._closed and not self._urgent and len(self._queue) < self.batch_size
+                           and time.monotonic() - self._oldest < self.flush_interval):
+                        self._cond.wait(self.flush_interval - (time.monotonic() - self._oldest))
+                    batch = list(self._queue)
+                    self._queue.clear()
+                    self._oldest = None
+                    self._urgent = False
+                    self._in_flight = len(batch)
+                    # From here on, later progress writes go into a new op; reads see this one until it commits
+                    for op in batch:
+                        if op[0] in ('progress', 'clear_progress'):
+                            self._progress.pop(op[1], None)
+                            self._flushing[op[1]] = op
+                else:
+                    batch = None
+                    closing = self._closed
+            if batch is None:
+                # Idle or shutting down: make what was committed without an fsync durable
+                if self._unsynced:
+                    self._sync()
+                if closing:
+                    return
+                continue
+            self._write(batch)
+
+    def _sync_level(self):
+        if self.fsync_policy == 'always':
+            return 'FULL'
+        if self.fsync_policy == 'never':
+            return 'OFF'
+        now = time.monotonic()
+        if now - self._last_fsync >= FSYNC_INTERVAL:
+            self._last_fsync = now
+            self._unsynced = False
+            return 'FULL'
+        self._unsynced = True
+        return 'NORMAL'
+
+    def _sync_due(self):
+        return self._unsynced and time.monotonic() - self._last_fsync >= FSYNC_INTERVAL
+
+    def _sync_wait(self):
+        # Seconds until an unsynced batch is due for its fsync; None waits for new writes
+        if not self._unsynced:
+            return None
+        return max(FSYNC_INTERVAL - (time.monotonic() - self._last_fsync), 0)
+
+    def _sync(self):
+        try:
+            self.storage.sync()
+        except Exception as exc:
+            print(f"Error syncing queued writes: {exc}")
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _forget_flushing(self, batch):
+        # Only drop snapshots nobody has replaced since the batch was taken
+        for op in batch:
+            if op[0] in ('progress', 'clear_progress') and self._flushing.get(op[1]) is op:
+                del self._flushing[op[1]]
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        written = len(batch)
+        try:
+            self.storage.write_batch([tuple(op) for op in batch], synchronous=self._sync_level())
+            retry, error = [], None
+        except Exception as exc:
+            retry, error = batch, exc
+            if not isinstance(exc, self.storage.transient_errors):
+                # One bad operation must not hold back the rest of the queue
+                retry, error, written = self._write_each(batch)
+        if retry:
+            print(f"Error writing {len(retry)} queued write(s): {error}")
+            with self._cond:
+                self.failures += 1
+                self.flushed += written
+                self._forget_flushing(batch)
+                if self._closed:
+                    # Shutting down: don't retry forever
+                    print(f"Warning: {len(retry)} queued write(s) were not persisted")
+                    self._in_flight = 0
+                    self._cond.notify_all()
+                    return
+                # Put the rest back in front, unless a newer progress snapshot was queued meanwhile
+                for op in reversed(retry):
+                    if op[0] in ('progress', 'clear_progress'):
+                        if op[1] in self._progress:
+                            continue
+                        self._progress[op[1]] = op
+                    self._queue.appendleft(op)
+                if self._queue and self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._in_flight = 0
+                self._cond.notify_all()
+            time.sleep(max(self.flush_interval, 0.05))
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._cond:
+            self._forget_flushing(batch)
+            self._in_flight = 0
+            self.flushed += written
+            self.batches += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._flush_ms_total += elapsed_ms
+            self._cond.notify_all()
+
+    def _write_each(self, batch):
+        """Apply a failed batch one operation (and answer event) at a time, dropping the ones that fail alone.
+
+        Returns (operations to retry, their error, operations written); the
+        retry list is only non-empty when the backend itself failed.
+        """
+        written = 0
+        for n, op in enumerate(batch):
+            events = op[1] if op[0] == 'answers' else [None]
+            complete = True
+            for i, event in enumerate(events):
+                single = ('answers', [event]) if op[0] == 'answers' else tuple(op)
+                try:
+                    self.storage.write_batch([single], synchronous=self._sync_level())
+                except Exception as exc:
+                    if isinstance(exc, self.storage.transient_errors):
+                        rest = [('answers', events[i:])] if op[0] == 'answers' else [op]
+                        return rest + list(batch[n + 1:]), exc, written
+                    print(f"Error: dropped a queued {op[0]} write that cannot be stored: {exc}")
+                    complete = False
+                    with self._cond:
+                        self.dropped += 1
+            written += complete
+        return [], None, written
+
+    # Control
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far is written; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._urgent = True
+            self._cond.notify_all()
+            while self._queue or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """Drain the queue and stop the worker"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout)
+        atexit.unregister(self.close)
+        if self._queue:
+            print(f"Warning: {len(self._queue)} queued write(s) were not persisted")
+
+    def metrics(self):
+        with self._cond:
+            return {
+                'depth': len(self._queue) + self._in_flight,
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'flushed': self.flushed,
+                'batches': self.batches,
+                'avg_batch_size': round(self.flushed / self.batches, 1) if self.batches else None,
+                'last_flush_ms': round(self.last_flush_ms, 2) if self.last_flush_ms is not None else None,
+                'avg_flush_ms': round(self._flush_ms_total / self.batches, 2) if self.batches else None,
+                'max_flush_ms': round(self.max_flush_ms, 2),
+                'failures': self.failures,
+                'dropped': self.dropped,
+                'overflows': self.overflows,
+                'fsync_policy': self.fsync_policy
+            }